@@ -0,0 +1,46 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Benchmark of check_library_units_definition on a synthetic library
+
+Usage : python benchmarks/benchmark_units_definition.py [number_of_parts]
+
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import timeit
+
+# The party package of this source tree, as for the benchmarks run by pytest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from party.library_checking import (  # noqa: E402
+    check_library_units_definition)
+from party.library_loading import clear_cache  # noqa: E402
+
+from synthetic import synthetic_library  # noqa: E402
+
+
+def main(nb_parts=100000):
+    r"""Time check_library_units_definition on a nb_parts parts library"""
+    fd, json_filename = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(synthetic_library(nb_parts, nb_fields=25, nb_rules=0), f)
+    try:
+        # Each repeat parses the library
+        timings = timeit.repeat(
+            lambda: check_library_units_definition(json_filename),
+            setup=clear_cache, repeat=3, number=1)
+        print("check_library_units_definition, %i parts : %.3f s (best of 3)"
+              % (nb_parts, min(timings)))
+    finally:
+        os.remove(json_filename)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(*[int(arg) for arg in sys.argv[1:2]])
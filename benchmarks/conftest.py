@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Benchmarks configuration
+
+The size of the synthetic libraries is set by the PARTY_BENCHMARK_PARTS
+environment variable (default: 1000 parts).
+
+The parts are built with ccad if it is installed, otherwise with the stub
+geometry backend of party (see party.stub_model), that exports the bounding
+boxes of the parts.
+
+"""
+
+import json
+import os
+
+import pytest
+
+from party.geometry import StubBackend
+from party.library_loading import enable_cache
+
+from synthetic import write_synthetic_library, write_synthetic_template
+
+
+class BoundsBackend(StubBackend):
+    r"""Stub backend 'exporting' the bounds of the parts"""
+    name = "bounds"
+
+    def export(self, part, file_path, output_format):
+        with open(file_path, 'w') as f:
+            json.dump(self.bounds(part), f)
+
+
+try:
+    import ccad.model  # noqa: F401
+    BACKEND = "ccad"
+except ImportError:
+    BACKEND = BoundsBackend()
+
+
+NB_PARTS = int(os.environ.get("PARTY_BENCHMARK_PARTS", 1000))
+
+
+@pytest.fixture(autouse=True)
+def no_library_cache():
+    r"""Each benchmark round parses the libraries"""
+    enable_cache(size=0)
+
+
+@pytest.fixture(scope="session")
+def library_json(tmpdir_factory):
+    r"""Path to a synthetic library.json file"""
+    json_filename = str(tmpdir_factory.mktemp("library").join("library.json"))
+    write_synthetic_library(json_filename, nb_parts=NB_PARTS, nb_fields=10,
+                            nb_rules=5, nb_generators=3)
+    return json_filename
+
+
+@pytest.fixture(scope="session")
+def template_folder(tmpdir_factory):
+    r"""Folder of a synthetic library_template.json file and its
+    generators"""
+    folder = str(tmpdir_factory.mktemp("template"))
+    write_synthetic_template(folder, nb_parts=NB_PARTS, nb_fields=10,
+                             nb_rules=5, nb_generators=3, nb_aliases=10)
+    return folder
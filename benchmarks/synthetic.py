@@ -0,0 +1,163 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Synthetic parts libraries of configurable size for the benchmarks
+
+The generated libraries follow the structure of the examples: a
+library_template.json file with a {{ generators }} tag, aliases and a
+nomenclature, and a generators subfolder with one ccad script per generator.
+
+"""
+
+import json
+import os
+
+from collections import OrderedDict
+
+
+def _field_names(nb_fields):
+    return ["field_%i" % i for i in range(nb_fields)]
+
+
+def generator_code(generator_id, nb_fields):
+    r"""Lines of a ccad generator script using every field
+
+    Parameters
+    ----------
+    generator_id : str
+    nb_fields : int
+
+    Returns
+    -------
+    list of str
+
+    """
+    lines = ['r"""Synthetic generator %s"""' % generator_id,
+             "",
+             "from ccad.model import box, cylinder",
+             ""]
+    fields = _field_names(nb_fields)
+    for field in fields:
+        lines.append("%s = {{ %s }}" % (field, field))
+    lines.append("")
+    lines.append("part = box(1. + abs(%s), 1., 1.)" % fields[0])
+    for field in fields[1:]:
+        lines.append("part = part + cylinder(0.5 + abs(%s), 1.)" % field)
+    lines.append('anchors = {1: {"position": (0., 0., 0.), '
+                 '"direction": (0., 0., -1.), "dimension": %s, '
+                 '"description": "base"}}' % fields[0])
+    return lines
+
+
+def synthetic_library(nb_parts=1000, nb_fields=10, nb_rules=2,
+                      nb_generators=1, nb_aliases=0):
+    r"""Content of a synthetic library.json file
+
+    Parameters
+    ----------
+    nb_parts : int
+        Number of entries in the 'data' section
+    nb_fields : int
+        Number of numeric fields of each part (at least 1)
+    nb_rules : int
+        Number of rules
+    nb_generators : int
+        Number of generators, used in turn by the parts
+    nb_aliases : int
+        Number of aliases. The parts use them in turn through an 'alias'
+        field; each alias defines the 'alias_value' field.
+
+    Returns
+    -------
+    OrderedDict : the library JSON content
+
+    """
+    fields = _field_names(nb_fields)
+    generators = OrderedDict(("generator_%i" % i,
+                              generator_code("generator_%i" % i, nb_fields))
+                             for i in range(nb_generators))
+    aliases = OrderedDict(("alias_%i" % i, {"alias_value": float(i)})
+                          for i in range(nb_aliases))
+    unit_fields = list(fields)
+    if nb_aliases > 0:
+        unit_fields.append("alias_value")
+
+    data = OrderedDict()
+    for i in range(nb_parts):
+        part_values = OrderedDict()
+        part_values["description"] = "Synthetic part %i" % i
+        part_values["generator"] = "generator_%i" % (i % nb_generators)
+        for k, field in enumerate(fields):
+            part_values[field] = float(i + k + 1)
+        if nb_aliases > 0:
+            part_values["alias"] = "__alias__alias_%i" % (i % nb_aliases)
+        data["part_%i" % i] = part_values
+
+    library = OrderedDict()
+    library["metadata"] = OrderedDict([
+        ("name", "synthetic-library"),
+        ("description", "Synthetic library"),
+        ("nomenclature", "'P_' + str(int(%s))" % fields[0]),
+        ("units", OrderedDict([
+            ("length", ["mm", unit_fields]),
+            ("dimensionless", ["", ["alias"] if nb_aliases > 0 else []])])),
+        ("authors", ["party benchmarks"]),
+        ("license", "GPL v3")])
+    library["generators"] = generators
+    library["rules"] = ["%s > 0" % fields[i % nb_fields]
+                        for i in range(nb_rules)]
+    if nb_aliases > 0:
+        library["aliases"] = aliases
+    library["data"] = data
+    return library
+
+
+def write_synthetic_library(json_filename, **kwargs):
+    r"""Write a synthetic library.json file
+
+    Parameters
+    ----------
+    json_filename : str
+    kwargs : see synthetic_library()
+
+    """
+    with open(json_filename, 'w') as f:
+        json.dump(synthetic_library(**kwargs), f, indent=2)
+
+
+def write_synthetic_template(folder, **kwargs):
+    r"""Write a synthetic library_template.json file with a {{ generators }}
+    tag and the matching generators subfolder
+
+    Parameters
+    ----------
+    folder : str
+        The library folder, created if needed
+    kwargs : see synthetic_library()
+
+    Returns
+    -------
+    str : path to the library_template.json file
+
+    """
+    library = synthetic_library(**kwargs)
+    generators = library.pop("generators")
+
+    generators_folder = os.path.join(folder, "generators")
+    if not os.path.isdir(generators_folder):
+        os.makedirs(generators_folder)
+    for generator_id, code in generators.items():
+        with open(os.path.join(generators_folder,
+                               "%s.py" % generator_id), 'w') as f:
+            f.write("\n".join(code) + "\n")
+
+    # json.dumps() cannot write the {{ generators }} tag : insert it after
+    # the metadata
+    content = json.dumps(library, indent=2)
+    content = content.replace('\n  "rules":',
+                              '\n  "generators": { {{ generators }} },'
+                              '\n  "rules":', 1)
+    template_path = os.path.join(folder, "library_template.json")
+    with open(template_path, 'w') as f:
+        f.write(content)
+    return template_path
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Benchmarks of the parts library operations
+
+Run with : pytest benchmarks (requires pytest-benchmark)
+
+"""
+
+import json
+import os
+
+from party.library_checking import check_library_json_rules, \
+    check_library_units_definition, check_library_fields, \
+    check_duplicate_part_ids, check_duplicate_geometries
+from party.library_creation import autocreate_library
+from party.library_documentation import _library_rst
+from party.library_use import _generate_script, iter_generate
+from party.templating import render, to_json_string, \
+    reconstruct_script_code_template
+
+from conftest import BACKEND
+from synthetic import generator_code
+
+
+def test_autocreate_library(benchmark, template_folder):
+    template_path = os.path.join(template_folder, "library_template.json")
+    library_path = os.path.join(template_folder, "library.json")
+    benchmark(autocreate_library, template_path,
+              library_file_name=library_path)
+
+
+def test_check_library_json_rules(benchmark, library_json):
+    benchmark(check_library_json_rules, library_json)
+
+
+def test_check_library_units_definition(benchmark, library_json):
+    benchmark(check_library_units_definition, library_json)
+
+
+def test_check_library_fields(benchmark, library_json):
+    benchmark(check_library_fields, library_json)
+
+
+def test_check_duplicate_part_ids(benchmark, library_json):
+    benchmark(check_duplicate_part_ids, library_json)
+
+
+def test_check_duplicate_geometries(benchmark, library_json):
+    benchmark(check_duplicate_geometries, library_json)
+
+
+def test_generate_script(benchmark, library_json, tmpdir):
+    r"""Render and write the script of a part to tmpdir"""
+    with open(library_json) as f:
+        json_file_content = json.load(f)
+    part_id, context_ = next(iter(json_file_content["data"].items()))
+    benchmark(_generate_script, json_file_content["generators"], str(tmpdir),
+              part_id, context_)
+
+
+def test_render(benchmark, tmpdir):
+    template_path = str(tmpdir.join("template.py"))
+    with open(template_path, 'w') as f:
+        f.write(reconstruct_script_code_template(
+            generator_code("generator", 10)))
+    context_ = dict(("field_%i" % i, float(i)) for i in range(10))
+    benchmark(render, template_path, context_)
+
+
+def test_to_json_string(benchmark):
+    generators = dict(("generator_%i" % i,
+                       [line + "\n" for line in
+                        generator_code("generator_%i" % i, 10)])
+                      for i in range(20))
+    benchmark(to_json_string, generators)
+
+
+def test_library_rst(benchmark, library_json):
+    benchmark(_library_rst, library_json)
+
+
+def test_generate_scripts_and_steps(benchmark, library_json, tmpdir,
+                                    monkeypatch):
+    r"""Scripts and STEP files of the first 50 parts"""
+    monkeypatch.chdir(str(tmpdir))
+    benchmark(lambda: list(iter_generate(library_json, generate_steps=True,
+                                         patterns=["part_[0-4]?"],
+                                         backend=BACKEND)))
@@ -0,0 +1,8 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""python -m party : the party command line interface"""
+
+from party.cli import main
+
+main()
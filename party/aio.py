@@ -0,0 +1,221 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""asyncio counterparts of the library generation and checks (Python 3.6+)
+
+The generation runs in a thread of the executor of the loop (with its own
+pool of processes), the checks and the geometry scripts checks run in a pool
+of processes, and the file reads of the event loop side run in the default
+executor of the loop : the event loop is never blocked.
+
+    async for record in agenerate("library.json", generate_steps=True):
+        print(record["part_id"], record["exports"], record["error"])
+
+    oks, errors = await acheck_all("library.json")
+
+Cancelling the task consuming agenerate() (or closing the iterator) stops
+the generation once the part being generated (or, with several processes,
+the next part) is done : the other parts are not generated and no file is
+published.
+
+"""
+
+import asyncio
+import logging
+import os
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from party.library_loading import load_library
+from party.library_use import iter_generate
+
+
+logger = logging.getLogger(__name__)
+
+# End of the records of agenerate()
+_DONE = object()
+
+
+class _Executor(object):
+    r"""The executor given by the caller, or a pool of processes owned (and
+    shut down) by the operation"""
+    def __init__(self, executor, max_workers):
+        self.owned = executor is None
+        self.executor = ProcessPoolExecutor(max_workers) if self.owned \
+            else executor
+
+    def __enter__(self):
+        return self.executor
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.owned:
+            # Do not wait for the running tasks when cancelled
+            self.executor.shutdown(wait=exc_type is None)
+        return False
+
+
+async def agenerate(json_library_filepath, generate_steps=False,
+                    generate_stls=False, generate_htmls=False, part_ids=None,
+                    patterns=None, where=None, backend="ccad", executor=None,
+                    max_workers=None, **kwargs):
+    r"""Generate the geometry scripts and CAD files of a library, yielding a
+    record per part as soon as the part is done
+
+    The generation is party.library_use.iter_generate, run in a thread : the
+    outputs are the same as the ones of the synchronous generation.
+
+    Parameters
+    ----------
+    json_library_filepath : str
+    generate_steps : bool
+    generate_stls : bool
+    generate_htmls : bool
+    part_ids, patterns, where : optional
+        Selection of the parts (see party.library_use.select_parts)
+    backend : str or party.geometry.Backend, optional (default is 'ccad')
+    executor : concurrent.futures.Executor, optional (default is None)
+        Executor running the generation loop (a thread pool). If None, the
+        default executor of the event loop is used.
+    max_workers : int, optional (default is None, i.e. the number of CPUs)
+        Number of processes generating the parts
+    kwargs :
+        Other options of party.library_use.iter_generate (output_mode,
+        archive, stl_quality, html_mode, generate_properties ...)
+
+    Yields
+    ------
+    OrderedDict : part record (see party.library_use.iter_generate), in
+                  completion order. The error is the repr() of the
+                  exception raised by the part generation, if any.
+
+    Raises
+    ------
+    KeyError
+    ValueError (see party.library_use.iter_generate)
+
+    """
+    loop = asyncio.get_event_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(item):
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def produce():
+        records = iter_generate(
+            json_library_filepath, generate_steps=generate_steps,
+            generate_stls=generate_stls, generate_htmls=generate_htmls,
+            part_ids=part_ids, patterns=patterns, where=where,
+            backend=backend, processes=max_workers, **kwargs)
+        try:
+            for record in records:
+                if stop.is_set():
+                    break
+                put((record, None))
+        except BaseException as e:
+            put((None, e))
+            return
+        finally:
+            # Stops the pool of processes and discards the staged files if
+            # the consumer stopped early
+            records.close()
+        put((_DONE, None))
+
+    producer = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            record, error = await queue.get()
+            if error is not None:
+                raise error
+            if record is _DONE:
+                break
+            yield record
+    finally:
+        stop.set()
+        await producer
+
+
+async def acheck_all(json_filename, executor=None):
+    r"""Run party.library_checking.check_all in a process
+
+    Parameters
+    ----------
+    json_filename : str
+    executor : concurrent.futures.Executor, optional (default is None)
+        If None, a process is started for the call
+
+    Returns
+    -------
+    The result of party.library_checking.check_all
+
+    """
+    from party.library_checking import check_all
+
+    loop = asyncio.get_event_loop()
+    with _Executor(executor, 1) as executor_:
+        return await loop.run_in_executor(executor_, check_all, json_filename)
+
+
+def _check_script_record(script_path, part_id, backend):
+    from party.scripts_checking import check_script
+    try:
+        return check_script(script_path, backend=backend)
+    except IOError:
+        return False, ["No script for %s" % part_id]
+
+
+def _scripts_to_check(folder_path):
+    from party.library_checking import find_libraries
+
+    scripts = list()
+    for json_filename in find_libraries(folder_path):
+        library_folder = os.path.dirname(json_filename)
+        for part_id in load_library(json_filename)["data"]:
+            scripts.append((json_filename, part_id, os.path.join(
+                library_folder, "scripts", "%s.py" % part_id)))
+    return scripts
+
+
+async def acheck_all_scripts(folder_path, backend="ccad", executor=None,
+                             max_workers=None):
+    r"""Check the geometry scripts of every library.json found in a folder,
+    in a pool of processes
+
+    Parameters
+    ----------
+    folder_path : str
+    backend : str or party.geometry.Backend, optional (default is 'ccad')
+    executor : concurrent.futures.Executor, optional (default is None)
+        If None, a pool of max_workers processes is created for the call
+    max_workers : int, optional (default is None, i.e. the number of CPUs)
+
+    Returns
+    -------
+    bool, dict (keys: library.json paths, values: dict with the errors of
+                each broken part)
+
+    """
+    loop = asyncio.get_event_loop()
+    scripts = await loop.run_in_executor(None, _scripts_to_check, folder_path)
+
+    with _Executor(executor, max_workers) as executor_:
+        futures = [loop.run_in_executor(executor_, _check_script_record,
+                                        script_path, part_id, backend)
+                   for _, part_id, script_path in scripts]
+        try:
+            results = await asyncio.gather(*futures)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    scripts_ok = True
+    all_errors = OrderedDict()
+    for (json_filename, part_id, _), (script_ok, errors) in zip(scripts,
+                                                                results):
+        if script_ok is False:
+            scripts_ok = False
+            all_errors.setdefault(json_filename, OrderedDict())[part_id] = \
+                errors
+    return scripts_ok, all_errors
@@ -0,0 +1,283 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Anchors of the parts of libraries, queried without running the scripts
+
+generate(..., generate_anchors=True) extracts the anchors of the parts and
+stores them next to the library JSON file (<library>_anchors.json for
+<library>.json) as columns : the positions, directions, dimensions ... of
+all the anchors of the library, with the anchor indices sorted by dimension.
+
+    index = AnchorIndex(["screws/library.json", "nuts/library.json"])
+    index.query(dimension=2., direction=(0., 0., -1.))
+
+"""
+
+import bisect
+import json
+import logging
+import math
+import os
+
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+ANCHORS_FORMAT_VERSION = 1
+
+
+def anchors_path(json_library_filepath):
+    r"""Path of the anchors table of a library"""
+    return "%s_anchors.json" % os.path.splitext(json_library_filepath)[0]
+
+
+def _floats(values):
+    return None if values is None else [float(value) for value in values]
+
+
+def normalized_anchors(anchors):
+    r"""The anchors of a geometry script as JSON serializable values
+
+    Parameters
+    ----------
+    anchors : dict
+        The anchors variable of a geometry script (keys: anchor names,
+        values: dict with position, direction, dimension and description)
+
+    Returns
+    -------
+    OrderedDict : keys: anchor names (str, sorted), values: OrderedDict
+                  (keys: position, direction, dimension, description)
+
+    """
+    normalized = OrderedDict()
+    for name in sorted(anchors, key=str):
+        anchor = anchors[name]
+        dimension = anchor.get("dimension")
+        normalized[str(name)] = OrderedDict([
+            ("position", _floats(anchor.get("position"))),
+            ("direction", _floats(anchor.get("direction"))),
+            ("dimension", None if dimension is None else float(dimension)),
+            ("description", anchor.get("description"))])
+    return normalized
+
+
+def anchors_table(json_file_content, anchors, previous=None):
+    r"""Anchors table content of a library
+
+    Parameters
+    ----------
+    json_file_content : dict
+        The library JSON content
+    anchors : dict
+        Keys: part ids, values: normalized anchors of the parts (see
+        normalized_anchors())
+    previous : dict, optional (default is None)
+        Anchors of the parts from a previous table (see load_anchors()),
+        kept for the parts of the library not in anchors
+
+    Returns
+    -------
+    OrderedDict with the keys
+        format, part_ids, columns (OrderedDict, keys: part (index in
+        part_ids), name, position (3 floats per anchor, flattened),
+        direction (idem), dimension and description, values: a list per
+        column) and by_dimension (indices of the anchors having a dimension,
+        sorted by dimension)
+
+    """
+    previous = previous or dict()
+    part_ids = list()
+    columns = OrderedDict((column, list()) for column in [
+        "part", "name", "position", "direction", "dimension", "description"])
+    for part_id in json_file_content["data"]:
+        part_anchors = anchors.get(part_id, previous.get(part_id))
+        if part_anchors is None:
+            continue
+        part_ids.append(part_id)
+        for name, anchor in part_anchors.items():
+            columns["part"].append(len(part_ids) - 1)
+            columns["name"].append(name)
+            for column in ("position", "direction"):
+                columns[column].extend(anchor[column] or [None] * 3)
+            columns["dimension"].append(anchor["dimension"])
+            columns["description"].append(anchor["description"])
+    dimensions = columns["dimension"]
+    by_dimension = sorted((i for i, dimension in enumerate(dimensions)
+                           if dimension is not None),
+                          key=dimensions.__getitem__)
+    return OrderedDict([("format", ANCHORS_FORMAT_VERSION),
+                        ("part_ids", part_ids),
+                        ("columns", columns),
+                        ("by_dimension", by_dimension)])
+
+
+def _load_table(json_library_filepath):
+    with open(anchors_path(json_library_filepath)) as f:
+        table = json.load(f, object_pairs_hook=OrderedDict)
+    if table.get("format") != ANCHORS_FORMAT_VERSION:
+        raise ValueError("Unsupported anchors table format : %s" %
+                         table.get("format"))
+    return table
+
+
+def load_anchors(json_library_filepath):
+    r"""Read the anchors table of a library, by part
+
+    Returns
+    -------
+    OrderedDict : keys: part ids, values: normalized anchors (see
+                  normalized_anchors())
+
+    Raises
+    ------
+    IOError if the library has no anchors table
+    ValueError if the table format is not supported
+
+    """
+    table = _load_table(json_library_filepath)
+    columns = table["columns"]
+    anchors = OrderedDict((part_id, OrderedDict())
+                          for part_id in table["part_ids"])
+    for i, part in enumerate(columns["part"]):
+        position, direction = [columns[column][3 * i:3 * i + 3]
+                               for column in ("position", "direction")]
+        anchors[table["part_ids"][part]][columns["name"][i]] = OrderedDict([
+            ("position", None if position[0] is None else position),
+            ("direction", None if direction[0] is None else direction),
+            ("dimension", columns["dimension"][i]),
+            ("description", columns["description"][i])])
+    return anchors
+
+
+class AnchorIndex(object):
+    r"""Queries on the anchors tables of one or several libraries
+
+    Parameters
+    ----------
+    json_library_filepaths : str or list of str
+        Library JSON files, generated with their anchors table
+
+    Raises
+    ------
+    IOError if a library has no anchors table
+    ValueError if a table format is not supported
+
+    """
+    def __init__(self, json_library_filepaths):
+        if isinstance(json_library_filepaths, str):
+            json_library_filepaths = [json_library_filepaths]
+        self.libraries = list(json_library_filepaths)
+        self.part_ids = list()  # (library index, part id) per part
+        self.parts = list()  # part index per anchor
+        self.names = list()
+        self.positions = list()
+        self.directions = list()
+        self.dimensions = list()
+        self.descriptions = list()
+        by_dimension = list()
+        for library_index, library in enumerate(self.libraries):
+            table = _load_table(library)
+            columns = table["columns"]
+            first_part, first_anchor = len(self.part_ids), len(self.parts)
+            self.part_ids.extend((library_index, part_id)
+                                 for part_id in table["part_ids"])
+            self.parts.extend(first_part + part for part in columns["part"])
+            self.names.extend(columns["name"])
+            self.positions.extend(columns["position"])
+            self.directions.extend(columns["direction"])
+            self.dimensions.extend(columns["dimension"])
+            self.descriptions.extend(columns["description"])
+            by_dimension.extend(first_anchor + i
+                                for i in table["by_dimension"])
+        # Sort of the indices of all the libraries by dimension
+        self._by_dimension = sorted(by_dimension,
+                                    key=self.dimensions.__getitem__)
+        self._sorted_dimensions = [self.dimensions[i]
+                                   for i in self._by_dimension]
+
+    def __len__(self):
+        return len(self.parts)
+
+    def _candidates(self, dimension, tolerance):
+        if dimension is None:
+            return range(len(self.parts))
+        start = bisect.bisect_left(self._sorted_dimensions,
+                                   dimension - tolerance)
+        end = bisect.bisect_right(self._sorted_dimensions,
+                                  dimension + tolerance)
+        return sorted(self._by_dimension[start:end])
+
+    def anchor(self, i):
+        r"""The anchor of index i, as an OrderedDict with the keys library,
+        part_id, name, position, direction, dimension and description"""
+        library_index, part_id = self.part_ids[self.parts[i]]
+        position = self.positions[3 * i:3 * i + 3]
+        direction = self.directions[3 * i:3 * i + 3]
+        return OrderedDict([
+            ("library", self.libraries[library_index]),
+            ("part_id", part_id),
+            ("name", self.names[i]),
+            ("position", None if position[0] is None else position),
+            ("direction", None if direction[0] is None else direction),
+            ("dimension", self.dimensions[i]),
+            ("description", self.descriptions[i])])
+
+    def query(self, dimension=None, direction=None, tolerance=1e-6,
+              angle_tolerance=1e-3):
+        r"""Anchors matching a dimension and a direction
+
+        Parameters
+        ----------
+        dimension : float, optional (default is None, any dimension)
+        direction : tuple of 3 floats, optional (default is None, any
+                    direction)
+        tolerance : float, optional (default is 1e-6)
+            Tolerance on the dimension
+        angle_tolerance : float, optional (default is 1e-3)
+            Tolerance on the angle (rad) between the anchor direction and
+            direction
+
+        Returns
+        -------
+        list of OrderedDict : the matching anchors (see anchor()), in the
+                              libraries order
+
+        Raises
+        ------
+        ValueError if direction is a null vector
+
+        """
+        if direction is not None:
+            norm = math.sqrt(sum(d * d for d in direction))
+            if norm == 0.:
+                raise ValueError("The query direction is a null vector")
+        candidates = self._candidates(dimension, tolerance)
+        if direction is not None:
+            ux, uy, uz = [d / norm for d in direction]
+            min_cosine = math.cos(angle_tolerance)
+            directions = self.directions
+            matching = list()
+            for i in candidates:
+                dx, dy, dz = directions[3 * i:3 * i + 3]
+                if dx is None:
+                    continue
+                length = math.sqrt(dx * dx + dy * dy + dz * dz)
+                if length > 0. and \
+                        (dx * ux + dy * uy + dz * uz) >= min_cosine * length:
+                    matching.append(i)
+            candidates = matching
+        return [self.anchor(i) for i in candidates]
+
+    def part_ids_with(self, dimension=None, direction=None, tolerance=1e-6,
+                      angle_tolerance=1e-3):
+        r"""(library, part id) of the parts having an anchor matching a
+        dimension and a direction (see query()), in the libraries order"""
+        parts = list()
+        for anchor in self.query(dimension=dimension, direction=direction,
+                                 tolerance=tolerance,
+                                 angle_tolerance=angle_tolerance):
+            part = (anchor["library"], anchor["part_id"])
+            if len(parts) == 0 or parts[-1] != part:
+                parts.append(part)
+        return parts
@@ -0,0 +1,266 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Library bundles : a library and its generated files in a single zip file,
+with an index giving random access to the files of each part
+
+The index.json member lists, for each part id and each file format, the
+member name, the offset of its data in the zip file, its sizes, its
+compression and the SHA-256 hash of its content. BundleReader reads the
+zip central directory once, to get the index ; a part file is then read
+with a single seek (or a single HTTP range request) and checked, without
+going through the central directory again nor reading the other members.
+
+    create_bundle("parts/screws/library.json")
+
+    with BundleReader("parts/screws/library.bundle.zip") as bundle:
+        bundle.extract("M2x16_A", "step", "downloads")
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import zipfile
+import zlib
+
+from collections import OrderedDict
+
+from party.output import OutputWriter
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_MEMBER = "index.json"
+BUNDLE_FORMAT_VERSION = 1
+
+# Folder and extension of the part files of each format
+FORMATS = OrderedDict([("script", ("scripts", "py")),
+                       ("step", ("steps", "stp")),
+                       ("stl", ("stls", "stl")),
+                       ("html", ("htmls", "html")),
+                       ("png", ("thumbnails", "png"))])
+
+_COMPRESSIONS = {zipfile.ZIP_STORED: "store", zipfile.ZIP_DEFLATED: "deflate"}
+
+# Size of the fixed part of a zip local file header
+_LOCAL_HEADER_SIZE = 30
+
+
+def _sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _data_offset(f, zip_info):
+    r"""Offset of the data of a member, after its local header"""
+    f.seek(zip_info.header_offset)
+    header = f.read(_LOCAL_HEADER_SIZE)
+    filename_length, extra_length = struct.unpack("<HH", header[26:30])
+    return zip_info.header_offset + _LOCAL_HEADER_SIZE + filename_length + \
+        extra_length
+
+
+def create_bundle(library_json_filepath, bundle_path=None,
+                  formats=("script", "step", "stl", "html", "png")):
+    r"""Create a bundle of a library and of its generated files
+
+    Parameters
+    ----------
+    library_json_filepath : str
+    bundle_path : str, optional (default is None)
+        If None, <library name>.bundle.zip next to the library JSON file
+    formats : iterable of str, optional
+        Formats of the part files to bundle, among 'script', 'step', 'stl',
+        'html' and 'png'. The missing files are skipped.
+
+    Returns
+    -------
+    str : the bundle path
+
+    """
+    library_folder = os.path.dirname(library_json_filepath)
+    if bundle_path is None:
+        bundle_path = os.path.join(library_folder, "%s.bundle.zip" %
+                                   os.path.splitext(os.path.basename(
+                                       library_json_filepath))[0])
+    with open(library_json_filepath) as data_file:
+        part_ids = list(json.load(data_file,
+                                  object_pairs_hook=OrderedDict)["data"])
+
+    members = [(None, None, os.path.basename(library_json_filepath),
+                library_json_filepath)]
+    for part_id in part_ids:
+        for output_format in formats:
+            folder, extension = FORMATS[output_format]
+            path = os.path.join(library_folder, folder,
+                                "%s.%s" % (part_id, extension))
+            if os.path.isfile(path):
+                members.append((part_id, output_format,
+                                "%s/%s.%s" % (folder, part_id, extension),
+                                path))
+
+    bundle_folder, bundle_name = os.path.split(bundle_path)
+    with OutputWriter(bundle_folder) as writer:
+        staged_bundle_path = writer.staged_path(bundle_name)
+        with zipfile.ZipFile(staged_bundle_path, 'w',
+                             zipfile.ZIP_DEFLATED) as bundle:
+            for _, _, member, path in members:
+                bundle.write(path, member)
+            zip_infos = dict((zip_info.filename, zip_info)
+                             for zip_info in bundle.infolist())
+
+        index = OrderedDict([("format", BUNDLE_FORMAT_VERSION),
+                             ("library", members[0][2]),
+                             ("parts", OrderedDict())])
+        with open(staged_bundle_path, 'rb') as f:
+            for part_id, output_format, member, path in members[1:]:
+                zip_info = zip_infos[member]
+                index["parts"].setdefault(part_id, OrderedDict())[
+                    output_format] = OrderedDict([
+                        ("member", member),
+                        ("offset", _data_offset(f, zip_info)),
+                        ("compressed_size", zip_info.compress_size),
+                        ("size", zip_info.file_size),
+                        ("compression",
+                         _COMPRESSIONS[zip_info.compress_type]),
+                        ("sha256", _sha256(path))])
+        with zipfile.ZipFile(staged_bundle_path, 'a',
+                             zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr(INDEX_MEMBER, json.dumps(index))
+    logger.info("Bundled %i file(s) of %i part(s) in %s" %
+                (len(members) - 1, len(index["parts"]), bundle_path))
+    return bundle_path
+
+
+class BundleReader(object):
+    r"""Random access to the part files of a bundle
+
+    Parameters
+    ----------
+    bundle_path : str
+
+    Raises
+    ------
+    ValueError if the bundle format is not supported
+
+    """
+    def __init__(self, bundle_path):
+        self.bundle_path = bundle_path
+        self._file = open(bundle_path, 'rb')
+        try:
+            with zipfile.ZipFile(self._file) as bundle:
+                self.index = json.loads(bundle.read(INDEX_MEMBER).decode(
+                    "utf-8"), object_pairs_hook=OrderedDict)
+        except Exception:
+            self._file.close()
+            raise
+        if self.index.get("format") != BUNDLE_FORMAT_VERSION:
+            self._file.close()
+            raise ValueError("Unsupported bundle format : %s" %
+                             self.index.get("format"))
+
+    def part_ids(self):
+        r"""Ids of the parts having files in the bundle"""
+        return list(self.index["parts"].keys())
+
+    def formats(self, part_id):
+        r"""Formats of the files of a part in the bundle"""
+        return list(self.index["parts"][part_id].keys())
+
+    def library(self):
+        r"""The library JSON content"""
+        with zipfile.ZipFile(self._file) as bundle:
+            return json.loads(bundle.read(self.index["library"]).decode(
+                "utf-8"), object_pairs_hook=OrderedDict)
+
+    def iter_content(self, part_id, output_format, chunk_size=1024 * 1024):
+        r"""Stream the content of a part file
+
+        Parameters
+        ----------
+        part_id : str
+        output_format : str
+            'script', 'step', 'stl', 'html' or 'png'
+        chunk_size : int, optional (default is 1 MiB)
+            Size of the chunks read from the bundle
+
+        Yields
+        ------
+        bytes : the successive chunks of the file content
+
+        Raises
+        ------
+        KeyError if the bundle has no such file
+        ValueError if the content does not match the indexed hash
+
+        """
+        entry = self.index["parts"][part_id][output_format]
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS) \
+            if entry["compression"] == "deflate" else None
+        sha256 = hashlib.sha256()
+        position = entry["offset"]
+        remaining = entry["compressed_size"]
+        while remaining > 0:
+            # Seek every time, several contents can be streamed at once
+            self._file.seek(position)
+            chunk = self._file.read(min(chunk_size, remaining))
+            position += len(chunk)
+            if not chunk:
+                raise ValueError("Truncated bundle : %s" % self.bundle_path)
+            remaining -= len(chunk)
+            if decompressor is not None:
+                try:
+                    chunk = decompressor.decompress(chunk)
+                    if remaining == 0:
+                        chunk += decompressor.flush()
+                except zlib.error:
+                    raise ValueError("Corrupted %s file of %s in %s" %
+                                     (output_format, part_id,
+                                      self.bundle_path))
+            sha256.update(chunk)
+            yield chunk
+        if sha256.hexdigest() != entry["sha256"]:
+            raise ValueError("Corrupted %s file of %s in %s" %
+                             (output_format, part_id, self.bundle_path))
+
+    def read(self, part_id, output_format):
+        r"""Content of a part file (see iter_content())
+
+        Returns
+        -------
+        bytes
+
+        """
+        return b"".join(self.iter_content(part_id, output_format))
+
+    def extract(self, part_id, output_format, folder_path):
+        r"""Write a part file to a folder
+
+        Returns
+        -------
+        str : the path of the extracted file
+
+        """
+        member = self.index["parts"][part_id][output_format]["member"]
+        with OutputWriter(folder_path) as writer:
+            staged_path = writer.staged_path(os.path.basename(member))
+            with open(staged_path, 'wb') as f:
+                for chunk in self.iter_content(part_id, output_format):
+                    f.write(chunk)
+        return os.path.join(folder_path, os.path.basename(member))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
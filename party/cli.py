@@ -0,0 +1,407 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""party command line interface
+
+    party create library_template.json
+    party check library.json other_folder/ -j 4
+    party generate library.json --step --stl --pattern 'M2x*'
+    party doc libraries_folder doc_folder --group-by threading
+    party query library.json --where "l_max > 20" --fields l_max,threading
+    party bundle library.json
+    party extract library.bundle.zip M2x16_A --format step -o downloads
+    party daemon start|stop|status
+
+With --daemon (or the PARTY_DAEMON environment variable set to 1), the
+command is run by a party worker daemon (see party.daemon) if one is
+running, which keeps the libraries, compiled templates and geometry kernel
+loaded between commands.
+
+"""
+
+import json
+import logging
+import os
+import sys
+
+from party.library_loading import load_library
+from party.profiling import profile_run
+
+
+logger = logging.getLogger(__name__)
+
+
+def _selection_arguments(parser):
+    parser.add_argument("--part", dest="part_ids", action="append",
+                        help="part id (can be repeated)")
+    parser.add_argument("--pattern", dest="patterns", action="append",
+                        help="glob pattern on the part ids (can be repeated)")
+    parser.add_argument("--where",
+                        help="predicate on the part fields, e.g. "
+                             "\"threading == 'M2'\"")
+
+
+def _create(args):
+    from party.library_creation import autocreate_library
+    autocreate_library(args.template, library_file_name=args.output)
+    return 0
+
+
+def _check(args):
+    from party.library_checking import check_all_libraries
+
+    exit_code = 0
+    libraries = list()
+    for path in args.libraries:
+        if os.path.isdir(path):
+            from party.library_checking import find_libraries
+            libraries.extend(find_libraries(path))
+        else:
+            libraries.append(path)
+    results = check_all_libraries(libraries, processes=args.jobs)
+    for json_filename, (oks, errors) in results.items():
+        ok = all(entry is True for entry in oks)
+        print("%s %s" % ("OK   " if ok else "ERROR", json_filename))
+        if not ok:
+            exit_code = 1
+            for check, check_ok, check_errors in zip(
+                    ["rules", "units", "fields", "part ids"], oks, errors):
+                if check_ok is not True:
+                    print("    %s : %s" % (check, str(check_errors)))
+
+    if args.scripts:
+        from party.scripts_checking import check_all_scripts_from_library_jsons
+        for path in args.libraries:
+            folder = path if os.path.isdir(path) else os.path.dirname(path)
+            scripts_ok, all_errors = check_all_scripts_from_library_jsons(
+                folder or ".", backend=args.backend)
+            print("%s scripts of %s" % ("OK   " if scripts_ok else "ERROR",
+                                        folder))
+            for json_filename, errors in all_errors.items():
+                print("    %s : %s" % (json_filename, str(errors)))
+            if not scripts_ok:
+                exit_code = 1
+    return exit_code
+
+
+def _generate(args):
+    from party.library_use import iter_generate
+
+    exit_code = 0
+    for record in iter_generate(args.library, generate_steps=args.step,
+                                generate_stls=args.stl,
+                                generate_htmls=args.html,
+                                part_ids=args.part_ids,
+                                patterns=args.patterns, where=args.where,
+                                processes=args.jobs,
+                                output_mode=args.output_mode,
+                                archive=args.archive,
+                                stl_quality=args.stl_quality,
+                                html_mode=args.html_mode,
+                                generate_properties=args.properties,
+                                density_field=args.density_field,
+                                generate_anchors=args.anchors,
+                                generate_thumbnails=args.png,
+                                thumbnail_size=args.thumbnail_size):
+        if record["error"] is None:
+            print("OK    %s %s" % (record["part_id"], " ".join(
+                path for path in [record["script"]] +
+                list(record["exports"].values()) if path is not None)))
+        else:
+            exit_code = 1
+            print("ERROR %s %s" % (record["part_id"], record["error"]))
+    return exit_code
+
+
+def _assembly(args):
+    from party.library_use import generate_assembly
+
+    formats = [output_format for output_format, wanted in
+               [("step", args.step), ("stl", args.stl)] if wanted]
+    paths = generate_assembly(args.library, formats=formats or ["step"],
+                              layout=args.layout, spacing=args.spacing,
+                              part_ids=args.part_ids, patterns=args.patterns,
+                              where=args.where)
+    for path in paths.values():
+        print(path)
+    return 0
+
+
+def _doc(args):
+    from party.library_documentation import create_libraries_sphinx_sources
+    create_libraries_sphinx_sources(args.libraries_folder, args.doc_folder,
+                                    processes=args.jobs,
+                                    group_by=args.group_by,
+                                    rows_per_page=args.rows_per_page)
+    return 0
+
+
+def _query(args):
+    from party.library_use import select_parts
+
+    json_file_content = load_library(args.library)
+    selection = select_parts(json_file_content["data"],
+                             part_ids=args.part_ids, patterns=args.patterns,
+                             where=args.where)
+    fields = args.fields.split(",") if args.fields else None
+    for part_id, part_values in selection:
+        if fields is None:
+            print(part_id)
+        else:
+            print(json.dumps([part_id] + [part_values.get(field)
+                                          for field in fields]))
+    return 0
+
+
+def _anchors(args):
+    from party.anchors import AnchorIndex
+
+    index = AnchorIndex(args.libraries)
+    for anchor in index.query(dimension=args.dimension,
+                              direction=args.direction,
+                              tolerance=args.tolerance,
+                              angle_tolerance=args.angle_tolerance):
+        print(json.dumps(anchor))
+    return 0
+
+
+def _bundle(args):
+    from party.bundle import create_bundle
+    print(create_bundle(args.library, bundle_path=args.output))
+    return 0
+
+
+def _extract(args):
+    from party.bundle import BundleReader
+    with BundleReader(args.bundle) as bundle:
+        for part_id in args.part_ids:
+            print(bundle.extract(part_id, args.format, args.output))
+    return 0
+
+
+def _daemon(args):
+    from party import daemon
+
+    if args.action == "start":
+        if daemon.ping(args.socket):
+            print("party daemon already running on %s" % args.socket)
+            return 0
+        daemon.start(args.socket, foreground=args.foreground)
+        return 0
+    elif args.action == "stop":
+        return 0 if daemon.stop(args.socket) else 1
+    else:
+        running = daemon.ping(args.socket)
+        print("party daemon %s on %s" % ("running" if running else
+                                         "not running", args.socket))
+        return 0 if running else 1
+
+
+def _parser():
+    import argparse
+    from party.daemon import default_socket_path
+
+    parser = argparse.ArgumentParser(prog="party",
+                                     description="Parts libraries tool")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="log the progress")
+    parser.add_argument("--daemon", action="store_true",
+                        default=os.environ.get("PARTY_DAEMON") == "1",
+                        help="run the command in the party daemon if it is "
+                             "running")
+    parser.add_argument("--socket", default=default_socket_path(),
+                        help="party daemon socket (default: %(default)s)")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="record the duration of the operations to "
+                             "this file")
+    parser.add_argument("--trace", metavar="JSON",
+                        help="record the duration of the operations to this "
+                             "Chrome trace-event file")
+    subparsers = parser.add_subparsers(dest="command")
+
+    create = subparsers.add_parser(
+        "create", help="create a library JSON file from its template")
+    create.add_argument("template", help="library_template.json file")
+    create.add_argument("-o", "--output", default="library.json",
+                        help="library file (default: %(default)s)")
+    create.set_defaults(function=_create)
+
+    check = subparsers.add_parser("check", help="check libraries")
+    check.add_argument("libraries", nargs="+",
+                       help="library JSON files or folders of libraries")
+    check.add_argument("-j", "--jobs", type=int, default=1,
+                       help="number of processes (default: %(default)s)")
+    check.add_argument("--scripts", action="store_true",
+                       help="also check the generated geometry scripts")
+    check.add_argument("--backend", default="ccad",
+                       help="geometry backend of the scripts checks "
+                            "(ccad or stub, default: %(default)s)")
+    check.set_defaults(function=_check)
+
+    generate = subparsers.add_parser(
+        "generate", help="generate the geometry scripts and CAD files")
+    generate.add_argument("library", help="library JSON file")
+    generate.add_argument("--step", action="store_true")
+    generate.add_argument("--stl", action="store_true")
+    generate.add_argument("--html", action="store_true")
+    generate.add_argument("--png", action="store_true",
+                          help="render PNG thumbnails")
+    generate.add_argument("--thumbnail-size", type=int, default=256,
+                          help="(default: %(default)s)")
+    generate.add_argument("-j", "--jobs", type=int, default=1,
+                          help="number of processes (default: %(default)s)")
+    generate.add_argument("--output-mode", default="scripts",
+                          choices=["scripts", "module", "both"],
+                          help="a geometry script per part, a single library "
+                               "module or both (default: %(default)s)")
+    generate.add_argument("--archive", choices=["zip", "tar", "tar.gz"],
+                          help="pack the generated files into an archive")
+    generate.add_argument("--stl-quality",
+                          choices=["preview", "standard", "fine"],
+                          help="mesh the parts with this preset and write "
+                               "binary STL files")
+    generate.add_argument("--html-mode", choices=["standalone", "shared"],
+                          default="standalone",
+                          help="a page per part, or meshes shown by a viewer "
+                               "shared by the parts")
+    generate.add_argument("--properties", action="store_true",
+                          help="write the geometric properties table")
+    generate.add_argument("--density-field",
+                          help="field giving the density of the parts, for "
+                               "their mass")
+    generate.add_argument("--anchors", action="store_true",
+                          help="write the anchors table")
+    _selection_arguments(generate)
+    generate.set_defaults(function=_generate)
+
+    assembly = subparsers.add_parser(
+        "assembly", help="export parts to a single STEP and/or STL file")
+    assembly.add_argument("library", help="library JSON file")
+    assembly.add_argument("--step", action="store_true",
+                          help="(default if no format is given)")
+    assembly.add_argument("--stl", action="store_true")
+    assembly.add_argument("--layout", default="grid",
+                          choices=["grid", "origin"],
+                          help="(default: %(default)s)")
+    assembly.add_argument("--spacing", type=float, default=10.,
+                          help="gap between the parts of the grid "
+                               "(default: %(default)s)")
+    _selection_arguments(assembly)
+    assembly.set_defaults(function=_assembly)
+
+    doc = subparsers.add_parser("doc", help="create the documentation")
+    doc.add_argument("libraries_folder")
+    doc.add_argument("doc_folder")
+    doc.add_argument("-j", "--jobs", type=int, default=None,
+                     help="number of processes (default: number of CPUs)")
+    doc.add_argument("--group-by",
+                     help="one documentation page per value of this field")
+    doc.add_argument("--rows-per-page", type=int)
+    doc.set_defaults(function=_doc)
+
+    query = subparsers.add_parser("query", help="select parts of a library")
+    query.add_argument("library", help="library JSON file")
+    _selection_arguments(query)
+    query.add_argument("--fields",
+                       help="comma separated fields to print as JSON")
+    query.set_defaults(function=_query)
+
+    anchors = subparsers.add_parser(
+        "anchors", help="find anchors in the anchors tables of libraries")
+    anchors.add_argument("libraries", nargs="+", metavar="library",
+                         help="library JSON file")
+    anchors.add_argument("--dimension", type=float)
+    anchors.add_argument("--direction", type=float, nargs=3,
+                         metavar=("X", "Y", "Z"))
+    anchors.add_argument("--tolerance", type=float, default=1e-6,
+                         help="tolerance on the dimension "
+                              "(default: %(default)s)")
+    anchors.add_argument("--angle-tolerance", type=float, default=1e-3,
+                         help="tolerance on the angle (rad) between the "
+                              "anchor direction and the --direction "
+                              "(default: %(default)s)")
+    anchors.set_defaults(function=_anchors)
+
+    bundle = subparsers.add_parser(
+        "bundle", help="bundle a library and its generated files")
+    bundle.add_argument("library", help="library JSON file")
+    bundle.add_argument("-o", "--output",
+                        help="bundle file (default: <library>.bundle.zip)")
+    bundle.set_defaults(function=_bundle)
+
+    extract = subparsers.add_parser(
+        "extract", help="extract part files from a bundle")
+    extract.add_argument("bundle", help="bundle file")
+    extract.add_argument("part_ids", nargs="+", metavar="part_id")
+    extract.add_argument("-f", "--format", default="step",
+                         choices=["script", "step", "stl", "html", "png"],
+                         help="(default: %(default)s)")
+    extract.add_argument("-o", "--output", default=".",
+                         help="output folder (default: %(default)s)")
+    extract.set_defaults(function=_extract)
+
+    daemon = subparsers.add_parser("daemon",
+                                   help="manage the party worker daemon")
+    daemon.add_argument("action", choices=["start", "stop", "status"])
+    daemon.add_argument("--foreground", action="store_true",
+                        help="do not detach the daemon")
+    daemon.set_defaults(function=_daemon)
+    return parser
+
+
+def run(argv):
+    r"""Run a party command in the current process
+
+    Parameters
+    ----------
+    argv : list of str
+        The command line arguments, without the program name
+
+    Returns
+    -------
+    int : the exit code
+
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+
+    if args.profile or args.trace:
+        with profile_run(json_path=args.profile, trace_path=args.trace):
+            return args.function(args)
+    return args.function(args)
+
+
+def main(argv=None):
+    r"""party command line entry point"""
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Only parse what is needed to decide where the command runs
+    from party.daemon import default_socket_path, request
+    use_daemon = os.environ.get("PARTY_DAEMON") == "1" or "--daemon" in argv
+    socket_path = default_socket_path()
+    if "--socket" in argv[:-1]:
+        socket_path = argv[argv.index("--socket") + 1]
+
+    if use_daemon and "daemon" not in argv:
+        response = request(socket_path, {"command": "run", "argv": argv,
+                                         "cwd": os.getcwd()})
+        if response is not None:
+            sys.stdout.write(response["stdout"])
+            sys.stderr.write(response["stderr"])
+            sys.exit(response["exit_code"])
+        logger.debug("No party daemon on %s, running locally" % socket_path)
+
+    logging.basicConfig(
+        level=logging.INFO if "-v" in argv or "--verbose" in argv
+        else logging.WARNING,
+        format='%(asctime)s :: %(levelname)6s :: %(module)20s :: '
+               '%(lineno)3d :: %(message)s')
+    sys.exit(run(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Long-lived local worker process for the party command line interface
+
+The daemon listens on a Unix socket and runs the party commands it receives
+one after the other, in its own process : the last parsed libraries
+(party.library_loading.enable_cache, used by the check, generate, doc and
+query commands), the compiled templates (party.templating.render_string)
+and the geometry kernel stay loaded between the commands.
+
+The socket is only accessible to the user who started the daemon, and the
+client only talks to a socket of the current user.
+
+Protocol : the client sends one JSON line and receives one JSON line.
+
+    {"command": "ping"} -> {"ok": true}
+    {"command": "run", "argv": [...], "cwd": "..."}
+        -> {"ok": true, "exit_code": 0, "stdout": "...", "stderr": "..."}
+    {"command": "shutdown"} -> {"ok": true}
+
+"""
+
+import errno
+import json
+import logging
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+
+logger = logging.getLogger(__name__)
+
+
+def _private_folder(folder_path):
+    r"""Create a folder only accessible to the current user, or check that
+    an existing one is
+
+    Raises
+    ------
+    RuntimeError if the folder belongs to another user or is accessible to
+    other users
+
+    """
+    try:
+        os.mkdir(folder_path, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    status = os.lstat(folder_path)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or \
+            status.st_mode & 0o077:
+        raise RuntimeError("%s must be a folder of the current user, only "
+                           "accessible to that user" % folder_path)
+    return folder_path
+
+
+def default_socket_path():
+    r"""The daemon socket path : the PARTY_DAEMON_SOCKET environment variable,
+    or party-daemon.sock in the runtime folder of the user (XDG_RUNTIME_DIR),
+    or in a party-<uid> folder of the temporary folder, only accessible to
+    the user
+
+    Raises
+    ------
+    RuntimeError if the party-<uid> folder belongs to another user or is
+    accessible to other users
+
+    """
+    try:
+        return os.environ["PARTY_DAEMON_SOCKET"]
+    except KeyError:
+        pass
+    runtime_folder = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_folder or not os.path.isdir(runtime_folder):
+        runtime_folder = _private_folder(os.path.join(
+            tempfile.gettempdir(), "party-%i" % os.getuid()))
+    return os.path.join(runtime_folder, "party-daemon.sock")
+
+
+def request(socket_path, message, timeout=None):
+    r"""Send a message to the daemon and wait for its response
+
+    Parameters
+    ----------
+    socket_path : str
+    message : dict
+    timeout : float, optional (default is None, i.e. no timeout)
+
+    Returns
+    -------
+    dict : the response, or None if no daemon of the current user listens
+           on socket_path
+
+    """
+    try:
+        if os.stat(socket_path).st_uid != os.getuid():
+            logger.warning("%s belongs to another user, ignored" %
+                           socket_path)
+            return None
+    except OSError:
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        try:
+            client.connect(socket_path)
+        except (socket.error, OSError):
+            return None
+        client.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        response = client.makefile("rb").readline()
+    finally:
+        client.close()
+    if not response:
+        return None
+    return json.loads(response.decode("utf-8"))
+
+
+def ping(socket_path):
+    r"""True if a daemon listens on socket_path"""
+    return request(socket_path, {"command": "ping"}, timeout=5.) is not None
+
+
+def stop(socket_path):
+    r"""Ask the daemon listening on socket_path to exit
+
+    Returns
+    -------
+    bool : False if no daemon listens on socket_path
+
+    """
+    return request(socket_path, {"command": "shutdown"}) is not None
+
+
+def _run(argv, cwd):
+    r"""Run a party command, capturing its output"""
+    from party.cli import run
+
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+
+    stdout, stderr = StringIO(), StringIO()
+    previous_cwd = os.getcwd()
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        os.chdir(cwd)
+        exit_code = run(argv)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+    except Exception as e:
+        logger.exception("Error running %s" % " ".join(argv))
+        stderr.write("%s\n" % repr(e))
+        exit_code = 1
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        os.chdir(previous_cwd)
+    return {"ok": True, "exit_code": exit_code or 0,
+            "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def _preload():
+    r"""Import the modules the commands need, so that the first command
+    does not pay for it"""
+    import party.cli
+    import party.library_checking
+    import party.library_creation
+    import party.library_documentation
+    import party.library_use
+    for module in ["jinja2", "ccad.model"]:
+        try:
+            __import__(module)
+        except ImportError:
+            logger.info("%s not available" % module)
+
+
+def serve(socket_path):
+    r"""Run the daemon in the current process, until a shutdown command
+
+    Parameters
+    ----------
+    socket_path : str
+
+    """
+    try:
+        import socketserver
+    except ImportError:
+        import SocketServer as socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            if not line:
+                return
+            message = json.loads(line.decode("utf-8"))
+            command = message.get("command")
+            if command == "run":
+                response = _run(message["argv"], message["cwd"])
+            elif command in ("ping", "shutdown"):
+                response = {"ok": True}
+            else:
+                response = {"ok": False,
+                            "error": "Unknown command : %s" % command}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            if command == "shutdown":
+                self.server.shutdown_requested = True
+
+    class Server(socketserver.UnixStreamServer):
+        shutdown_requested = False
+
+    if os.path.exists(socket_path):
+        if ping(socket_path):
+            raise RuntimeError("A party daemon already listens on %s"
+                               % socket_path)
+        os.remove(socket_path)
+
+    from party.library_loading import enable_cache
+
+    _preload()
+    # The socket is only accessible to the user from its creation
+    umask = os.umask(0o177)
+    try:
+        server = Server(socket_path, Handler)
+    finally:
+        os.umask(umask)
+    logger.info("party daemon listening on %s" % socket_path)
+    enable_cache()
+    try:
+        while not server.shutdown_requested:
+            server.handle_request()
+    finally:
+        enable_cache(size=0)
+        server.server_close()
+        os.remove(socket_path)
+    logger.info("party daemon stopped")
+
+
+def start(socket_path, foreground=False, timeout=30.):
+    r"""Start a daemon
+
+    Parameters
+    ----------
+    socket_path : str
+    foreground : bool, optional (default is False)
+        If True, serve in the current process (until a shutdown command),
+        otherwise start a detached process and wait until it listens
+    timeout : float, optional (default is 30.)
+        Time (s) to wait for the detached process to listen
+
+    Raises
+    ------
+    RuntimeError if the detached process does not listen in time
+
+    """
+    if foreground:
+        serve(socket_path)
+        return
+
+    import subprocess
+    import time
+
+    with open(os.devnull, "r+") as devnull:
+        subprocess.Popen([sys.executable, "-m", "party.daemon", socket_path],
+                         stdin=devnull, stdout=devnull, stderr=devnull,
+                         close_fds=True, preexec_fn=os.setsid)
+    end = time.time() + timeout
+    while time.time() < end:
+        if ping(socket_path):
+            return
+        time.sleep(0.05)
+    raise RuntimeError("The party daemon did not start on %s" % socket_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    serve(sys.argv[1] if len(sys.argv) > 1 else default_socket_path())
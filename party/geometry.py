@@ -0,0 +1,503 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Geometry backends used to run the geometry scripts and export the parts
+
+- 'ccad' : the real geometry kernel (ccad / pythonocc), imported the first
+  time it is needed
+- 'stub' : bounding box stand-in for ccad.model (see party.stub_model), for
+  validation only runs : checking that the scripts produce a part and
+  anchors, and computing rough extents. It cannot export CAD files.
+
+"""
+
+import imp
+import os
+import re
+import sys
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Backend(object):
+    r"""Interface of the geometry backends"""
+    name = None
+
+    def load_script(self, script_path):
+        r"""Run a geometry script
+
+        Parameters
+        ----------
+        script_path : str
+            Path to the Python geometry script
+
+        Returns
+        -------
+        module : the script as a module (with 'part' and 'anchors' attributes)
+
+        Raises
+        ------
+        IOError : if script_path points to a nonexistent file
+
+        """
+        raise NotImplementedError
+
+    def load_part(self, module_path, part_id):
+        r"""Build a part of a library module (see
+        party.templating.library_module_code)
+
+        Parameters
+        ----------
+        module_path : str
+            Path to the library module
+        part_id : str
+
+        Returns
+        -------
+        tuple(part, anchors)
+
+        Raises
+        ------
+        IOError : if module_path points to a nonexistent file
+        KeyError : if the module has no such part
+
+        """
+        return _library_module(module_path).get_part(part_id)
+
+    def is_solid(self, part):
+        r"""True if part is a Solid"""
+        raise NotImplementedError
+
+    def is_null(self, part):
+        r"""True if the shape of part is Null"""
+        raise NotImplementedError
+
+    def bounds(self, part):
+        r"""Bounding box of part : (xmin, ymin, zmin, xmax, ymax, zmax)"""
+        raise NotImplementedError
+
+    def export(self, part, file_path, output_format):
+        r"""Export part to a file
+
+        Parameters
+        ----------
+        part : the part built by a geometry script
+        file_path : str
+        output_format : str
+            'step', 'stl' or 'html'
+
+        """
+        raise NotImplementedError
+
+    def triangles(self, part, linear_deflection, angular_deflection):
+        r"""Tessellation of part
+
+        Parameters
+        ----------
+        part : the part built by a geometry script
+        linear_deflection : float
+            Maximum distance between the mesh and the surfaces
+        angular_deflection : float
+            Maximum angle (rad) between the normals of adjacent triangles
+
+        Yields
+        ------
+        tuple of 3 vertices (tuples of 3 floats), counterclockwise seen from
+        the outside of the part
+
+        """
+        raise NotImplementedError
+
+    def geometry_size(self, part):
+        r"""Approximate memory size of part (bytes), bounding the geometry
+        caches (see GeometryCache)"""
+        return DEFAULT_GEOMETRY_SIZE
+
+    def properties(self, part):
+        r"""Geometric properties of part
+
+        The default implementation integrates over the triangles of a fine
+        tessellation of the part (see party.properties.mesh_properties)
+
+        Returns
+        -------
+        OrderedDict with the keys bounds (xmin, ymin, zmin, xmax, ymax, zmax),
+        volume, area and centroid (x, y, z)
+
+        """
+        from party.properties import mesh_properties
+        return mesh_properties(self.triangles(part, *PROPERTIES_DEFLECTIONS))
+
+    def translated(self, part, vector):
+        r"""A translated copy of part
+
+        Parameters
+        ----------
+        part : the part built by a geometry script
+        vector : tuple of 3 floats
+
+        """
+        raise NotImplementedError
+
+    def export_assembly(self, parts, file_path, output_format):
+        r"""Export several parts to a single file, in a single writer session
+
+        Parameters
+        ----------
+        parts : list of tuple(name, part)
+        file_path : str
+        output_format : str
+            'step' (one body per part) or 'stl'
+
+        """
+        raise NotImplementedError
+
+
+# Linear deflection of the STL meshes
+STL_DEFLECTION = 0.01
+
+# Linear and angular deflections of the tessellation integrated by the
+# default Backend.properties()
+PROPERTIES_DEFLECTIONS = (0.005, 0.1)
+
+# Approximate memory size (bytes) of a part, when the backend cannot tell
+DEFAULT_GEOMETRY_SIZE = 64 * 1024
+
+# Approximate memory size (bytes) of a B-Rep face (surface, edges, pcurves
+# and triangulation)
+FACE_GEOMETRY_SIZE = 16 * 1024
+
+
+class GeometryCache(object):
+    r"""Least recently used geometries, bounded by their approximate size
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum total size (bytes) of the cached geometries. A geometry
+        larger than max_size is not cached.
+
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # values: (geometry, size)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        r"""The geometry cached for key, or None"""
+        try:
+            geometry, size = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        # Most recently used last
+        self._entries[key] = (geometry, size)
+        self.hits += 1
+        return geometry
+
+    def put(self, key, geometry, size):
+        r"""Cache a geometry of this approximate size (bytes), evicting the
+        least recently used geometries if needed"""
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[1]
+        if size > self.max_size:
+            return
+        self._entries[key] = (geometry, size)
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+def _occ(name):
+    r"""Import a pythonocc module (OCC.Core.<name>, or OCC.<name> for the
+    pythonocc versions used by ccad)"""
+    import importlib
+    try:
+        return importlib.import_module("OCC.Core.%s" % name)
+    except ImportError:
+        return importlib.import_module("OCC.%s" % name)
+
+
+# Loaded library modules, by path, with the modification time and size of
+# the file when it was loaded
+_library_modules = dict()
+
+
+def _library_module(module_path):
+    r"""Load a library module, or reuse it if it was already loaded and the
+    file did not change since"""
+    stat = os.stat(module_path)
+    signature = (getattr(stat, "st_mtime_ns", stat.st_mtime), stat.st_size)
+    try:
+        cached_signature, module = _library_modules[module_path]
+        if cached_signature == signature:
+            return module
+    except KeyError:
+        pass
+    # The library module does not import ccad when loaded
+    module = imp.load_source(
+        "party_library_%s" % re.sub(r"\W", "_", os.path.abspath(module_path)),
+        module_path)
+    _library_modules[module_path] = (signature, module)
+    return module
+
+
+class CcadBackend(Backend):
+    r"""The ccad geometry kernel"""
+    name = "ccad"
+
+    @property
+    def model(self):
+        import ccad.model
+        return ccad.model
+
+    def load_script(self, script_path):
+        return imp.load_source(script_path, script_path)
+
+    def is_solid(self, part):
+        return isinstance(part, self.model.Solid)
+
+    def is_null(self, part):
+        return part.shape.IsNull()
+
+    def bounds(self, part):
+        return tuple(part.bounds())
+
+    def export(self, part, file_path, output_format):
+        if output_format == "step":
+            part.to_step(file_path)
+        elif output_format == "stl":
+            part.to_stl(file_path)
+        elif output_format == "html":
+            part.to_html(file_path)
+        else:
+            raise ValueError("Unknown output format : %s" % output_format)
+
+    def triangles(self, part, linear_deflection, angular_deflection):
+        BRep, TopAbs, TopoDS = _occ("BRep"), _occ("TopAbs"), _occ("TopoDS")
+        TopExp, TopLoc = _occ("TopExp"), _occ("TopLoc")
+        # The names differ between the pythonocc versions
+        triangulation_of = getattr(BRep, "BRep_Tool_Triangulation", None) or \
+            BRep.BRep_Tool.Triangulation
+        to_face = getattr(TopoDS, "topods_Face", None) or TopoDS.topods.Face
+
+        _occ("BRepMesh").BRepMesh_IncrementalMesh(
+            part.shape, linear_deflection, False, angular_deflection, True)
+        explorer = TopExp.TopExp_Explorer(part.shape, TopAbs.TopAbs_FACE)
+        while explorer.More():
+            face = to_face(explorer.Current())
+            explorer.Next()
+            location = TopLoc.TopLoc_Location()
+            triangulation = triangulation_of(face, location)
+            if hasattr(triangulation, "GetObject"):  # handle
+                if triangulation.IsNull():
+                    continue
+                triangulation = triangulation.GetObject()
+            elif triangulation is None:
+                continue
+            node = triangulation.Node if hasattr(triangulation, "Node") \
+                else triangulation.Nodes().Value
+            triangle = triangulation.Triangle \
+                if hasattr(triangulation, "Triangle") \
+                else triangulation.Triangles().Value
+            transformation = location.Transformation()
+            nodes = [node(i).Transformed(transformation).Coord()
+                     for i in range(1, triangulation.NbNodes() + 1)]
+            reversed_ = face.Orientation() == TopAbs.TopAbs_REVERSED
+            for i in range(1, triangulation.NbTriangles() + 1):
+                n1, n2, n3 = triangle(i).Get()
+                if reversed_:
+                    n2, n3 = n3, n2
+                yield nodes[n1 - 1], nodes[n2 - 1], nodes[n3 - 1]
+
+    def geometry_size(self, part):
+        TopAbs, TopExp = _occ("TopAbs"), _occ("TopExp")
+        faces = 0
+        explorer = TopExp.TopExp_Explorer(part.shape, TopAbs.TopAbs_FACE)
+        while explorer.More():
+            faces += 1
+            explorer.Next()
+        return max(faces, 1) * FACE_GEOMETRY_SIZE
+
+    def properties(self, part):
+        r"""Exact properties, from the B-Rep"""
+        GProp, BRepGProp = _occ("GProp"), _occ("BRepGProp")
+        # The names differ between the pythonocc versions
+        volume_properties = getattr(
+            BRepGProp, "brepgprop_VolumeProperties", None) or \
+            BRepGProp.brepgprop.VolumeProperties
+        surface_properties = getattr(
+            BRepGProp, "brepgprop_SurfaceProperties", None) or \
+            BRepGProp.brepgprop.SurfaceProperties
+
+        volume = GProp.GProp_GProps()
+        volume_properties(part.shape, volume)
+        area = GProp.GProp_GProps()
+        surface_properties(part.shape, area)
+        return OrderedDict([("bounds", list(self.bounds(part))),
+                            ("volume", volume.Mass()),
+                            ("area", area.Mass()),
+                            ("centroid", list(
+                                volume.CentreOfMass().Coord()))])
+
+    def translated(self, part, vector):
+        moved = part.copy()
+        moved.translate(vector)
+        return moved
+
+    def export_assembly(self, parts, file_path, output_format):
+        if output_format == "step":
+            STEPControl = _occ("STEPControl")
+            Interface = _occ("Interface")
+            writer = STEPControl.STEPControl_Writer()
+            for name, part in parts:
+                # The parts are named products of the STEP file
+                Interface.Interface_Static_SetCVal("write.step.product.name",
+                                                   str(name))
+                writer.Transfer(part.shape, STEPControl.STEPControl_AsIs)
+            if writer.Write(str(file_path)) != _occ(
+                    "IFSelect").IFSelect_RetDone:
+                raise IOError("Could not write %s" % file_path)
+        elif output_format == "stl":
+            TopoDS, BRep = _occ("TopoDS"), _occ("BRep")
+            compound = TopoDS.TopoDS_Compound()
+            builder = BRep.BRep_Builder()
+            builder.MakeCompound(compound)
+            for _, part in parts:
+                builder.Add(compound, part.shape)
+            _occ("BRepMesh").BRepMesh_IncrementalMesh(compound,
+                                                      STL_DEFLECTION)
+            writer = _occ("StlAPI").StlAPI_Writer()
+            writer.SetASCIIMode(False)
+            writer.Write(compound, str(file_path))
+        else:
+            raise ValueError("Unsupported assembly format : %s" %
+                             output_format)
+
+
+class StubBackend(Backend):
+    r"""Runs the geometry scripts with party.stub_model in place of
+    ccad.model"""
+    name = "stub"
+
+    # sys.modules is shared by every thread
+    _lock = threading.Lock()
+
+    @contextmanager
+    def _ccad_substituted(self):
+        r"""Make party.stub_model importable as ccad.model in the block"""
+        from party import stub_model
+        substitutes = {"ccad": imp.new_module("ccad"),
+                       "ccad.model": stub_model}
+        substitutes["ccad"].model = stub_model
+        with self._lock:
+            previous_modules = dict((name, sys.modules.get(name))
+                                    for name in substitutes)
+            sys.modules.update(substitutes)
+            try:
+                yield
+            finally:
+                for name, module in previous_modules.items():
+                    if module is None:
+                        del sys.modules[name]
+                    else:
+                        sys.modules[name] = module
+
+    def load_script(self, script_path):
+        with self._ccad_substituted():
+            return imp.load_source(script_path, script_path)
+
+    def load_part(self, module_path, part_id):
+        # The library module functions import ccad.model when called
+        with self._ccad_substituted():
+            return _library_module(module_path).get_part(part_id)
+
+    def is_solid(self, part):
+        from party import stub_model
+        return isinstance(part, stub_model.Solid)
+
+    def is_null(self, part):
+        return part.IsNull()
+
+    def bounds(self, part):
+        return part.bounds()
+
+    def export(self, part, file_path, output_format):
+        raise ValueError("The stub geometry backend cannot export CAD files")
+
+    def triangles(self, part, linear_deflection, angular_deflection):
+        raise ValueError("The stub geometry backend cannot mesh the parts")
+
+    def properties(self, part):
+        r"""Properties of the bounding box of part (rough, as the bounds)"""
+        bounds = part.bounds()
+        if bounds is None:
+            return OrderedDict([("bounds", None), ("volume", None),
+                                ("area", None), ("centroid", None)])
+        dx, dy, dz = [bounds[i + 3] - bounds[i] for i in range(3)]
+        return OrderedDict([
+            ("bounds", list(bounds)),
+            ("volume", dx * dy * dz),
+            ("area", 2. * (dx * dy + dy * dz + dz * dx)),
+            ("centroid", [(bounds[i] + bounds[i + 3]) / 2.
+                          for i in range(3)])])
+
+    def translated(self, part, vector):
+        moved = part.copy()
+        moved.translate(vector)
+        return moved
+
+    def export_assembly(self, parts, file_path, output_format):
+        raise ValueError("The stub geometry backend cannot export CAD files")
+
+
+_backends = {"ccad": CcadBackend(), "stub": StubBackend()}
+
+
+def register_backend(backend):
+    r"""Make a backend available to get_backend() under its name
+
+    Parameters
+    ----------
+    backend : Backend
+
+    """
+    _backends[backend.name] = backend
+
+
+def get_backend(backend="ccad"):
+    r"""Get a geometry backend
+
+    Parameters
+    ----------
+    backend : str or Backend, optional (default is 'ccad')
+        The backend name ('ccad', 'stub' or a registered backend name) or a
+        Backend instance (returned as is)
+
+    Returns
+    -------
+    Backend
+
+    Raises
+    ------
+    ValueError if there is no backend with this name
+
+    """
+    if isinstance(backend, Backend):
+        return backend
+    try:
+        return _backends[backend]
+    except KeyError:
+        raise ValueError("Unknown geometry backend : %s" % backend)
@@ -5,6 +5,13 @@ r"""Parts library checks"""
 
 import json
 import logging
+import os
+
+from collections import OrderedDict
+
+from party.library_loading import load_library, LIBRARY_FILE_NAME
+from party.profiling import stage
+from party.templating import template_names
 
 
 logger = logging.getLogger(__name__)
@@ -31,41 +38,46 @@ def check_library_json_rules(json_filename):
     SyntaxError if there is a syntax error in the rules definition
 
     """
-    with open(json_filename) as data_file:
-        json_file_content = json.load(data_file)
+    json_file_content = load_library(json_filename)
+
+    return _check_rules(json_file_content["rules"],
+                        json_file_content["data"].items())
+
+
+def _check_rules(rules, parts):
+    r"""Check parts against rules
+
+    Parameters
+    ----------
+    rules : list of str
+        The 'rules' section of a library
+    parts : iterable of tuple(part_id, part_values)
+        Entries of the 'data' section of a library
+
+    Returns
+    -------
+    tuple(bool, errors) : see check_library_json_rules()
+
+    Raises
+    ------
+    NameError if a rule uses a name that is not a field of a part
+    SyntaxError if a rule is not a Python expression
 
+    """
     library_ok = True
     errors = dict()
 
-    for part_id, part_values in json_file_content["data"].items():
-        # assign the values to a Python variable with the same name
-        for dict_entry_key, dict_entry_value in part_values.items():
-            if type(dict_entry_value) not in [unicode, str]:
-                instruction = "%s = %s" % (dict_entry_key, dict_entry_value)
-            else:
-                instruction = "%s = '%s'" % (dict_entry_key, dict_entry_value)
-            exec(instruction)
-
-        for rule in json_file_content["rules"]:
-            instruction = "bool_ = %s" % rule
-            # logger.info("Checking '%s' for part %s" % (rule, part_id))
-            try:
-                exec(instruction)
-                if bool_ is True:
-                    # logger.info("OK")
-                    pass
-                else:
-                    library_ok = False
-                    if part_id not in errors.keys():
-                        errors[part_id] = list()
-                    errors[part_id].append(rule)
-                    logger.error("Library data definition error")
-            except NameError:
+    compiled_rules = [(rule, compile(rule, "<rule>", "eval"))
+                      for rule in rules]
+    for part_id, part_values in parts:
+        for rule, compiled_rule in compiled_rules:
+            # The part values are the variables of the rule, a NameError is
+            # a rules definition error
+            if eval(compiled_rule, {}, dict(part_values)) is not True:
                 library_ok = False
-                if part_id not in errors.keys():
-                    errors[part_id] = list()
-                errors[part_id].append(rule)
-                logger.error("Rules definition error (NameError)")
+                errors.setdefault(part_id, list()).append(rule)
+                logger.error("Library data definition error : %s breaks %s"
+                             % (part_id, rule))
 
     return library_ok, errors
 
@@ -90,16 +102,16 @@ def check_library_units_definition(json_filename):
     library_ok = True
     errors = dict()
 
-    fields = list()
+    fields = set(["description", "generator"])
+    unit_fields = set()
 
-    with open(json_filename) as data_file:
-        json_file_content = json.load(data_file)
+    json_file_content = load_library(json_filename)
 
     for unit, definition in json_file_content["metadata"]["units"].items():
         try:
             for field in definition[1]:
-                if field not in fields:
-                    fields.append(field)
+                if field not in unit_fields:
+                    unit_fields.add(field)
                 else:
                     library_ok = False
                     if "units definition" not in errors.keys():
@@ -110,23 +122,79 @@ def check_library_units_definition(json_filename):
             if "units definition" not in errors.keys():
                         errors["units definition"] = list()
             errors["units definition"].append("Improperly defined units : %s " % str(unit))
+    fields.update(unit_fields)
+
+    # Most parts share the same keys : the undefined fields are only
+    # computed once for each distinct sequence of keys
+    undefined_fields_cache = dict()
 
     for part_id, part_values in json_file_content["data"].items():
-        for dict_entry_key in part_values.keys():
-            if dict_entry_key in fields or \
-                            dict_entry_key in ["description", "generator"]:
-                pass
-            else:
-                library_ok = False
-                if part_id not in errors.keys():
-                    errors[part_id] = list()
+        keys = tuple(part_values.keys())
+        try:
+            undefined_fields = undefined_fields_cache[keys]
+        except KeyError:
+            undefined_fields = [key for key in keys if key not in fields]
+            undefined_fields_cache[keys] = undefined_fields
+
+        if undefined_fields:
+            library_ok = False
+            if part_id not in errors:
+                errors[part_id] = list()
+            for dict_entry_key in undefined_fields:
                 errors[part_id].append("field '%s' not defined in units" % dict_entry_key)
                 logger.error("Library data definition error")
 
     return library_ok, errors
 
 
-def check_library_fields(json_filename):
+def group_parts_by_fields(json_data):
+    r"""Group the parts of the 'data' section of a library by set of fields
+
+    Parameters
+    ----------
+    json_data : dict
+        The 'data' section of the library (keys: part ids, values: dict)
+
+    Returns
+    -------
+    OrderedDict (keys: frozenset of fields, values: list of part ids)
+        The groups are in the order of their first part in json_data
+
+    """
+    groups = OrderedDict()
+    for part_id, part_values in json_data.items():
+        groups.setdefault(frozenset(part_values.keys()), list()).append(part_id)
+    return groups
+
+
+def _reference_fields(groups, reference):
+    r"""Reference set of fields among groups of parts
+
+    Parameters
+    ----------
+    groups : OrderedDict
+        As returned by group_parts_by_fields()
+    reference : str
+        'first' : the fields of the first part
+        'majority' : the fields shared by the largest number of parts
+
+    Returns
+    -------
+    frozenset
+
+    """
+    if len(groups) == 0:
+        return frozenset()
+    if reference == "first":
+        return next(iter(groups))
+    elif reference == "majority":
+        # max() keeps the first group in case of a tie
+        return max(groups, key=lambda fields: len(groups[fields]))
+    else:
+        raise ValueError("Unknown reference : %s" % reference)
+
+
+def check_library_fields(json_filename, reference="first"):
     r"""Check that every entry in the 'data' section if the library JSON
     file has the same fields (order does not matter)
 
@@ -134,6 +202,9 @@ def check_library_fields(json_filename):
     ----------
     json_filename : str
         Path to the JSON file that describes the parts library
+    reference : str, optional (default is 'first')
+        How to choose the reference set of fields : 'first' uses the fields of
+        the first entry, 'majority' uses the fields of most entries
 
     Returns
     -------
@@ -145,41 +216,154 @@ def check_library_fields(json_filename):
     library_ok = True
     errors = dict()
 
-    reference_set_of_fields = set()
+    json_file_content = load_library(json_filename)
 
-    with open(json_filename) as data_file:
-        json_file_content = json.load(data_file)
-
-    # Populate the reference set of fields
-    feed = True  # Hackish way to only consider the first dictionnary entry
-    for part_id, part_values in json_file_content["data"].items():
-        if feed is True:
-            for dict_entry_key in part_values.keys():
-                reference_set_of_fields.add(dict_entry_key)
-        feed = False
+    groups = group_parts_by_fields(json_file_content["data"])
+    reference_fields = _reference_fields(groups, reference)
+    reference_set_of_fields = set(reference_fields)
 
     logger.info("Reference set of fields : %s" % str(reference_set_of_fields))
 
-    # Check the set of fields in the data section
+    # Check each distinct set of fields in the data section
     # against the reference set of fields
-    for part_id, part_values in json_file_content["data"].items():
-        current_set_of_fields = set()
-        for dict_entry_key in part_values.keys():
-            current_set_of_fields.add(dict_entry_key)
-
-        if current_set_of_fields == reference_set_of_fields:
-            pass
-        else:
+    for fields, part_ids in groups.items():
+        if fields != reference_fields:
             library_ok = False
-            current_minus_ref = current_set_of_fields.difference(
-                reference_set_of_fields)
-            ref_minus_current = reference_set_of_fields.difference(
-                current_set_of_fields)
-            errors[part_id] = current_minus_ref.union(ref_minus_current)
+            difference = fields.symmetric_difference(reference_fields)
+            for part_id in part_ids:
+                errors[part_id] = set(difference)
 
     return library_ok, errors, reference_set_of_fields
 
 
+def check_library_field_shapes(json_filename):
+    r"""Group the entries of the 'data' section of the library JSON file by
+    set of fields and report the sets of fields that differ from the one of
+    the majority of entries
+
+    Parameters
+    ----------
+    json_filename : str
+        Path to the JSON file that describes the parts library
+
+    Returns
+    -------
+    tuple(bool, shapes, reference_set_of_fields)
+        bool : True if every entry has the same fields, False otherwise
+        shapes : OrderedDict (keys: frozenset of fields of a minority of
+                 entries, values: list of the part identifiers of these entries)
+        reference_set_of_fields : set of the fields of the majority of entries
+
+    """
+    json_file_content = load_library(json_filename)
+
+    groups = group_parts_by_fields(json_file_content["data"])
+    reference_fields = _reference_fields(groups, "majority")
+
+    shapes = OrderedDict((fields, part_ids)
+                         for fields, part_ids in groups.items()
+                         if fields != reference_fields)
+
+    logger.info("Reference set of fields (%i parts) : %s" %
+                (len(groups.get(reference_fields, [])),
+                 str(sorted(reference_fields))))
+    for fields, part_ids in shapes.items():
+        logger.error("%i part(s) missing %s, with extra %s : %s" %
+                     (len(part_ids),
+                      str(sorted(reference_fields.difference(fields))),
+                      str(sorted(fields.difference(reference_fields))),
+                      ", ".join(part_ids)))
+
+    return len(shapes) == 0, shapes, set(reference_fields)
+
+
+def check_duplicate_part_ids(json_filename):
+    r"""Check that no part id is defined more than once in the 'data' section
+    of the library JSON file
+
+    json.load() silently keeps the last definition of a duplicated key, so the
+    raw JSON is parsed with an object_pairs_hook that sees every key
+
+    Parameters
+    ----------
+    json_filename : str
+        Path to the JSON file that describes the parts library
+
+    Returns
+    -------
+    tuple(bool, errors)
+        bool : True if the library is OK, False otherwise
+        errors : dict (keys: part_identifier, values: number of definitions)
+
+    """
+    duplicates = dict()  # id of the JSON object -> {key: count}
+
+    def _pairs_hook(pairs):
+        obj = OrderedDict()
+        counts = dict()
+        for key, value in pairs:
+            if key in obj:
+                counts[key] = counts.get(key, 1) + 1
+            obj[key] = value
+        if counts:
+            duplicates[id(obj)] = counts
+        return obj
+
+    with open(json_filename) as data_file:
+        json_file_content = json.load(data_file, object_pairs_hook=_pairs_hook)
+
+    errors = duplicates.get(id(json_file_content["data"]), dict())
+    for part_id, count in errors.items():
+        logger.error("Part id %s is defined %i times" % (part_id, count))
+
+    return len(errors) == 0, errors
+
+
+def check_duplicate_geometries(json_filename):
+    r"""Check that no two parts of the library have the same geometry, i.e.
+    the same generator code used with the same parameter values
+
+    Only the fields used in the Jinja expressions and statements of the
+    generator code are compared, so parts differing only by their description
+    (or by other fields that do not change the geometry) are reported as
+    duplicates
+
+    Parameters
+    ----------
+    json_filename : str
+        Path to the JSON file that describes the parts library
+
+    Returns
+    -------
+    tuple(bool, errors)
+        bool : True if the library is OK, False otherwise
+        errors : dict (keys: first part_identifier of a group of duplicates,
+                       values: list of the part identifiers in the group)
+
+    """
+    json_file_content = load_library(json_filename)
+
+    generators = json_file_content["generators"]
+    placeholders = dict((generator_id, template_names(code))
+                        for generator_id, code in generators.items())
+
+    groups = OrderedDict()
+    for part_id, part_values in json_file_content["data"].items():
+        generator_id = part_values["generator"]
+        signature = json.dumps(
+            [generators[generator_id],
+             [[name, part_values.get(name)]
+              for name in placeholders[generator_id]]])
+        groups.setdefault(signature, list()).append(part_id)
+
+    errors = OrderedDict((part_ids[0], part_ids)
+                         for part_ids in groups.values() if len(part_ids) > 1)
+    for part_ids in errors.values():
+        logger.warning("Parts with the same geometry : %s" % ", ".join(part_ids))
+
+    return len(errors) == 0, errors
+
+
 def check_all(json_filename):
     r"""Perform every possible test on the library
 
@@ -196,11 +380,19 @@ def check_all(json_filename):
 
     """
     logger.info("Checking the library %s  ..." % json_filename)
-    ok_rules, errors_rules = check_library_json_rules(json_filename)
-    ok_units, errors_units = check_library_units_definition(json_filename)
-    ok_fields, errors_fields, _ = check_library_fields(json_filename)
-
-    ok = all(list_element is True for list_element in [ok_rules, ok_units, ok_fields])
+    with stage("check_all", library=json_filename):
+        with stage("check_rules"):
+            ok_rules, errors_rules = check_library_json_rules(json_filename)
+        with stage("check_units"):
+            ok_units, errors_units = \
+                check_library_units_definition(json_filename)
+        with stage("check_fields"):
+            ok_fields, errors_fields, _ = check_library_fields(json_filename)
+        with stage("check_part_ids"):
+            ok_ids, errors_ids = check_duplicate_part_ids(json_filename)
+
+    ok = all(list_element is True
+             for list_element in [ok_rules, ok_units, ok_fields, ok_ids])
 
     if ok is True:
         logger.info("...done - All OK")
@@ -209,6 +401,127 @@ def check_all(json_filename):
         logger.info("rules ok : %s" % str(ok_rules))
         logger.info("units ok : %s" % str(ok_units))
         logger.info("fields ok : %s" % str(ok_fields))
+        logger.info("part ids ok : %s" % str(ok_ids))
+
+    return ([ok_rules, ok_units, ok_fields, ok_ids],
+            [errors_rules, errors_units, errors_fields, errors_ids])
+
+
+def find_libraries(folder_path):
+    r"""Find the parts libraries in a folder tree
+
+    Parameters
+    ----------
+    folder_path : str
+        Root folder of the search
+
+    Returns
+    -------
+    list of str : sorted paths to the files named LIBRARY_FILE_NAME
+                  (library.json)
+
+    """
+    libraries = list()
+    for root, dirs, files in os.walk(folder_path):
+        if LIBRARY_FILE_NAME in files:
+            libraries.append(os.path.join(root, LIBRARY_FILE_NAME))
+    return sorted(libraries)
 
-    return ([ok_rules, ok_units, ok_fields],
-            [errors_rules, errors_units, errors_fields])
+
+def _chunks(items, chunk_size):
+    r"""Split a list in consecutive chunks of at most chunk_size items"""
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def _check_rules_star(args):
+    r"""_check_rules() taking a single (rules, parts) tuple, for Pool.map()"""
+    return _check_rules(*args)
+
+
+def _map(function, iterable, processes):
+    r"""Map function over iterable in a pool of processes
+
+    The results are in the order of iterable, whatever the order in which the
+    processes complete. processes=1 maps in the current process.
+
+    """
+    if processes == 1:
+        return [function(item) for item in iterable]
+    from multiprocessing import Pool
+    pool = Pool(processes)
+    try:
+        return pool.map(function, iterable)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def check_library_json_rules_parallel(json_filename, processes=None,
+                                      chunk_size=1000):
+    r"""Parallel version of check_library_json_rules() for large libraries :
+    the 'data' section is split in chunks that are checked in a pool of
+    processes
+
+    Parameters
+    ----------
+    json_filename : str
+        Path to the JSON file that describes the parts library
+    processes : int, optional (default is None)
+        Number of worker processes (None : number of CPUs)
+    chunk_size : int, optional (default is 1000)
+        Number of parts checked by a worker at a time
+
+    Returns
+    -------
+    tuple(bool, errors)
+        bool : True if the library is OK, False otherwise
+        errors : OrderedDict (keys: part_identifier, values: list of broken
+                 rules), in the order of the 'data' section
+
+    Raises
+    ------
+    NameError if the rules definition contain wrong identifiers
+    SyntaxError if there is a syntax error in the rules definition
+
+    """
+    json_file_content = load_library(json_filename)
+
+    rules = json_file_content["rules"]
+    chunks = _chunks(list(json_file_content["data"].items()), chunk_size)
+    results = _map(_check_rules_star, [(rules, chunk) for chunk in chunks],
+                   processes)
+
+    library_ok = all(ok is True for ok, _ in results)
+    errors = OrderedDict()
+    for chunk, (_, chunk_errors) in zip(chunks, results):
+        for part_id, _ in chunk:
+            if part_id in chunk_errors:
+                errors[part_id] = chunk_errors[part_id]
+
+    return library_ok, errors
+
+
+def check_all_libraries(libraries, processes=None):
+    r"""Perform every possible test on many libraries in a pool of processes
+
+    Parameters
+    ----------
+    libraries : str or list of str
+        Root folder of the libraries (see find_libraries()) or list of paths
+        to library JSON files
+    processes : int, optional (default is None)
+        Number of worker processes (None : number of CPUs)
+
+    Returns
+    -------
+    OrderedDict (keys: path to the library JSON file,
+                 values: the check_all() result for the library)
+        In the order of libraries (sorted paths if libraries is a folder)
+
+    """
+    if isinstance(libraries, str) or not hasattr(libraries, "__iter__"):
+        libraries = find_libraries(libraries)
+    libraries = list(libraries)
+    logger.info("Checking %i libraries ..." % len(libraries))
+    results = _map(check_all, libraries, processes)
+    return OrderedDict(zip(libraries, results))
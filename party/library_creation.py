@@ -21,7 +21,9 @@ import logging
 
 from collections import OrderedDict
 
+from party.output import OutputWriter
 from party.templating import render, to_json_string
+from party.profiling import stage
 
 
 logger = logging.getLogger(__name__)
@@ -203,25 +205,37 @@ def autocreate_library(template_file, library_file_name="library.json",
                 str(info["generators"]))
     logger.info("template file has aliases : %s" % str(info["aliases"]))
 
-    template_folder = os.path.dirname(template_file)
-    tmp_path = os.path.join(template_folder, "tmp.json")
     # final_path = os.path.join(template_folder, library_file_name)
-    final_path = library_file_name
-
-    if info["generators"] is True:
-        # template_handle_generators(template_file, tmp_path)
-        if info["aliases"] is True:
-            template_handle_generators(template_file, tmp_path)
-            template_handle_aliases(tmp_path, final_path)
-            if delete_intermediate is True:
-                os.remove(tmp_path)
+    final_folder, final_name = os.path.split(library_file_name)
+
+    # The library file is moved in place once complete, an interrupted
+    # creation does not leave a half-written library file
+    with OutputWriter(final_folder) as writer, \
+            stage("autocreate_library", template=template_file):
+        final_path = writer.staged_path(final_name)
+        if delete_intermediate is True:
+            tmp_path = os.path.join(writer.staging_folder, "tmp.json")
         else:
-            template_handle_generators(template_file, final_path)
-    else:
-        if info["aliases"] is True:
-            template_handle_aliases(template_file, final_path)
+            tmp_path = os.path.join(os.path.dirname(template_file),
+                                    "tmp.json")
+
+        if info["generators"] is True:
+            # template_handle_generators(template_file, tmp_path)
+            if info["aliases"] is True:
+                with stage("template_handle_generators"):
+                    template_handle_generators(template_file, tmp_path)
+                with stage("template_handle_aliases"):
+                    template_handle_aliases(tmp_path, final_path)
+            else:
+                with stage("template_handle_generators"):
+                    template_handle_generators(template_file, final_path)
+        else:
+            if info["aliases"] is True:
+                with stage("template_handle_aliases"):
+                    template_handle_aliases(template_file, final_path)
 
-    template_handle_nomenclature(final_path, final_path)
+        with stage("template_handle_nomenclature"):
+            template_handle_nomenclature(final_path, final_path)
 
     logger.info("...done")
 
@@ -274,7 +288,7 @@ def template_handle_aliases(file_in, file_out):
     for name, context_ in json_content["data"].items():
         # modify context with the alias mechanism
         while has_aliases(context_):
-            for k, v in context_.items():
+            for k, v in list(context_.items()):
                 if "__alias__" in str(v):
                     key_in_aliases = str(v).replace("__alias__", "")
                     for alias_key, alias_value in \
@@ -355,26 +369,36 @@ def template_handle_nomenclature(file_in, file_out):
         The output file
         (i.e. a template with replaced {{ generators }} tag or the final file)
 
+    Raises
+    ------
+    ValueError if a part keeps its id because its computed id is already
+    used, and that id is also already used
+
     """
     with open(file_in) as fi:
         json_content = json.load(fi, object_pairs_hook=OrderedDict)
 
     try:
         nomenclature_string = json_content["metadata"]["nomenclature"]
-
-        for part_id, part_values in json_content["data"].items():
-            for var, value in part_values.items():
-                if type(value) not in [str, unicode]:
-                    exec("%s = %s" % (var, value))
-                else:
-                    exec("%s = '%s'" % (var, value))
-            if part_id != eval(nomenclature_string):
-                json_content["data"][eval(nomenclature_string)] = part_values
-                del json_content["data"][part_id]
-            else:
-                pass  # do nothing, everything is fine
-
-        with open(file_out, 'w') as fp:
-            json.dump(json_content, fp, sort_keys=False, indent=2)
     except KeyError:
         logger.warning("No nomenclature specified, using user input")
+        return
+
+    # Build a new data section rather than renaming in place, so that a
+    # computed id that collides with another part cannot overwrite it
+    renamed_data = OrderedDict()
+    for part_id, part_values in json_content["data"].items():
+        computed_id = eval(nomenclature_string, {}, dict(part_values))
+        if computed_id in renamed_data:
+            logger.error("Nomenclature id %s of part %s is already used by "
+                         "another part, keeping %s" %
+                         (computed_id, part_id, part_id))
+            computed_id = part_id
+            if computed_id in renamed_data:
+                raise ValueError("Part id %s is already used by another part "
+                                 "after applying the nomenclature" % part_id)
+        renamed_data[computed_id] = part_values
+    json_content["data"] = renamed_data
+
+    with open(file_out, 'w') as fp:
+        json.dump(json_content, fp, sort_keys=False, indent=2)
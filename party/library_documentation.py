@@ -8,13 +8,15 @@ Generate the documentation for a parts library JSON file
 """
 
 import json
-from os import mkdir, getcwd, chdir, walk
-from os.path import isdir, join
+import re
+import time
+from collections import OrderedDict
+from os import mkdir, remove, walk
+from os.path import dirname, isdir, isfile, join, relpath
 import logging
 
-from subprocess import call
-
-from party.library_checking import check_library_fields
+from party.library_checking import group_parts_by_fields
+from party.library_loading import load_library
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,105 @@ def _create_folder(folder_path):
         mkdir(folder_path)
 
 
+def _write_if_changed(file_path, content):
+    r"""Write content to a file, unless the file already has this content
+
+    Leaving unchanged files untouched keeps their modification time, so that
+    Sphinx only rebuilds the pages of the libraries that changed
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the file to write
+    content : str
+        The content of the file
+
+    Returns
+    -------
+    bool : True if the file was written, False if it was already up to date
+
+    """
+    if isfile(file_path):
+        with open(file_path) as f:
+            if f.read() == content:
+                return False
+    with open(file_path, 'w') as f:
+        f.write(content)
+    return True
+
+
+def _load_library(library_json_filepath):
+    r"""Load a parts library whose parts all have the same fields
+
+    Parameters
+    ----------
+    library_json_filepath : str
+        The path to the parts library
+
+    Returns
+    -------
+    tuple(dict, list) : the library JSON content and the list of fields, in
+                        the order of the fields of the first part
+
+    """
+    json_file_content = load_library(library_json_filepath)
+
+    # Every part must have the same fields
+    groups = group_parts_by_fields(json_file_content["data"])
+    assert len(groups) == 1
+
+    # Columns in the order of the fields of the first part
+    first_part_values = next(iter(json_file_content["data"].values()))
+    fields = list(first_part_values.keys())
+    logger.debug("fields are : %s" % str(fields))
+
+    return json_file_content, fields
+
+
+def _rst_title(title, underline="="):
+    return [title, underline*len(title), ""]
+
+
+def _rst_table(fields, parts):
+    r"""Create the lines of a rst simple table of parts
+
+    The cells are converted to str and the column widths are computed in a
+    single pass over the parts
+
+    Parameters
+    ----------
+    fields : list of str
+        The fields to use as columns (after a 'part_id' column)
+    parts : list of tuple(part_id, part_values)
+
+    Returns
+    -------
+    list of str : the table lines
+
+    """
+    header_fields = ["part_id"] + list(fields)
+    max_lengths = [len(field) for field in header_fields]
+    rows = list()
+    for part_id, part_values in parts:
+        row = [part_id] + [str(part_values[field]) for field in fields]
+        for i, cell in enumerate(row):
+            if len(cell) > max_lengths[i]:
+                max_lengths[i] = len(cell)
+        rows.append(row)
+
+    line_1 = " ".join(["="*length for length in max_lengths])
+    line_2 = " ".join([field.ljust(length)
+                       for field, length in zip(header_fields, max_lengths)])
+
+    table_lines = [line_1, line_2, line_1]
+    for row in rows:
+        table_lines.append("".join([cell.ljust(length) + " "
+                                    for cell, length in zip(row,
+                                                            max_lengths)]))
+    table_lines.append(line_1)
+    return table_lines
+
+
 def _library_rst(library_json_filepath):
     r"""Create the rst string for a parts library
 
@@ -45,69 +146,165 @@ def _library_rst(library_json_filepath):
     str : rst string for library documentation
 
     """
-    rst_lines = list()
-
-    ok, errors, reference_set_of_fields = \
-        check_library_fields(library_json_filepath)
-    assert ok is True
-    assert len(errors) == 0
-    logger.debug("fields are : %s" % str(reference_set_of_fields))
-
-    with open(library_json_filepath) as data_file:
-        json_file_content = json.load(data_file)
-
-    rst_lines.append(json_file_content["metadata"]["name"])
-    rst_lines.append("="*len(json_file_content["metadata"]["name"]))
-    rst_lines.append("")
-
-    max_lengths = dict()
-    max_lengths['part_id'] = \
-        max([len(part_id) for part_id in json_file_content["data"].keys()])
-
-    for field_name in reference_set_of_fields:
-        lengths_list = [len(str(value[field_name]))
-                        for value in json_file_content["data"].values()]
-        lengths_list.append(len(field_name))
-        max_lengths[field_name] = max(lengths_list)
-
-    header_fields = list(reference_set_of_fields)[:]
-    header_fields.insert(0, "part_id")
-
-    line_1 = " ".join(["="*(max_lengths[field]) for field in header_fields])
-    line_2 = " ".join([field.ljust(max_lengths[field])
-                       for field in header_fields])
-    line_3 = line_1
-    last_line = line_1
-
-    rst_lines.append(line_1)
-    rst_lines.append(line_2)
-    rst_lines.append(line_3)
-
-    # # Iterate on the parts found in the library JSON file
-    # # to fill the table
-    for part_id, part_values in json_file_content["data"].items():
-        line = part_id.ljust(max_lengths["part_id"]) + " "
-        for field in reference_set_of_fields:
-            line += str(part_values[field]).ljust(max_lengths[field])
-            line += " "
-        rst_lines.append(line)
-
-    rst_lines.append(last_line)
+    return _library_page(*_load_library(library_json_filepath))
+
+
+def _library_page(json_file_content, fields):
+    r"""The rst string of a loaded parts library (see _library_rst())"""
+    rst_lines = _rst_title(json_file_content["metadata"]["name"])
+    rst_lines.extend(_rst_table(fields, json_file_content["data"].items()))
 
     return "\n".join(rst_lines)
 
 
-def create_libraries_sphinx_sources(libraries_root_folder, doc_folder):
+def _page_suffix(suffix, used_suffixes):
+    r"""File name friendly and unique page suffix"""
+    suffix = re.sub(r"[^A-Za-z0-9_.-]", "_", suffix)
+    unique_suffix = suffix
+    i = 2
+    while unique_suffix in used_suffixes:
+        unique_suffix = "%s_%i" % (suffix, i)
+        i += 1
+    used_suffixes.add(unique_suffix)
+    return unique_suffix
+
+
+def _library_rst_pages(library_json_filepath, group_by=None,
+                       rows_per_page=None):
+    r"""Create the rst strings of a parts library, split in several pages
+
+    Parameters
+    ----------
+    library_json_filepath : str
+        The path to the parts library
+    group_by : str, optional (default is None)
+        Field used to split the parts in pages, one page per value of the
+        field (e.g. 'threading')
+    rows_per_page : int, optional (default is None)
+        Maximum number of parts in a page
+
+    Returns
+    -------
+    OrderedDict (keys: page names, values: rst strings)
+        The first page is named after the library. If the library is split,
+        it is an index page referencing the other pages, named
+        <library name>_<suffix>
+
+    """
+    json_file_content, fields = _load_library(library_json_filepath)
+    name = json_file_content["metadata"]["name"]
+
+    if group_by is None and rows_per_page is None:
+        return OrderedDict([(name, _library_page(json_file_content,
+                                                 fields))])
+
+    # Split the parts in chunks : (page suffix, page title, parts)
+    if group_by is not None:
+        groups = OrderedDict()
+        for part_id, part_values in json_file_content["data"].items():
+            groups.setdefault(str(part_values[group_by]),
+                              list()).append((part_id, part_values))
+        chunks = [(value, "%s = %s" % (group_by, value), parts)
+                  for value, parts in groups.items()]
+    else:
+        chunks = [("parts", "parts", list(json_file_content["data"].items()))]
+
+    if rows_per_page is not None:
+        split_chunks = list()
+        for suffix, title, parts in chunks:
+            if len(parts) <= rows_per_page:
+                split_chunks.append((suffix, title, parts))
+                continue
+            for i in range(0, len(parts), rows_per_page):
+                page_parts = parts[i:i + rows_per_page]
+                split_chunks.append(
+                    ("%s_%i" % (suffix, i // rows_per_page + 1),
+                     "%s, %s to %s" % (title, page_parts[0][0],
+                                       page_parts[-1][0]),
+                     page_parts))
+        chunks = split_chunks
+
+    pages = OrderedDict()
+    index_lines = _rst_title(name)
+    index_lines.extend([".. toctree::", "   :maxdepth: 1", ""])
+    pages[name] = None  # the index page comes first
+
+    used_suffixes = set()
+    for suffix, title, parts in chunks:
+        page_name = "%s_%s" % (name, _page_suffix(suffix, used_suffixes))
+        page_lines = _rst_title("%s : %s" % (name, title))
+        page_lines.extend(_rst_table(fields, parts))
+        pages[page_name] = "\n".join(page_lines)
+        index_lines.append("   " + page_name)
+
+    pages[name] = "\n".join(index_lines) + "\n"
+    return pages
+
+
+# File listing the library pages written in a sphinx source folder
+_PAGES_LIST = ".party_pages"
+
+
+def _remove_stale_pages(source_folder, page_names):
+    r"""Remove the library pages written by a previous documentation run
+    that are not pages anymore (e.g. the pages of a library that is not
+    split anymore), and record the current pages"""
+    pages_list = join(source_folder, _PAGES_LIST)
+    if isfile(pages_list):
+        with open(pages_list) as f:
+            previous_page_names = f.read().split("\n")
+        for page_name in set(previous_page_names) - set(page_names):
+            page_path = join(source_folder, page_name + ".rst")
+            if page_name and isfile(page_path):
+                logger.info("Removing the stale page %s" % page_path)
+                remove(page_path)
+    _write_if_changed(pages_list, "\n".join(page_names))
+
+
+def _library_pages(args):
+    r"""_library_rst_pages() taking a single
+    (library_json_filepath, group_by, rows_per_page) tuple, for Pool.map()"""
+    return _library_rst_pages(*args)
+
+
+def create_libraries_sphinx_sources(libraries_root_folder, doc_folder,
+                                    processes=None, group_by=None,
+                                    rows_per_page=None):
     r"""Create the sphinx files that are common to all libraries
 
+    The rst files are only written if their content changed and sphinx-build
+    runs in parallel, so that a documentation run only rebuilds the pages of
+    the libraries that changed
+
     Parameters
     ----------
     libraries_root_folder : str
         Path to the root folder of libraries
     doc_folder : str
         Path to the folder where the documentation should be generated
+    processes : int, optional (default is None)
+        Number of processes used to create the rst strings of the libraries
+        (None : number of CPUs, 1 : no pool of processes)
+    group_by : str, optional (default is None)
+        Split the documentation of each library in one page per value of
+        this field
+    rows_per_page : int, optional (default is None)
+        Split the documentation of each library in pages of at most this
+        number of parts
+
+    Returns
+    -------
+    OrderedDict : duration in seconds of each phase of the documentation
+                  creation (keys: 'setup', 'rst', 'write', 'sphinx')
+
+    Raises
+    ------
+    RuntimeError if sphinx-build fails
 
     """
+    timings = OrderedDict()
+    start = time.time()
+
     folders = {
         "source": join(doc_folder, "source"),
         "source_static": join(doc_folder, "source/_static"),
@@ -118,51 +315,207 @@ def create_libraries_sphinx_sources(libraries_root_folder, doc_folder):
         _create_folder(v)
 
     # create the conf.py file
-    with open(join(folders["source"], "conf.py"), 'w') as conf:
-        conf.write(CONF_PY)
-
-    # create the index.rst file
+    _write_if_changed(join(folders["source"], "conf.py"), CONF_PY)
+
+    json_filenames = list()
+    for root, dirs, files in walk(libraries_root_folder):
+        logger.debug("Handling %s" % str(root))
+
+        # it is considered a library if it ends with library.json
+        libraries = [f for f in files if f.endswith('library.json')]
+
+        # There should be one and only one library in a given folder
+        # TODO : the above assertion is wrong
+
+        if len(libraries) == 1:
+            logger.debug("There is 1 library in %s" % str(root))
+            logger.info("Found library %s" % str(libraries[0]))
+            json_filenames.append(join(root, libraries[0]))
+
+    timings["setup"] = time.time() - start
+    start = time.time()
+
+    # create the rst strings of the libraries
+    args = [(json_filename, group_by, rows_per_page)
+            for json_filename in json_filenames]
+    if processes == 1:
+        libraries_pages = [_library_pages(arg) for arg in args]
+    else:
+        from multiprocessing import Pool
+        pool = Pool(processes)
+        try:
+            libraries_pages = pool.map(_library_pages, args)
+        finally:
+            pool.close()
+            pool.join()
+
+    timings["rst"] = time.time() - start
+    start = time.time()
+
+    # write the library rst files and the index.rst file
     # there will be one index.rst file even if there are many libraries
     # documented
-    with open(join(folders["source_static"], "index.rst"), 'w') as index:
-        index.write(INDEX_HEADER)
+    index = [INDEX_HEADER]
+    nb_pages, nb_written = 0, 0
+    page_names = list()
+    for pages in libraries_pages:
+        for page_name, rst in pages.items():
+            nb_pages += 1
+            page_names.append(page_name)
+            if _write_if_changed(join(folders["source"], page_name + '.rst'),
+                                 rst):
+                nb_written += 1
+        # the first page is the library page
+        index.append("   " + next(iter(pages)) + "\n")
+    index.append(INDEX_FOOTER)
+    _write_if_changed(join(folders["source"], "index.rst"), "".join(index))
+    logger.info("%i rst file(s) out of %i written" % (nb_written, nb_pages))
+    _remove_stale_pages(folders["source"], page_names)
+
+    timings["write"] = time.time() - start
+    start = time.time()
 
-        for root, dirs, files in walk(libraries_root_folder):
-            logger.debug("Handling %s" % str(root))
+    # Run sphinx
+    from subprocess import call
+    exit_code = call(["sphinx-build", "-b", "html", "-j", "auto",
+                      folders["source"], folders["build"]])
+    if exit_code != 0:
+        raise RuntimeError("sphinx-build failed with exit code %i" %
+                           exit_code)
 
-            # it is considered a library if it ends with library.json
-            libraries = [f for f in files if f.endswith('library.json')]
+    timings["sphinx"] = time.time() - start
 
-            # There should be one and only one library in a given folder
-            # TODO : the above assertion is wrong
+    for phase, duration in timings.items():
+        logger.info("Documentation %s : %.3f s" % (phase, duration))
 
-            if len(libraries) == 1:
-                logger.debug("There is 1 library in %s" % str(root))
-                logger.info("Found library %s" % str(libraries[0]))
+    return timings
 
-                # read the library JSON file
-                json_filename = join(root, libraries[0])
 
-                with open(json_filename) as data_file:
-                    json_file_content = json.load(data_file)
-                #
-                #     # write to library rst file
-                with open(join(folders["source"],
-                               json_file_content["metadata"]["name"] +
-                                       '.rst'), 'w') as library_rst_file:
-                    library_rst_file.write(_library_rst(json_filename))
+def _catalog_index(json_file_content, fields, previews_folder=None,
+                   catalog_folder=None):
+    r"""Precomputed search index of a parts library for the HTML catalog
 
-                    index.write("   " + json_file_content["metadata"]["name"] +
-                                "\n")
+    Parameters
+    ----------
+    json_file_content : dict
+        The library JSON content
+    fields : list of str
+        The fields of the parts
+    previews_folder : str, optional (default is None)
+        Folder containing the <part_id>.html previews (or the <part_id>.mesh
+        files of the shared viewer index.html page)
+    catalog_folder : str, optional (default is None)
+        Folder of the catalog, the previews links are relative to it
+
+    Returns
+    -------
+    dict with the keys:
+        name : library name
+        fields : list of fields
+        part_ids : list of part ids, the index of a part in this list is used
+                   everywhere else in the index
+        columns : dict (keys: fields, values: the list of the values of the
+                  field for each part, or for str fields, a dict with the
+                  sorted distinct 'values' and the 'codes' of the values of
+                  the parts in this list)
+        sorted : dict (keys: numeric fields, values: part indices sorted
+                 by value of the field)
+        tokens : dict (keys: lowercase words of the part ids and
+                 descriptions, values: sorted part indices)
+        previews : list of preview paths (or None) for each part
 
-        index.write(INDEX_FOOTER)
+    """
+    data = json_file_content["data"]
+    part_ids = list(data.keys())
+    parts_values = list(data.values())
+
+    columns = dict()
+    sorted_indices = dict()
+    for field in fields:
+        values = [part_values[field] for part_values in parts_values]
+        if all(isinstance(value, (int, float)) and
+               not isinstance(value, bool) for value in values):
+            columns[field] = values
+            sorted_indices[field] = sorted(range(len(values)),
+                                           key=values.__getitem__)
+        else:
+            values = [str(value) for value in values]
+            distinct_values = sorted(set(values))
+            codes = dict((value, i) for i, value in enumerate(distinct_values))
+            columns[field] = {"values": distinct_values,
+                              "codes": [codes[value] for value in values]}
+
+    tokens = dict()
+    for i, (part_id, part_values) in enumerate(zip(part_ids, parts_values)):
+        words = set(re.findall(r"[a-z0-9.]+", (
+            part_id + " " + str(part_values.get("description", ""))).lower()))
+        for word in words:
+            tokens.setdefault(word, list()).append(i)
+
+    previews = [None] * len(part_ids)
+    if previews_folder is not None and isdir(previews_folder):
+        viewer_index = join(previews_folder, "index.html")
+        for i, part_id in enumerate(part_ids):
+            preview = join(previews_folder, "%s.html" % part_id)
+            anchor = ""
+            if not isfile(preview) and isfile(viewer_index) and \
+                    isfile(join(previews_folder, "%s.mesh" % part_id)):
+                # Shared viewer previews (see party.viewer)
+                preview, anchor = viewer_index, "#%s" % part_id
+            if isfile(preview):
+                previews[i] = relpath(preview, catalog_folder or
+                                      previews_folder).replace("\\", "/") + \
+                    anchor
+
+    return {"name": json_file_content["metadata"]["name"],
+            "fields": fields,
+            "part_ids": part_ids,
+            "columns": columns,
+            "sorted": sorted_indices,
+            "tokens": tokens,
+            "previews": previews}
+
+
+def create_library_catalog(library_json_filepath, output_folder=None):
+    r"""Create a static HTML catalog of a parts library that can be queried
+    in the browser, without a server
+
+    The catalog is made of a catalog.html page and of a catalog_index.js
+    file containing a precomputed search index (see _catalog_index()).
+    Parts with a preview in the htmls subfolder of the library are linked to
+    it.
+
+    Parameters
+    ----------
+    library_json_filepath : str
+        The path to the parts library
+    output_folder : str, optional (default is None)
+        Folder where the catalog is written (None : the library folder)
+
+    Returns
+    -------
+    str : the path to the catalog.html file
+
+    """
+    library_folder = dirname(library_json_filepath)
+    if output_folder is None:
+        output_folder = library_folder
+    _create_folder(output_folder)
+
+    json_file_content, fields = _load_library(library_json_filepath)
+    index = _catalog_index(json_file_content, fields,
+                           previews_folder=join(library_folder, "htmls"),
+                           catalog_folder=output_folder)
+
+    _write_if_changed(join(output_folder, "catalog_index.js"),
+                      "var PARTY_CATALOG = %s;\n" %
+                      json.dumps(index, separators=(",", ":")))
+    catalog_path = join(output_folder, "catalog.html")
+    _write_if_changed(catalog_path, CATALOG_HTML)
+    logger.info("Catalog of %i parts written to %s" %
+                (len(index["part_ids"]), catalog_path))
+    return catalog_path
 
-    # Run sphinx
-    cwd = getcwd()
-    chdir(folders["source"])
-    call(["ls", "-l"])
-    call("sphinx-build -b html %s %s" % (folders["source"], folders["build"]))
-    chdir(cwd)
 
 CONF_PY = "#!/usr/bin/env python3\n" \
           "# -*- coding: utf-8 -*-\n" \
@@ -214,3 +567,174 @@ INDEX_FOOTER = "\n" \
                "* :ref:`modindex`\n" \
                "* :ref:`search`\n" \
                "\n"
+
+CATALOG_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Parts library catalog</title>
+<style>
+body { font-family: sans-serif; margin: 1em; }
+table { border-collapse: collapse; }
+#results td, #results th { border: 1px solid #ccc; padding: 2px 6px; }
+#filters td { padding: 1px 6px; }
+#filters input { width: 6em; }
+</style>
+<script src="catalog_index.js"></script>
+</head>
+<body>
+<h1 id="title"></h1>
+<p>
+<input id="search" type="search" size="40"
+       placeholder="Search the part ids and descriptions">
+<span id="count"></span>
+</p>
+<details><summary>Filters</summary><table id="filters"></table></details>
+<table id="results"><thead></thead><tbody></tbody></table>
+<script>
+(function () {
+  var c = PARTY_CATALOG, n = c.part_ids.length, MAX_ROWS = 200;
+  var tokenKeys = Object.keys(c.tokens).sort();
+  var inputs = [];
+
+  document.title = c.name;
+  document.getElementById("title").textContent = c.name;
+
+  function value(field, i) {
+    var col = c.columns[field];
+    return Array.isArray(col) ? col[i] : col.values[col.codes[i]];
+  }
+
+  // Position of x in the sorted indices of a numeric field (binary search)
+  function bound(field, x, after) {
+    var s = c.sorted[field], col = c.columns[field], lo = 0, hi = s.length;
+    while (lo < hi) {
+      var mid = (lo + hi) >> 1, v = col[s[mid]];
+      if (v < x || (after && v === x)) { lo = mid + 1; } else { hi = mid; }
+    }
+    return lo;
+  }
+
+  // Parts having a token that starts with word
+  function searchWord(word) {
+    var mask = new Uint8Array(n), lo = 0, hi = tokenKeys.length;
+    while (lo < hi) {
+      var mid = (lo + hi) >> 1;
+      if (tokenKeys[mid] < word) { lo = mid + 1; } else { hi = mid; }
+    }
+    for (var k = lo; k < tokenKeys.length &&
+         tokenKeys[k].lastIndexOf(word, 0) === 0; k++) {
+      c.tokens[tokenKeys[k]].forEach(function (i) { mask[i] = 1; });
+    }
+    return mask;
+  }
+
+  function filterMask(input) {
+    var field = input.getAttribute("data-field");
+    var kind = input.getAttribute("data-kind");
+    var mask = new Uint8Array(n), k;
+    if (kind === "value") {
+      var codes = c.columns[field].codes, code = Number(input.value);
+      for (k = 0; k < n; k++) { mask[k] = codes[k] === code ? 1 : 0; }
+    } else {
+      var s = c.sorted[field], x = Number(input.value);
+      var start = kind === "min" ? bound(field, x, false) : 0;
+      var end = kind === "min" ? n : bound(field, x, true);
+      for (k = start; k < end; k++) { mask[s[k]] = 1; }
+    }
+    return mask;
+  }
+
+  function render(selected) {
+    var tbody = document.querySelector("#results tbody");
+    var rows = [], count = 0;
+    for (var i = 0; i < n; i++) {
+      if (!selected[i]) { continue; }
+      count++;
+      if (count > MAX_ROWS) { continue; }
+      var tr = document.createElement("tr"), td = document.createElement("td");
+      if (c.previews[i]) {
+        var a = document.createElement("a");
+        a.href = c.previews[i];
+        a.textContent = c.part_ids[i];
+        td.appendChild(a);
+      } else {
+        td.textContent = c.part_ids[i];
+      }
+      tr.appendChild(td);
+      c.fields.forEach(function (field) {
+        var cell = document.createElement("td");
+        cell.textContent = value(field, i);
+        tr.appendChild(cell);
+      });
+      rows.push(tr);
+    }
+    tbody.innerHTML = "";
+    rows.forEach(function (tr) { tbody.appendChild(tr); });
+    document.getElementById("count").textContent = count + " / " + n +
+      " parts" + (count > MAX_ROWS ? " (first " + MAX_ROWS + " shown)" : "");
+  }
+
+  function update() {
+    var selected = new Uint8Array(n), i;
+    for (i = 0; i < n; i++) { selected[i] = 1; }
+    function keep(mask) {
+      for (var k = 0; k < n; k++) { selected[k] &= mask[k]; }
+    }
+    document.getElementById("search").value.toLowerCase()
+      .split(/[^a-z0-9.]+/).forEach(function (word) {
+        if (word) { keep(searchWord(word)); }
+      });
+    inputs.forEach(function (input) {
+      if (input.value !== "") { keep(filterMask(input)); }
+    });
+    render(selected);
+  }
+
+  function addInput(cell, input, field, kind) {
+    input.setAttribute("data-field", field);
+    input.setAttribute("data-kind", kind);
+    input.addEventListener("input", update);
+    input.addEventListener("change", update);
+    cell.appendChild(input);
+    inputs.push(input);
+  }
+
+  var header = document.createElement("tr");
+  ["part_id"].concat(c.fields).forEach(function (field) {
+    var th = document.createElement("th");
+    th.textContent = field;
+    header.appendChild(th);
+  });
+  document.querySelector("#results thead").appendChild(header);
+
+  var filters = document.getElementById("filters");
+  c.fields.forEach(function (field) {
+    var row = filters.insertRow(-1), col = c.columns[field];
+    row.insertCell(-1).textContent = field;
+    var cell = row.insertCell(-1);
+    if (Array.isArray(col)) {
+      ["min", "max"].forEach(function (kind) {
+        var input = document.createElement("input");
+        input.type = "number";
+        input.step = "any";
+        input.placeholder = kind;
+        addInput(cell, input, field, kind);
+      });
+    } else {
+      var select = document.createElement("select");
+      select.add(new Option("(any)", ""));
+      col.values.forEach(function (v, code) {
+        select.add(new Option(v, String(code)));
+      });
+      addInput(cell, select, field, "value");
+    }
+  });
+
+  document.getElementById("search").addEventListener("input", update);
+  update();
+})();
+</script>
+</body>
+</html>
+"""
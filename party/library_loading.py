@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Parsing of the parts library JSON files, with an optional cache
+
+The checks, the generation, the documentation and the queries read the
+libraries with load_library(). By default, every call parses the file. A
+long-lived process (see party.daemon) calls enable_cache() : the last parsed
+libraries are kept, and an unmodified library is only parsed once.
+
+"""
+
+import json
+import logging
+import os
+
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Name of the library JSON files found in folder trees
+LIBRARY_FILE_NAME = "library.json"
+
+# Default number of parsed libraries kept by the cache
+LIBRARY_CACHE_SIZE = 16
+
+# Parsed libraries (read-only), by absolute path, with the modification time
+# and size of the file when it was parsed, the least recently used first.
+# None if the cache is disabled.
+_libraries_cache = None
+_libraries_cache_size = 0
+
+
+class _ReadOnlyDict(OrderedDict):
+    r"""OrderedDict of a cached library, that cannot be modified
+
+    A copy (copy.copy, pickle) is a regular OrderedDict.
+
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("A cached library must not be modified, "
+                        "modify a copy")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _read_only
+
+    def __reduce__(self):
+        return OrderedDict, (list(self.items()),)
+
+
+class _ReadOnlyList(list):
+    r"""list of a cached library, that cannot be modified
+
+    A copy (copy.copy, pickle) is a regular list.
+
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("A cached library must not be modified, "
+                        "modify a copy")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = append = extend = \
+        insert = pop = remove = reverse = sort = _read_only
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+def _read_only(value):
+    r"""Read-only version of a parsed JSON value"""
+    if isinstance(value, dict):
+        read_only = _ReadOnlyDict()
+        for key, item in value.items():
+            OrderedDict.__setitem__(read_only, key, _read_only(item))
+        return read_only
+    if isinstance(value, list):
+        return _ReadOnlyList(_read_only(item) for item in value)
+    return value
+
+
+def enable_cache(size=LIBRARY_CACHE_SIZE):
+    r"""Keep the last size parsed libraries for the next load_library()
+    calls, as read-only dicts (size 0 disables the cache)
+
+    Parameters
+    ----------
+    size : int, optional (default is LIBRARY_CACHE_SIZE)
+
+    """
+    global _libraries_cache, _libraries_cache_size
+    _libraries_cache = OrderedDict() if size > 0 else None
+    _libraries_cache_size = size
+
+
+def clear_cache():
+    r"""Forget the parsed libraries (the cache stays enabled if it is)"""
+    if _libraries_cache is not None:
+        _libraries_cache.clear()
+
+
+def load_library(json_filename):
+    r"""Parse a library JSON file, reusing the result of a previous parsing
+    of the same unmodified file if the cache is enabled (see enable_cache())
+
+    Parameters
+    ----------
+    json_filename : str
+
+    Returns
+    -------
+    dict : the library JSON content, read-only if the cache is enabled
+
+    """
+    path = os.path.abspath(json_filename)
+    if _libraries_cache is None:
+        return _parse(path)
+    stat = os.stat(path)
+    signature = (getattr(stat, "st_mtime_ns", stat.st_mtime), stat.st_size)
+    try:
+        cached_signature, json_file_content = _libraries_cache.pop(path)
+        if cached_signature == signature:
+            _libraries_cache[path] = (signature, json_file_content)
+            return json_file_content
+    except KeyError:
+        pass
+    json_file_content = _read_only(_parse(path))
+    _libraries_cache[path] = (signature, json_file_content)
+    while len(_libraries_cache) > _libraries_cache_size:
+        _libraries_cache.popitem(last=False)
+    return json_file_content
+
+
+def _parse(path):
+    with open(path) as data_file:
+        return json.load(data_file, object_pairs_hook=OrderedDict)
@@ -3,18 +3,55 @@
 
 r"""Unique geometry script generation logic from a JSON parts library file"""
 
-import imp
 import logging
 import os
 import json
-
-from party.templating import reconstruct_script_code_template, render
-from party.library_checking import check_library_json_rules
+import math
+import shutil
+import struct
+import tempfile
+import time
+from fnmatch import fnmatchcase
+from collections import OrderedDict
+
+from party.templating import reconstruct_script_code_template, \
+    render_string, library_module_code, template_names
+from party.geometry import get_backend, GeometryCache, DEFAULT_GEOMETRY_SIZE
+from party.library_loading import load_library
+from party.output import OutputWriter
+from party.viewer import write_mesh, index_html, VIEWER_JS, \
+    VIEWER_JS_NAME, INDEX_HTML_NAME
+from party.properties import properties_path, properties_table, \
+    load_properties
+from party.anchors import anchors_path, anchors_table, load_anchors, \
+    normalized_anchors
+from party.thumbnail import write_thumbnail
+from party.profiling import stage
 
 
 logger = logging.getLogger(__name__)
 
 
+# STL meshes quality presets :
+# (linear deflection (mm), angular deflection (rad))
+STL_QUALITIES = {"preview": (0.1, 0.5),
+                 "standard": (0.02, 0.3),
+                 "fine": (0.005, 0.1)}
+
+# STL quality of the meshes of the shared viewer HTML previews and of the
+# thumbnails
+HTML_MESH_QUALITY = "preview"
+
+# Default approximate size (bytes) of the cache of the parts built during a
+# generation, per process
+GEOMETRY_CACHE_SIZE = 256 * 1024 * 1024
+
+# Number of triangles packed before each write of write_binary_stl()
+_STL_TRIANGLES_PER_WRITE = 4096
+# Normal, 3 vertices and attribute byte count of a binary STL triangle
+_STL_TRIANGLE = struct.Struct("<12fH")
+
+
 def _scripts_folder(folder_path):
     return os.path.join(folder_path, "scripts")
 
@@ -31,6 +68,10 @@ def _htmls_folder(folder_path):
     return os.path.join(folder_path, "htmls")
 
 
+def _thumbnails_folder(folder_path):
+    return os.path.join(folder_path, "thumbnails")
+
+
 def _create_folder(folder_path):
     r"""Create a folder if it does not exist"""
     if not os.path.isdir(folder_path):
@@ -59,38 +100,707 @@ def _generate_script(json_generators, scripts_folder, part_id, context_):
     str : the path to the created Python geometry file
 
     """
-    with open("tmp.py", "w") as tmp_file:
-        tmp_file.write(reconstruct_script_code_template(
-            json_generators[context_["generator"]]))
+    with stage("render", part_id=part_id):
+        # Use the generator code as a template for context_
+        script_code = render_string(reconstruct_script_code_template(
+            json_generators[context_["generator"]]), context_)
 
-    # Use tmp.py as a template for context_ and write the results to the
-    # part script
+    # Write the results to the part script
     py_geometry_file = os.path.join(scripts_folder, "%s.py" % part_id)
-    with open(py_geometry_file, 'w') as f:
-        f.write(render("tmp.py", context_))
-    os.remove("tmp.py")
+    with stage("script_write", part_id=part_id):
+        with open(py_geometry_file, 'w') as f:
+            f.write(script_code)
 
     return py_geometry_file
 
 
-def _generate_cad(output_folder, py_geometry_file, output_format):
-    if output_format not in ["step", "stl", "html"]:
-        raise ValueError
-    py_geometry_module = imp.load_source(py_geometry_file, py_geometry_file)
-    part = py_geometry_module.part
-    part_id = os.path.splitext(os.path.basename(py_geometry_file))[0]
+def write_binary_stl(file_path, triangles, name=""):
+    r"""Write triangles to a binary STL file, as they come
+
+    Parameters
+    ----------
+    file_path : str
+    triangles : iterable of tuple of 3 vertices (tuples of 3 floats)
+        Counterclockwise seen from the outside
+    name : str, optional
+        Written in the 80 bytes header
+
+    Returns
+    -------
+    int : the number of triangles
+
+    """
+    count = 0
+    with open(file_path, 'wb') as f:
+        f.write(("binary STL %s" % name).encode("ascii", "replace")[:80]
+                .ljust(80, b" "))
+        f.write(struct.pack("<I", 0))  # the count is written at the end
+        buffer_ = list()
+        for v1, v2, v3 in triangles:
+            # Unit normal from the vertices order
+            ux, uy, uz = v2[0] - v1[0], v2[1] - v1[1], v2[2] - v1[2]
+            vx, vy, vz = v3[0] - v1[0], v3[1] - v1[1], v3[2] - v1[2]
+            nx, ny, nz = (uy * vz - uz * vy, uz * vx - ux * vz,
+                          ux * vy - uy * vx)
+            norm = math.sqrt(nx * nx + ny * ny + nz * nz) or 1.
+            buffer_.append(_STL_TRIANGLE.pack(
+                nx / norm, ny / norm, nz / norm, v1[0], v1[1], v1[2],
+                v2[0], v2[1], v2[2], v3[0], v3[1], v3[2], 0))
+            count += 1
+            if len(buffer_) == _STL_TRIANGLES_PER_WRITE:
+                f.write(b"".join(buffer_))
+                buffer_ = list()
+        f.write(b"".join(buffer_))
+        f.seek(80)
+        f.write(struct.pack("<I", count))
+    return count
+
+
+def _export_part(output_folder, part_id, part, output_format, backend,
+                 stl_quality=None, html_mode="standalone",
+                 thumbnail_size=256):
+    r"""Export a part to output_folder/<part_id>.<extension>
+
+    stl_quality is None (the backend STL export) or a STL_QUALITIES key (the
+    part is meshed with these deflections and written by
+    write_binary_stl())
+
+    In the 'shared' html_mode, the HTML export is the <part_id>.mesh file of
+    the shared viewer (see party.viewer)
+
+    The 'png' export is a thumbnail_size x thumbnail_size thumbnail (see
+    party.thumbnail)
+
+    Returns
+    -------
+    str : the path of the exported file
+
+    """
     part_id = str(part_id)  # Keeps the OCC STEP Writer happy !
+    extensions = {"step": "stp", "stl": "stl", "html": "html", "png": "png"}
+    if html_mode == "shared":
+        extensions["html"] = "mesh"
+    output_file = os.path.join(output_folder, "%s.%s" % (
+        part_id, extensions[output_format]))
+    with stage("export_%s" % output_format, part_id=part_id):
+        if output_format == "stl" and stl_quality is not None:
+            linear_deflection, angular_deflection = STL_QUALITIES[stl_quality]
+            write_binary_stl(output_file, backend.triangles(
+                part, linear_deflection, angular_deflection), name=part_id)
+        elif output_format == "html" and html_mode == "shared":
+            linear_deflection, angular_deflection = \
+                STL_QUALITIES[HTML_MESH_QUALITY]
+            write_mesh(output_file, backend.triangles(
+                part, linear_deflection, angular_deflection))
+        elif output_format == "png":
+            linear_deflection, angular_deflection = \
+                STL_QUALITIES[HTML_MESH_QUALITY]
+            write_thumbnail(output_file, backend.triangles(
+                part, linear_deflection, angular_deflection),
+                size=thumbnail_size)
+        else:
+            backend.export(part, output_file, output_format)
+    return output_file
+
+
+def _library_module_path(folder_path):
+    return os.path.join(folder_path, "library_parts.py")
+
+
+def _generate_library_module(json_generators, selection, module_path):
+    r"""Write the Python module building the selected parts (see
+    party.templating.library_module_code)
+
+    Returns
+    -------
+    str : module_path
+
+    """
+    with stage("render_module", parts=len(selection)):
+        module_code = library_module_code(json_generators, selection)
+    with stage("module_write"):
+        with open(module_path, 'w') as f:
+            f.write(module_code)
+    return module_path
+
+
+def _output_folders(base_folder, generate_steps=False, generate_stls=False,
+                    generate_htmls=False, scripts=True,
+                    generate_thumbnails=False):
+    r"""Create the scripts folder (if scripts is True) and the folders of the
+    requested formats
 
-    if output_format == "step":
-        part.to_step(os.path.join(output_folder, "%s.stp" % part_id))
-    elif output_format == "stl":
-        part.to_stl(os.path.join(output_folder, "%s.stl" % part_id))
-    elif output_format == "html":
-        part.to_html(os.path.join(output_folder, "%s.html" % part_id))
+    Returns
+    -------
+    tuple(str, OrderedDict) : the scripts folder (None if scripts is False)
+                              and the output folders (keys: 'step', 'stl',
+                              'html' or 'png')
+
+    """
+    scripts_folder = None
+    if scripts:
+        scripts_folder = _scripts_folder(folder_path=base_folder)
+        _create_folder(scripts_folder)
+
+    output_folders = OrderedDict()
+    for output_format, wanted, folder in [
+            ("step", generate_steps, _steps_folder(base_folder)),
+            ("stl", generate_stls, _stls_folder(base_folder)),
+            ("html", generate_htmls, _htmls_folder(base_folder)),
+            ("png", generate_thumbnails, _thumbnails_folder(base_folder))]:
+        if wanted:
+            _create_folder(folder)
+            output_folders[output_format] = folder
+    return scripts_folder, output_folders
+
+
+def _generate_part(json_generators, scripts_folder, output_folders, part_id,
+                   context_, backend="ccad", raise_errors=True,
+                   module_path=None, stl_quality=None,
+                   html_mode="standalone", generate_properties=False,
+                   density_field=None, generate_anchors=False,
+                   thumbnail_size=256, generator_names=None,
+                   geometry_cache=None):
+    r"""Generate the geometry script of a part and export the part
+
+    Parameters
+    ----------
+    json_generators : dict
+        Geometry generation code (key: generator id; value: lines of code)
+    scripts_folder : str or None
+        If None, no geometry script is written
+    output_folders : dict
+        Folder of each output format (keys: 'step', 'stl', 'html' or 'png')
+    part_id : str
+    context_ : dict
+        Values linked to the part_id
+    backend : str or party.geometry.Backend, optional (default is 'ccad')
+    raise_errors : bool, optional (default is True)
+        If False, an error is logged and recorded in the part record instead
+        of being raised
+    module_path : str, optional (default is None)
+        Library module building the part. If given, the exports use it
+        instead of the geometry script.
+    stl_quality : str, optional (default is None)
+        None, 'preview', 'standard' or 'fine' (see STL_QUALITIES)
+    html_mode : str, optional (default is 'standalone')
+        'standalone' or 'shared' (see :func:`iter_generate`)
+    generate_properties : bool, optional (default is False)
+        Compute the geometric properties of the part
+    density_field : str, optional (default is None)
+        Field of context_ giving the density of the part, for its mass
+    generate_anchors : bool, optional (default is False)
+        Extract the anchors of the part
+    thumbnail_size : int, optional (default is 256)
+        Width and height (pixels) of the 'png' thumbnail
+    generator_names : dict, optional (default is None)
+        Names used in the Jinja blocks of each generator (see
+        party.templating.template_names), required with geometry_cache
+    geometry_cache : party.geometry.GeometryCache, optional (default is None)
+        Geometries already built, reused for the parts having the same
+        generator and parameter values
+
+    Returns
+    -------
+    OrderedDict : the part record, with the keys
+        part_id, script (path, or None), exports (OrderedDict, keys: formats,
+        values: paths), properties (OrderedDict, keys:
+        party.properties.FIELDS, or None), anchors (see
+        party.anchors.normalized_anchors, or None), timings (OrderedDict, keys:
+        'script', 'geometry', formats and 'properties', values: durations in
+        s), error (repr of the exception, or None)
+
+    """
+    record = OrderedDict([("part_id", part_id), ("script", None),
+                          ("exports", OrderedDict()), ("properties", None),
+                          ("anchors", None), ("timings", OrderedDict()),
+                          ("error", None)])
+    with stage("part", part_id=part_id):
+        try:
+            if scripts_folder is not None:
+                start = time.time()
+                record["script"] = _generate_script(
+                    json_generators, scripts_folder, part_id, context_)
+                record["timings"]["script"] = time.time() - start
+            if len(output_folders) > 0 or generate_properties or \
+                    generate_anchors:
+                # The part is built once for all the formats
+                backend = get_backend(backend)
+                start = time.time()
+                part, anchors = _part_geometry(
+                    part_id, context_, backend, record["script"],
+                    module_path, generator_names, geometry_cache)
+                record["timings"]["geometry"] = time.time() - start
+            for output_format, output_folder in output_folders.items():
+                start = time.time()
+                record["exports"][output_format] = _export_part(
+                    output_folder, part_id, part, output_format, backend,
+                    stl_quality=stl_quality, html_mode=html_mode,
+                    thumbnail_size=thumbnail_size)
+                record["timings"][output_format] = time.time() - start
+            if generate_properties:
+                start = time.time()
+                with stage("properties", part_id=part_id):
+                    record["properties"] = _part_properties(
+                        backend, part, context_, density_field)
+                record["timings"]["properties"] = time.time() - start
+            if generate_anchors:
+                record["anchors"] = normalized_anchors(anchors)
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.exception("Error generating %s" % part_id)
+            record["error"] = repr(e)
+    return record
+
+
+def _geometry_key(generator_names, context_):
+    r"""Key of the geometry of a part in a GeometryCache : its generator and
+    the values of the fields used by the Jinja expressions and statements of
+    the generator code"""
+    generator_id = context_["generator"]
+    names = generator_names[generator_id]
+    return (generator_id, tuple(sorted(
+        (name, repr(value)) for name, value in context_.items()
+        if name in names)))
+
+
+def _part_geometry(part_id, context_, backend, script_path, module_path,
+                   generator_names, geometry_cache):
+    r"""Build a part (with the library module if module_path is given,
+    otherwise by running its geometry script), or reuse the geometry cached
+    for the same generator and parameter values
+
+    Returns
+    -------
+    tuple(part, anchors)
+
+    """
+    key = None
+    if geometry_cache is not None:
+        key = _geometry_key(generator_names, context_)
+        geometry = geometry_cache.get(key)
+        if geometry is not None:
+            return geometry
+    with stage("geometry", part_id=part_id):
+        if module_path is not None:
+            geometry = backend.load_part(module_path, part_id)
+        else:
+            py_geometry_module = backend.load_script(script_path)
+            geometry = py_geometry_module.part, py_geometry_module.anchors
+    if key is not None:
+        geometry_cache.put(key, geometry, _geometry_size(backend, geometry[0]))
+    return geometry
+
+
+def _geometry_size(backend, part):
+    r"""Estimated memory size of a part, DEFAULT_GEOMETRY_SIZE if the backend
+    cannot estimate it (the estimate only weights the geometry cache)"""
+    try:
+        return backend.geometry_size(part)
+    except Exception as e:
+        logger.debug("Cannot estimate the geometry size : %s" % str(e))
+        return DEFAULT_GEOMETRY_SIZE
+
+
+def _part_properties(backend, part, context_, density_field):
+    r"""Geometric properties of a part, with its mass if its density is
+    known"""
+    properties = backend.properties(part)
+    density = context_.get(density_field) if density_field else None
+    properties["mass"] = None if density is None or \
+        properties["volume"] is None else properties["volume"] * density
+    return properties
+
+
+def select_parts(json_data, part_ids=None, patterns=None, where=None):
+    r"""Select a subset of the 'data' section of a parts library
+
+    Parameters
+    ----------
+    json_data : dict
+        The 'data' section of the library (keys: part ids, values: dict)
+    part_ids : list of str, optional (default is None)
+        Explicit part ids to select
+    patterns : list of str, optional (default is None)
+        Glob patterns (e.g. 'M2x*') matched against the part ids
+    where : str or dict, optional (default is None)
+        Predicate on the part fields. A str is a Python expression using the
+        field names, with the same syntax as the 'rules' section
+        (e.g. "threading == 'M2' and l_max > 10"). A dict selects the parts
+        whose fields are equal to the dict values.
+        Parts that do not have the fields used by the predicate, or for which
+        its evaluation fails (e.g. a TypeError or ZeroDivisionError), are not
+        selected.
+
+    Returns
+    -------
+    list of tuple(part_id, part_values), in the order of part_ids (without
+    duplicates) if only part_ids are given, otherwise in the order of
+    json_data
+    If neither part_ids nor patterns are given, every part is a candidate
+    for the where predicate.
+
+    Raises
+    ------
+    KeyError if one of the explicit part_ids is not in json_data
+    SyntaxError if the where expression is not valid Python
+
+    """
+    if part_ids is None and patterns is None:
+        candidates = list(json_data.items())
+    else:
+        wanted = set(part_ids or [])
+        for part_id in wanted:
+            if part_id not in json_data:
+                raise KeyError("Unknown part id : %s" % part_id)
+        if not patterns:
+            # Direct lookups, no need to scan the whole library
+            candidates = [(part_id, json_data[part_id])
+                          for part_id in OrderedDict.fromkeys(part_ids)]
+        else:
+            candidates = [(part_id, part_values)
+                          for part_id, part_values in json_data.items()
+                          if part_id in wanted or
+                          any(fnmatchcase(part_id, pattern)
+                              for pattern in patterns)]
+
+    if where is None:
+        return candidates
+
+    if isinstance(where, dict):
+        return [(part_id, part_values) for part_id, part_values in candidates
+                if all(field in part_values and part_values[field] == value
+                       for field, value in where.items())]
+
+    predicate = compile(where, "<where>", "eval")
+    selection = list()
+    for part_id, part_values in candidates:
+        try:
+            if eval(predicate, {}, dict(part_values)):
+                selection.append((part_id, part_values))
+        except NameError:
+            pass  # the part does not have the fields used by the predicate
+        except Exception as e:
+            logger.warning("Part %s not selected, the evaluation of %s "
+                           "failed : %s" % (part_id, where, repr(e)))
+    return selection
+
+
+# Geometry cache of a process of the generation pool (see _init_worker())
+_worker_geometry_cache = None
+
+
+def _init_worker(geometry_cache_size):
+    r"""Initializer of the processes of the generation pool"""
+    global _worker_geometry_cache
+    _worker_geometry_cache = GeometryCache(geometry_cache_size) \
+        if geometry_cache_size > 0 else None
+
+
+def _generate_part_star(args):
+    r"""_generate_part() with its arguments in a tuple, for Pool.imap"""
+    return _generate_part(*args, geometry_cache=_worker_geometry_cache)
+
+
+def iter_generate(json_library_filepath, generate_steps=False,
+                  generate_stls=False, generate_htmls=False, part_ids=None,
+                  patterns=None, where=None, backend="ccad", processes=1,
+                  raise_errors=False, output_mode="scripts", archive=None,
+                  stl_quality=None, html_mode="standalone",
+                  generate_properties=False, density_field=None,
+                  generate_anchors=False, generate_thumbnails=False,
+                  thumbnail_size=256, geometry_cache_size=GEOMETRY_CACHE_SIZE):
+    r"""Create the geometry generation script (and the requested CAD files)
+    of each selected part, yielding a record per part as soon as it is done
+
+    Parameters
+    ----------
+    json_library_filepath : str
+        The path to the JSON file describing the parts library
+    generate_steps : bool
+    generate_stls : bool
+    generate_htmls : bool
+    part_ids, patterns, where : optional
+        Selection of the parts (see :func:`select_parts`)
+    backend : str or party.geometry.Backend, optional (default is 'ccad')
+    processes : int, optional (default is 1)
+        Number of processes generating the parts. If 1, the parts are
+        generated in the current process, in the library order. Otherwise the
+        records are yielded in completion order. None uses the number of CPUs.
+    raise_errors : bool, optional (default is False)
+        If True, an error generating a part is raised, otherwise it is
+        recorded in the part record and the other parts are generated
+    output_mode : str, optional (default is 'scripts')
+        'scripts' : a geometry script per part, in the scripts folder
+        'module' : a single library_parts.py module next to the library JSON
+        file, building the selected parts (get_part(part_id) returns
+        (part, anchors)), used for the CAD files exports
+        'both' : the module, used for the exports, and the scripts
+    archive : str, optional (default is None)
+        None : the files are written to the scripts, steps, stls, htmls and
+        thumbnails folders next to the library JSON file
+        'zip', 'tar' or 'tar.gz' : the files are packed into a single
+        archive next to the library JSON file (e.g. library.zip for
+        library.json). The paths in the records are the archive member
+        names.
+        In both cases, the files are built in a local scratch folder,
+        written in batches to a staging folder and published together when
+        the last record has been yielded (see party.output.OutputWriter) :
+        an interrupted generation publishes no file.
+    stl_quality : str, optional (default is None)
+        None : the STL files are written by the geometry backend
+        'preview', 'standard' or 'fine' : the parts are meshed with the
+        deflections of this STL_QUALITIES preset and written as binary STL
+        files (see :func:`write_binary_stl`)
+    html_mode : str, optional (default is 'standalone')
+        'standalone' : a self-contained <part_id>.html page per part
+        'shared' : a quantized binary <part_id>.mesh file per part, shown by
+        the index.html page and viewer.js script shared by the parts of the
+        library, written in the htmls folder once the parts are generated
+        (see party.viewer)
+    generate_properties : bool, optional (default is False)
+        Compute the bounding box, volume, surface area, centroid and mass of
+        each part, and write them to the properties table of the library
+        (<library>_properties.json, see party.properties), merged with the
+        properties of the parts that were not generated
+    density_field : str, optional (default is None)
+        Field of the parts data giving their density (weight per cubic
+        length unit), the mass is None for the parts without this field
+    generate_anchors : bool, optional (default is False)
+        Extract the anchors of each part, and write them to the anchors
+        table of the library (<library>_anchors.json, see party.anchors),
+        merged with the anchors of the parts that were not generated
+    generate_thumbnails : bool, optional (default is False)
+        Render a PNG thumbnail of each part in the thumbnails folder, in
+        software (no display needed, see party.thumbnail), in the processes
+        generating the other exports
+    thumbnail_size : int, optional (default is 256)
+        Width and height of the thumbnails (pixels)
+    geometry_cache_size : int, optional (default is GEOMETRY_CACHE_SIZE)
+        Each part is built once for all its exports, properties and anchors.
+        The built parts are also kept in a least recently used cache of this
+        approximate size (bytes) for the run (a cache per process), and
+        reused for the parts having the same generator and parameter
+        values. 0 disables the cache.
+
+    Yields
+    ------
+    OrderedDict : part record, with the keys
+        part_id, script (path, None in 'module' output mode), exports
+        (OrderedDict, keys: 'step', 'stl', 'html' or 'png', values: paths ; the
+        mesh files in the 'shared' html_mode), properties (see
+        party.properties, None if generate_properties is False), anchors (see
+        party.anchors, None if generate_anchors is False), timings
+        (OrderedDict, keys: 'script', 'geometry', formats and 'properties',
+        values: durations in s), error (repr of the exception, or None)
+
+    Raises
+    ------
+    KeyError
+    ValueError if the output_mode, archive format, STL quality or html_mode
+    is unknown, or if the thumbnail size is invalid
+
+    """
+    if output_mode not in ["scripts", "module", "both"]:
+        raise ValueError("Unknown output mode : %s" % output_mode)
+    if stl_quality is not None and stl_quality not in STL_QUALITIES:
+        raise ValueError("Unknown STL quality : %s" % stl_quality)
+    if html_mode not in ["standalone", "shared"]:
+        raise ValueError("Unknown HTML mode : %s" % html_mode)
+    if generate_thumbnails and thumbnail_size < 1:
+        raise ValueError("Invalid thumbnail size : %s" % thumbnail_size)
+
+    # Get the path of the JSON file passed as a parameter
+    base_folder = os.path.dirname(json_library_filepath)
+
+    with stage("generate", library=json_library_filepath):
+        json_file_content = load_library(json_library_filepath)
+
+        json_generators = json_file_content["generators"]
+
+        selection = select_parts(json_file_content["data"],
+                                 part_ids=part_ids, patterns=patterns,
+                                 where=where)
+        logger.info("%i part(s) selected out of %i" %
+                    (len(selection), len(json_file_content["data"])))
+
+        # The parts files are written in a local scratch folder, then given to
+        # the writer, that writes them in batches to a staging folder and
+        # moves them in place once the run is complete
+        writer = OutputWriter(base_folder, archive=archive,
+                              archive_name=os.path.splitext(
+                                  os.path.basename(json_library_filepath))[0])
+        scratch_folder = tempfile.mkdtemp(prefix="party-scratch-")
+        try:
+            scripts_folder, output_folders = _output_folders(
+                scratch_folder, generate_steps=generate_steps,
+                generate_stls=generate_stls, generate_htmls=generate_htmls,
+                scripts=output_mode != "module",
+                generate_thumbnails=generate_thumbnails)
+
+            module_path = None
+            if output_mode != "scripts":
+                module_path = _generate_library_module(
+                    json_generators, selection,
+                    writer.staged_path(_library_module_path("")))
+
+            meshes, properties, anchors = dict(), dict(), dict()
+            for record in _part_records(json_generators, selection,
+                                        scripts_folder, output_folders,
+                                        backend, raise_errors, module_path,
+                                        stl_quality, html_mode,
+                                        generate_properties, density_field,
+                                        generate_anchors, thumbnail_size,
+                                        geometry_cache_size, processes):
+                record = _stage_record(writer, scratch_folder, record)
+                if html_mode == "shared" and "html" in record["exports"]:
+                    meshes[record["part_id"]] = record["exports"]["html"]
+                if record["properties"] is not None:
+                    properties[record["part_id"]] = record["properties"]
+                if record["anchors"] is not None:
+                    anchors[record["part_id"]] = record["anchors"]
+                yield record
+
+            if generate_htmls and html_mode == "shared":
+                _write_viewer(writer, json_file_content, meshes)
+            if generate_properties:
+                _write_properties(writer, json_library_filepath,
+                                  json_file_content, properties)
+            if generate_anchors:
+                _write_anchors(writer, json_library_filepath,
+                               json_file_content, anchors)
+        except BaseException:
+            writer.abort()
+            raise
+        else:
+            writer.commit()
+        finally:
+            shutil.rmtree(scratch_folder, ignore_errors=True)
+
+
+def _write_viewer(writer, json_file_content, meshes):
+    r"""Write the shared viewer script and the index page of the previews
+    of the library parts
+
+    The page lists, in the library order, the generated meshes and the
+    meshes already in the destination htmls folder.
+
+    """
+    htmls_folder = _htmls_folder("")
+    parts = list()
+    for part_id in json_file_content["data"]:
+        mesh = "%s.mesh" % part_id
+        if part_id in meshes or os.path.isfile(os.path.join(
+                writer.destination, htmls_folder, mesh)):
+            parts.append((part_id, mesh))
+    writer.write(os.path.join(htmls_folder, VIEWER_JS_NAME), VIEWER_JS)
+    writer.write(os.path.join(htmls_folder, INDEX_HTML_NAME), index_html(
+        json_file_content["metadata"]["name"], parts))
+
+
+def _write_properties(writer, json_library_filepath, json_file_content,
+                      properties):
+    r"""Write the properties table of the library, keeping the properties of
+    the parts that were not generated from the existing table"""
+    try:
+        previous = load_properties(os.path.join(
+            writer.destination, os.path.basename(json_library_filepath)))
+    except (IOError, OSError, ValueError):
+        previous = None
+    writer.write(os.path.basename(properties_path(json_library_filepath)),
+                 json.dumps(properties_table(json_file_content, properties,
+                                             previous=previous)))
+
+
+def _write_anchors(writer, json_library_filepath, json_file_content,
+                   anchors):
+    r"""Write the anchors table of the library, keeping the anchors of the
+    parts that were not generated from the existing table"""
+    try:
+        previous = load_anchors(os.path.join(
+            writer.destination, os.path.basename(json_library_filepath)))
+    except (IOError, OSError, ValueError):
+        previous = None
+    writer.write(os.path.basename(anchors_path(json_library_filepath)),
+                 json.dumps(anchors_table(json_file_content, anchors,
+                                          previous=previous)))
+
+
+def _stage_record(writer, scratch_folder, record):
+    r"""Give the files of a part record, written in scratch_folder, to
+    writer, and use their final paths in the record"""
+    def stage_file(path):
+        with open(path, 'rb') as f:
+            content = f.read()
+        os.remove(path)
+        return writer.write(os.path.relpath(path, scratch_folder), content)
+
+    if record["script"] is not None:
+        record["script"] = stage_file(record["script"])
+    for output_format, path in record["exports"].items():
+        record["exports"][output_format] = stage_file(path)
+    return record
+
+
+def _part_records(json_generators, selection, scripts_folder, output_folders,
+                  backend, raise_errors, module_path, stl_quality, html_mode,
+                  generate_properties, density_field, generate_anchors,
+                  thumbnail_size, geometry_cache_size, processes):
+    r"""The records of the selected parts generation (see
+    :func:`iter_generate`)"""
+    generator_names = dict((generator_id, frozenset(template_names(code)))
+                           for generator_id, code in json_generators.items())
+    if processes == 1:
+        geometry_cache = GeometryCache(geometry_cache_size) \
+            if geometry_cache_size > 0 else None
+        for part_id, context_ in selection:
+            yield _generate_part(json_generators, scripts_folder,
+                                 output_folders, part_id, context_,
+                                 backend=backend, raise_errors=raise_errors,
+                                 module_path=module_path,
+                                 stl_quality=stl_quality,
+                                 html_mode=html_mode,
+                                 generate_properties=generate_properties,
+                                 density_field=density_field,
+                                 generate_anchors=generate_anchors,
+                                 thumbnail_size=thumbnail_size,
+                                 generator_names=generator_names,
+                                 geometry_cache=geometry_cache)
+        return
+
+    from multiprocessing import Pool
+    pool = Pool(processes, initializer=_init_worker,
+                initargs=(geometry_cache_size,))
+    try:
+        for record in pool.imap_unordered(_generate_part_star, [
+                ({context_["generator"]:
+                  json_generators[context_["generator"]]},
+                 scripts_folder, output_folders, part_id, context_,
+                 backend, raise_errors, module_path, stl_quality, html_mode,
+                 generate_properties, density_field, generate_anchors,
+                 thumbnail_size, {context_["generator"]:
+                                  generator_names[context_["generator"]]})
+                for part_id, context_ in selection]):
+            yield record
+    except BaseException:
+        # Stops the pending parts on errors, or if the caller stops
+        # iterating
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
 
 
 def generate(json_library_filepath, generate_steps=False, generate_stls=False,
-             generate_htmls=False):
+             generate_htmls=False, part_ids=None, patterns=None, where=None,
+             processes=1, output_mode="scripts", archive=None,
+             stl_quality=None, html_mode="standalone",
+             generate_properties=False, density_field=None,
+             generate_anchors=False, generate_thumbnails=False,
+             thumbnail_size=256, geometry_cache_size=GEOMETRY_CACHE_SIZE):
     r"""Create a geometry generation script for each part defined
     in the JSON file passed as a parameter
 
@@ -101,44 +811,170 @@ def generate(json_library_filepath, generate_steps=False, generate_stls=False,
     generate_steps : bool
     generate_stls : bool
     generate_htmls : bool
+    part_ids : list of str, optional (default is None)
+        Only generate these parts
+    patterns : list of str, optional (default is None)
+        Only generate the parts whose id matches one of these glob patterns
+    where : str or dict, optional (default is None)
+        Only generate the parts matching this predicate
+        (see :func:`select_parts`)
+    processes : int, optional (default is 1)
+        Number of processes generating the parts (see :func:`iter_generate`)
+    output_mode : str, optional (default is 'scripts')
+        'scripts', 'module' or 'both' (see :func:`iter_generate`)
+    archive : str, optional (default is None)
+        None, 'zip', 'tar' or 'tar.gz' (see :func:`iter_generate`)
+    stl_quality : str, optional (default is None)
+        None, 'preview', 'standard' or 'fine' (see :func:`iter_generate`)
+    html_mode : str, optional (default is 'standalone')
+        'standalone' or 'shared' (see :func:`iter_generate`)
+    generate_properties : bool, optional (default is False)
+        Write the properties table of the library (see :func:`iter_generate`)
+    density_field : str, optional (default is None)
+        Field of the parts data giving their density (see
+        :func:`iter_generate`)
+    generate_anchors : bool, optional (default is False)
+        Write the anchors table of the library (see :func:`iter_generate`)
+    generate_thumbnails : bool, optional (default is False)
+        Render a PNG thumbnail of each part (see :func:`iter_generate`)
+    thumbnail_size : int, optional (default is 256)
+        Width and height of the thumbnails (pixels)
+    geometry_cache_size : int, optional (default is GEOMETRY_CACHE_SIZE)
+        Size (bytes) of the cache of the built parts (see
+        :func:`iter_generate`)
+
+    Returns
+    -------
+    list : the part records (see :func:`iter_generate`)
 
     Raises
     ------
     KeyError
 
     """
-    # Get the path of the JSON file passed as a parameter
+    return list(iter_generate(json_library_filepath,
+                              generate_steps=generate_steps,
+                              generate_stls=generate_stls,
+                              generate_htmls=generate_htmls,
+                              part_ids=part_ids, patterns=patterns,
+                              where=where, processes=processes,
+                              raise_errors=True, output_mode=output_mode,
+                              archive=archive, stl_quality=stl_quality,
+                              html_mode=html_mode,
+                              generate_properties=generate_properties,
+                              density_field=density_field,
+                              generate_anchors=generate_anchors,
+                              generate_thumbnails=generate_thumbnails,
+                              thumbnail_size=thumbnail_size,
+                              geometry_cache_size=geometry_cache_size))
+
+
+def _grid_offsets(bounds, spacing):
+    r"""Translations laying out parts on a square grid, in the XY plane
+
+    Parameters
+    ----------
+    bounds : list of tuple(xmin, ymin, zmin, xmax, ymax, zmax) or None
+        Bounding boxes of the parts (None if unknown)
+    spacing : float
+        Gap between the cells of the grid
+
+    Returns
+    -------
+    list of tuple of 3 floats
+
+    """
+    bounds = [b if b is not None else (0., 0., 0., 0., 0., 0.)
+              for b in bounds]
+    columns = max(1, int(math.ceil(math.sqrt(len(bounds)))))
+    cell_x = max([b[3] - b[0] for b in bounds] or [0.]) + spacing
+    cell_y = max([b[4] - b[1] for b in bounds] or [0.]) + spacing
+    return [((i % columns) * cell_x - b[0], (i // columns) * cell_y - b[1],
+             0.) for i, b in enumerate(bounds)]
+
+
+def generate_assembly(json_library_filepath, formats=("step",),
+                      layout="grid", spacing=10., part_ids=None,
+                      patterns=None, where=None, backend="ccad",
+                      assembly_name=None):
+    r"""Export the selected parts of a library to a single file per format
+
+    Every part is built once, then each format is written in a single writer
+    session (one body per part in the STEP file).
+
+    Parameters
+    ----------
+    json_library_filepath : str
+    formats : iterable of str, optional (default is ('step',))
+        'step' and/or 'stl'
+    layout : str, optional (default is 'grid')
+        'grid' : the parts are laid out on a square grid in the XY plane
+        'origin' : the parts are kept where their geometry script puts them
+    spacing : float, optional (default is 10.)
+        Gap between the parts of the grid layout
+    part_ids, patterns, where : optional
+        Selection of the parts (see :func:`select_parts`)
+    backend : str or party.geometry.Backend, optional (default is 'ccad')
+    assembly_name : str, optional (default is None)
+        Name of the files, without extension. If None,
+        <library name>_assembly
+
+    Returns
+    -------
+    OrderedDict : the paths of the files (keys: formats)
+
+    Raises
+    ------
+    ValueError if the layout or a format is unknown
+
+    """
+    if layout not in ["grid", "origin"]:
+        raise ValueError("Unknown layout : %s" % layout)
+    for output_format in formats:
+        if output_format not in ["step", "stl"]:
+            raise ValueError("Unsupported assembly format : %s" %
+                             output_format)
+    backend = get_backend(backend)
     base_folder = os.path.dirname(json_library_filepath)
-    scripts_folder = _scripts_folder(folder_path=base_folder)
-
-    _create_folder(scripts_folder)
-
-    # Deal with folder creation only one (i.e. not in the loop)
-    if generate_steps:
-        steps_folder = _steps_folder(base_folder)
-        _create_folder(steps_folder)
-    if generate_stls:
-        stls_folder = _stls_folder(base_folder)
-        _create_folder(stls_folder)
-    if generate_htmls:
-        htmls_folder = _htmls_folder(base_folder)
-        _create_folder(htmls_folder)
-
-    with open(json_library_filepath) as data_file:
-        json_file_content = json.load(data_file)
-
-    json_generators = json_file_content["generators"]
-
-    # Check data is not empty
-    for part_id, context_ in json_file_content["data"].items():
-        py_geometry_file = _generate_script(json_generators, scripts_folder,
-                                            part_id, context_)
-        if generate_steps:
-            _generate_cad(steps_folder, py_geometry_file, output_format="step")
-        if generate_stls:
-            _generate_cad(stls_folder, py_geometry_file, output_format="stl")
-        if generate_htmls:
-            _generate_cad(htmls_folder, py_geometry_file, output_format="html")
+    if assembly_name is None:
+        assembly_name = "%s_assembly" % os.path.splitext(
+            os.path.basename(json_library_filepath))[0]
+
+    with stage("generate_assembly", library=json_library_filepath):
+        json_file_content = load_library(json_library_filepath)
+        selection = select_parts(json_file_content["data"],
+                                 part_ids=part_ids, patterns=patterns,
+                                 where=where)
+
+        with OutputWriter(base_folder) as writer:
+            # The library module builds the parts, it is not an output
+            module_path = _generate_library_module(
+                json_file_content["generators"], selection,
+                _library_module_path(writer.staging_folder))
+            parts = list()
+            for part_id, _ in selection:
+                with stage("geometry", part_id=part_id):
+                    parts.append((part_id, backend.load_part(module_path,
+                                                             part_id)[0]))
+
+            if layout == "grid":
+                offsets = _grid_offsets(
+                    [backend.bounds(part) for _, part in parts], spacing)
+                parts = [(part_id, backend.translated(part, offset))
+                         for (part_id, part), offset in zip(parts, offsets)]
+
+            extensions = {"step": "stp", "stl": "stl"}
+            relative_paths = OrderedDict()
+            for output_format in formats:
+                relative_paths[output_format] = "%s.%s" % (
+                    assembly_name, extensions[output_format])
+                with stage("export_assembly_%s" % output_format):
+                    backend.export_assembly(
+                        parts, writer.staged_path(
+                            relative_paths[output_format]), output_format)
+
+    return OrderedDict((output_format, os.path.join(base_folder, path))
+                       for output_format, path in relative_paths.items())
 
 
 def generate_all(base_folder, preview=False, generate_steps=False,
@@ -158,22 +994,23 @@ def generate_all(base_folder, preview=False, generate_steps=False,
     generate_stls : bool
 
     """
-    for item in os.walk(base_folder):
-        if "library.json" in item[2]:
-            json_filename_ = os.path.join(item[0], "library.json")
-            logger.info("Library filename : %s" % json_filename_)
-            logger.info("Checking the rules for the library JSON ...")
-            ok, errors = check_library_json_rules(json_filename=json_filename_)
-            if ok:
-                logger.info("... done. Rules are OK")
-                logger.info("Creating the Python scripts from the library "
-                            "JSON ...")
-                if preview is False:
-                    generate(json_library_filepath=json_filename_,
-                             generate_steps=generate_steps,
-                             generate_stls=generate_stls)
-                logger.info("... done")
-            else:
-                logger.error("The library contains errors, please "
-                             "correct these before generating the scripts")
-                print(errors)
+    from party.library_checking import check_library_json_rules, \
+        find_libraries
+
+    for json_filename_ in find_libraries(base_folder):
+        logger.info("Library filename : %s" % json_filename_)
+        logger.info("Checking the rules for the library JSON ...")
+        ok, errors = check_library_json_rules(json_filename=json_filename_)
+        if ok:
+            logger.info("... done. Rules are OK")
+            logger.info("Creating the Python scripts from the library "
+                        "JSON ...")
+            if preview is False:
+                generate(json_library_filepath=json_filename_,
+                         generate_steps=generate_steps,
+                         generate_stls=generate_stls)
+            logger.info("... done")
+        else:
+            logger.error("The library contains errors, please "
+                         "correct these before generating the scripts")
+            print(errors)
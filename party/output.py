@@ -0,0 +1,338 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Crash-safe writing of the generated files
+
+The files are written to a staging folder and moved in place only when they
+are complete : an interrupted run never leaves a half-written file in the
+destination folder. The contents given to OutputWriter.write() are kept in
+memory and written in batches, and the files are published together when
+the writer is committed, a whole folder at once when it is new in the
+destination. The staging folders left by an interrupted process are removed
+by the next writer of the same destination.
+
+With an archive format, the files are packed into a single archive instead,
+staged in the local temporary folder, so that only the archive is written
+to the destination (e.g. a network file system).
+
+    with OutputWriter("parts/screws") as writer:
+        writer.write("library.json", json_string)
+        export_step(writer.staged_path("steps/M2x16.stp"))
+
+"""
+
+import errno
+import logging
+import os
+import re
+import shutil
+import socket
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = {"zip": ".zip", "tar": ".tar", "tar.gz": ".tar.gz"}
+
+# Age (s) after which a staging folder of another host (or of an unknown
+# process) is considered left by an interrupted process
+STALE_STAGING_AGE = 24 * 3600
+
+_STAGING_PREFIX = ".party-staging-"
+
+# .party-staging-<host>-<pid>-<random characters, without ->
+_STAGING_NAME = re.compile(r"^%s(.*)-(\d+)-[^-]+$" %
+                           re.escape(_STAGING_PREFIX))
+
+# os.rename is not atomic on Windows if the destination exists
+_replace = getattr(os, "replace", os.rename)
+
+
+def _makedirs(folder_path):
+    if folder_path and not os.path.isdir(folder_path):
+        os.makedirs(folder_path)
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno != errno.ESRCH
+    return True
+
+
+def _is_stale(folder_path, now):
+    match = _STAGING_NAME.match(os.path.basename(folder_path))
+    # os.kill() terminates the process on Windows
+    if match is not None and os.name != "nt" and \
+            match.group(1) == socket.gethostname():
+        return not _process_exists(int(match.group(2)))
+    try:
+        return now - os.path.getmtime(folder_path) > STALE_STAGING_AGE
+    except OSError:
+        return False
+
+
+def remove_stale_staging_folders(destination):
+    r"""Remove the staging folders left in a destination folder by the
+    writers of interrupted processes
+
+    A staging folder is stale if the process that created it on this host
+    does not exist anymore, or if it is older than STALE_STAGING_AGE.
+
+    Parameters
+    ----------
+    destination : str
+
+    Returns
+    -------
+    list of str : the removed folders
+
+    """
+    removed = list()
+    now = time.time()
+    try:
+        names = os.listdir(destination)
+    except OSError:
+        return removed
+    for name in names:
+        folder_path = os.path.join(destination, name)
+        if name.startswith(_STAGING_PREFIX) and \
+                os.path.isdir(folder_path) and _is_stale(folder_path, now):
+            logger.warning("Removing the stale staging folder %s" %
+                           folder_path)
+            shutil.rmtree(folder_path, ignore_errors=True)
+            removed.append(folder_path)
+    return removed
+
+
+class OutputWriter(object):
+    r"""Stages files and moves them to a destination folder once complete
+
+    Parameters
+    ----------
+    destination : str
+        Destination folder
+    archive : str, optional (default is None)
+        None : the files are moved to the destination folder (with their
+        relative paths)
+        'zip', 'tar' or 'tar.gz' : the files are packed into the
+        <destination>/<archive_name>.<extension> archive
+    archive_name : str, optional (default is 'outputs')
+        Name of the archive file, without extension
+    buffer_size : int, optional (default is 4 MiB)
+        Size (bytes) of the write() contents kept in memory before they are
+        written to the staging folder
+
+    """
+    def __init__(self, destination, archive=None, archive_name="outputs",
+                 buffer_size=4 * 1024 * 1024):
+        if archive is not None and archive not in ARCHIVE_FORMATS:
+            raise ValueError("Unknown archive format : %s" % archive)
+        self.destination = destination or "."
+        self.archive = archive
+        self.archive_name = archive_name
+        self.buffer_size = buffer_size
+        _makedirs(self.destination)
+        if archive is None:
+            remove_stale_staging_folders(self.destination)
+            # Same file system as the destination, for atomic moves
+            self.staging_folder = tempfile.mkdtemp(
+                prefix="%s%s-%i-" % (_STAGING_PREFIX, socket.gethostname(),
+                                     os.getpid()),
+                dir=self.destination)
+        else:
+            self.staging_folder = tempfile.mkdtemp(prefix="party-staging-")
+        self._buffer = dict()
+        self._buffer_length = 0
+        self._staged = set()
+        self._published = list()
+
+    @property
+    def archive_path(self):
+        r"""Path of the archive, None without archive format"""
+        if self.archive is None:
+            return None
+        return os.path.join(self.destination, "%s%s" % (
+            self.archive_name, ARCHIVE_FORMATS[self.archive]))
+
+    def staged_path(self, relative_path):
+        r"""Path where a file must be written to be part of the outputs
+
+        Parameters
+        ----------
+        relative_path : str
+            Path of the file relative to the destination folder (or in the
+            archive)
+
+        Returns
+        -------
+        str : the path of the file in the staging folder (its folder exists)
+
+        """
+        path = os.path.join(self.staging_folder, relative_path)
+        _makedirs(os.path.dirname(path))
+        self._staged.add(os.path.normpath(relative_path))
+        return path
+
+    def final_path(self, relative_path):
+        r"""Path of a file once published : its path in the destination
+        folder, or its archive member name with an archive format"""
+        if self.archive is not None:
+            return os.path.normpath(relative_path)
+        return os.path.join(self.destination, os.path.normpath(relative_path))
+
+    def write(self, relative_path, content):
+        r"""Add a file with a content
+
+        Parameters
+        ----------
+        relative_path : str
+            Path of the file relative to the destination folder (or in the
+            archive)
+        content : str or bytes
+
+        Returns
+        -------
+        str : the path of the file once published (see final_path())
+
+        """
+        if not isinstance(content, bytes):
+            content = content.encode("utf-8")
+        self._buffer[os.path.normpath(relative_path)] = content
+        self._buffer_length += len(content)
+        if self._buffer_length >= self.buffer_size:
+            self.flush()
+        return self.final_path(relative_path)
+
+    def flush(self):
+        r"""Write the buffered contents to the staging folder"""
+        for relative_path, content in self._buffer.items():
+            with open(self.staged_path(relative_path), 'wb') as f:
+                f.write(content)
+        self._buffer = dict()
+        self._buffer_length = 0
+
+    def publish(self, relative_paths):
+        r"""Move some complete files of the staging folder to the destination
+        folder now (with an archive format, they are only added to the
+        archive members)
+
+        Parameters
+        ----------
+        relative_paths : list of str
+
+        Returns
+        -------
+        list of str : the final paths of the files (their archive member
+                      names with an archive format)
+
+        """
+        if self.archive is not None:
+            members = [os.path.normpath(path) for path in relative_paths]
+            self._staged.update(members)
+            return members
+        relative_paths = [os.path.normpath(path) for path in relative_paths]
+        if any(relative_path in self._buffer
+               for relative_path in relative_paths):
+            self.flush()
+        final_paths = list()
+        for folder in self._new_folders(relative_paths):
+            # A single move for the folder and all its files
+            _replace(os.path.join(self.staging_folder, folder),
+                     os.path.join(self.destination, folder))
+        for relative_path in relative_paths:
+            final_path = os.path.join(self.destination, relative_path)
+            staged_path = os.path.join(self.staging_folder, relative_path)
+            if os.path.lexists(staged_path):
+                _makedirs(os.path.dirname(final_path))
+                _replace(staged_path, final_path)
+            self._staged.discard(relative_path)
+            self._published.append(final_path)
+            final_paths.append(final_path)
+        return final_paths
+
+    def _new_folders(self, relative_paths):
+        r"""First level folders of relative_paths that are not in the
+        destination folder yet, and only hold files of relative_paths"""
+        by_folder = dict()
+        for relative_path in relative_paths:
+            parts = relative_path.split(os.sep, 1)
+            if len(parts) == 2:
+                by_folder.setdefault(parts[0], set()).add(relative_path)
+        folders = list()
+        for folder, paths in sorted(by_folder.items()):
+            if os.path.lexists(os.path.join(self.destination, folder)):
+                continue
+            staged = set()
+            for root, _, names in os.walk(os.path.join(self.staging_folder,
+                                                       folder)):
+                staged.update(os.path.relpath(os.path.join(root, name),
+                                              self.staging_folder)
+                              for name in names)
+            if staged == paths:
+                folders.append(folder)
+        return folders
+
+    def commit(self):
+        r"""Move the staged files (or the archive) to the destination and
+        remove the staging folder
+
+        Returns
+        -------
+        list of str : the paths of the files written to the destination
+                      (the archive path with an archive format)
+
+        """
+        self.flush()
+        if self.archive is None:
+            self.publish(sorted(self._staged))
+        else:
+            archive_path = os.path.join(self.staging_folder, "%s%s" % (
+                self.archive_name, ARCHIVE_FORMATS[self.archive]))
+            self._pack(archive_path)
+            # Copied next to its final place then renamed, for the renaming
+            # to be atomic
+            tmp_path = os.path.join(self.destination,
+                                    ".%s.tmp" % os.path.basename(archive_path))
+            shutil.copyfile(archive_path, tmp_path)
+            _replace(tmp_path, self.archive_path)
+            self._published.append(self.archive_path)
+        self.abort()
+        return self._published
+
+    def _pack(self, archive_path):
+        members = sorted(self._staged)
+        if self.archive == "zip":
+            import zipfile
+            with zipfile.ZipFile(archive_path, 'w',
+                                 zipfile.ZIP_DEFLATED) as archive:
+                for member in members:
+                    archive.write(os.path.join(self.staging_folder, member),
+                                  member)
+        else:
+            import tarfile
+            mode = "w:gz" if self.archive == "tar.gz" else "w"
+            with tarfile.open(archive_path, mode) as archive:
+                for member in members:
+                    archive.add(os.path.join(self.staging_folder, member),
+                                member)
+
+    def abort(self):
+        r"""Discard the files that are not published yet"""
+        self._buffer = dict()
+        self._buffer_length = 0
+        self._staged = set()
+        shutil.rmtree(self.staging_folder, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            logger.error("Discarding the unpublished outputs of %s" %
+                         self.destination)
+            self.abort()
+        return False
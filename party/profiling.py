@@ -0,0 +1,239 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Opt-in timing instrumentation of the parts library operations
+
+The library creation, checks, geometry generation and scripts checks record
+the duration of their stages (and of each part processing) when a profiler
+is active. Nothing is recorded otherwise.
+
+Usage from Python:
+
+    with profile_run(json_path="timings.json", trace_path="trace.json"):
+        generate("library.json", generate_steps=True)
+
+Usage from the command line (e.g. with a use_library.py script):
+
+    python -m party.profiling --json timings.json --trace trace.json
+        use_library.py
+
+The trace file can be loaded in chrome://tracing or https://ui.perfetto.dev
+
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+_active_profiler = None
+
+
+class _Stage(object):
+    r"""Context manager recording the duration of a stage in a profiler"""
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.time()
+        if exc_type is not None:
+            self.args["error"] = repr(exc_value)
+        self.profiler.record(self.name, self.start, end - self.start,
+                             self.args)
+        return False
+
+
+class _NoStage(object):
+    r"""Context manager that does nothing, used when no profiler is active"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+class Profiler(object):
+    r"""Records the duration of named stages
+
+    Each record is a dict with the keys:
+    name, start (s, since the epoch), duration (s), pid, tid, args (dict,
+    e.g. the part id)
+
+    """
+    def __init__(self):
+        self.records = list()
+        self._lock = threading.Lock()
+
+    def stage(self, name, **args):
+        r"""Context manager recording the duration of its block
+
+        Parameters
+        ----------
+        name : str
+            The stage name (e.g. 'render', 'export_step')
+        args : keyword arguments stored with the record (e.g. part_id)
+
+        """
+        return _Stage(self, name, args)
+
+    def record(self, name, start, duration, args=None):
+        r"""Add a record"""
+        record = {"name": name, "start": start, "duration": duration,
+                  "pid": os.getpid(), "tid": threading.current_thread().ident,
+                  "args": args or dict()}
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self):
+        r"""Statistics per stage name
+
+        Returns
+        -------
+        OrderedDict (keys: stage names, values: dict with 'count', 'total'
+                     and 'max' durations), by decreasing total duration
+
+        """
+        stats = dict()
+        for record in self.records:
+            stat = stats.setdefault(record["name"],
+                                    {"count": 0, "total": 0., "max": 0.})
+            stat["count"] += 1
+            stat["total"] += record["duration"]
+            stat["max"] = max(stat["max"], record["duration"])
+        return OrderedDict(sorted(stats.items(),
+                                  key=lambda item: -item[1]["total"]))
+
+    def save_json(self, json_path):
+        r"""Write the summary and the records to a JSON file"""
+        with open(json_path, 'w') as f:
+            json.dump({"summary": self.summary(), "records": self.records},
+                      f, indent=2)
+
+    def chrome_trace(self):
+        r"""The records as a Chrome trace-event format dict"""
+        origin = min([record["start"] for record in self.records] or [0.])
+        events = [{"name": record["name"],
+                   "cat": "party",
+                   "ph": "X",
+                   "ts": (record["start"] - origin) * 1e6,
+                   "dur": record["duration"] * 1e6,
+                   "pid": record["pid"],
+                   "tid": record["tid"],
+                   "args": record["args"]} for record in self.records]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, trace_path):
+        r"""Write the records to a Chrome trace-event format JSON file"""
+        with open(trace_path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def active_profiler():
+    r"""The active profiler, or None"""
+    return _active_profiler
+
+
+def stage(name, **args):
+    r"""Context manager recording the duration of its block in the active
+    profiler, if any
+
+    Parameters
+    ----------
+    name : str
+        The stage name
+    args : keyword arguments stored with the record (e.g. part_id)
+
+    """
+    if _active_profiler is None:
+        return _NO_STAGE
+    return _active_profiler.stage(name, **args)
+
+
+@contextmanager
+def profile_run(json_path=None, trace_path=None):
+    r"""Activate a profiler for the duration of the block
+
+    Stages run in other processes (e.g. in a pool of processes) are not
+    recorded.
+
+    Parameters
+    ----------
+    json_path : str, optional (default is None)
+        If not None, the summary and records are written to this file
+    trace_path : str, optional (default is None)
+        If not None, the records are written to this Chrome trace-event file
+
+    Yields
+    ------
+    Profiler
+
+    """
+    global _active_profiler
+    previous_profiler = _active_profiler
+    profiler = Profiler()
+    _active_profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _active_profiler = previous_profiler
+        if json_path is not None:
+            profiler.save_json(json_path)
+        if trace_path is not None:
+            profiler.save_chrome_trace(trace_path)
+        for name, stat in profiler.summary().items():
+            logger.info("%s : %i call(s), %.3f s total, %.3f s max" %
+                        (name, stat["count"], stat["total"], stat["max"]))
+
+
+def main(argv=None):
+    r"""Run a Python script with an active profiler"""
+    import argparse
+    import runpy
+
+    parser = argparse.ArgumentParser(
+        prog="python -m party.profiling",
+        description="Run a Python script and record the duration of the "
+                    "parts library operations it performs")
+    parser.add_argument("--json", dest="json_path", default="timings.json",
+                        help="timings summary and records file "
+                             "(default: timings.json)")
+    parser.add_argument("--trace", dest="trace_path", default=None,
+                        help="Chrome trace-event file")
+    parser.add_argument("script", help="the Python script to run")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER,
+                        help="arguments of the script")
+    args = parser.parse_args(argv)
+
+    # The script sees its own arguments and folder, as if run by python
+    previous_argv, previous_path = sys.argv, list(sys.path)
+    sys.argv = [args.script] + args.script_args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    try:
+        with profile_run(json_path=args.json_path,
+                         trace_path=args.trace_path):
+            runpy.run_path(args.script, run_name="__main__")
+    finally:
+        sys.argv = previous_argv
+        sys.path[:] = previous_path
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Geometric properties of the parts of a library
+
+generate(..., generate_properties=True) computes the bounding box, volume,
+surface area, centroid and (with a density field) mass of each part once,
+and stores them next to the library JSON file (<library>_properties.json for
+<library>.json), so that they can be read without building the parts :
+
+    properties = load_properties("parts/screws/library.json")
+    properties["M2x16_A"]["volume"]
+
+The values are in the length units of the library (the mass is the volume
+times the density field of the part, in the units of that field).
+
+"""
+
+import json
+import logging
+import os
+
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PROPERTIES_FORMAT_VERSION = 1
+
+# Properties of each part, in this order
+FIELDS = ["bounds", "volume", "area", "centroid", "mass"]
+
+
+def properties_path(json_library_filepath):
+    r"""Path of the properties table of a library"""
+    return "%s_properties.json" % os.path.splitext(json_library_filepath)[0]
+
+
+def mesh_properties(triangles):
+    r"""Properties of the solid bounded by a closed triangle mesh
+
+    Parameters
+    ----------
+    triangles : iterable of tuple of 3 vertices (tuples of 3 floats)
+        Counterclockwise seen from the outside
+
+    Returns
+    -------
+    OrderedDict with the keys bounds (xmin, ymin, zmin, xmax, ymax, zmax, or
+    None without triangles), volume, area and centroid (None if the volume
+    is 0)
+
+    """
+    minimums, maximums = [float("inf")] * 3, [float("-inf")] * 3
+    volume, area = 0., 0.
+    moments = [0., 0., 0.]
+    for v1, v2, v3 in triangles:
+        ux, uy, uz = v2[0] - v1[0], v2[1] - v1[1], v2[2] - v1[2]
+        vx, vy, vz = v3[0] - v1[0], v3[1] - v1[1], v3[2] - v1[2]
+        nx, ny, nz = (uy * vz - uz * vy, uz * vx - ux * vz,
+                      ux * vy - uy * vx)
+        area += (nx * nx + ny * ny + nz * nz) ** 0.5 / 2.
+        # Signed volume of the tetrahedron (origin, v1, v2, v3)
+        tetrahedron = (v1[0] * nx + v1[1] * ny + v1[2] * nz) / 6.
+        volume += tetrahedron
+        for i in range(3):
+            moments[i] += tetrahedron * (v1[i] + v2[i] + v3[i]) / 4.
+            minimums[i] = min(minimums[i], v1[i], v2[i], v3[i])
+            maximums[i] = max(maximums[i], v1[i], v2[i], v3[i])
+    return OrderedDict([
+        ("bounds", minimums + maximums if minimums[0] <= maximums[0]
+         else None),
+        ("volume", volume),
+        ("area", area),
+        ("centroid", [moment / volume for moment in moments]
+         if volume != 0. else None)])
+
+
+def load_properties(json_library_filepath):
+    r"""Read the properties table of a library
+
+    Parameters
+    ----------
+    json_library_filepath : str
+
+    Returns
+    -------
+    OrderedDict : keys: part ids, values: OrderedDict (keys: FIELDS)
+
+    Raises
+    ------
+    IOError if the library has no properties table
+    ValueError if the table format is not supported
+
+    """
+    with open(properties_path(json_library_filepath)) as f:
+        table = json.load(f, object_pairs_hook=OrderedDict)
+    if table.get("format") != PROPERTIES_FORMAT_VERSION:
+        raise ValueError("Unsupported properties table format : %s" %
+                         table.get("format"))
+    return table["parts"]
+
+
+def properties_table(json_file_content, properties, previous=None):
+    r"""Properties table content of a library
+
+    Parameters
+    ----------
+    json_file_content : dict
+        The library JSON content
+    properties : dict
+        Keys: part ids, values: properties of the parts
+    previous : dict, optional (default is None)
+        Properties of the parts from a previous table, kept for the parts of
+        the library not in properties
+
+    Returns
+    -------
+    OrderedDict : the table (the parts in the library order)
+
+    """
+    previous = previous or dict()
+    parts = OrderedDict()
+    for part_id in json_file_content["data"]:
+        if part_id in properties:
+            parts[part_id] = properties[part_id]
+        elif part_id in previous:
+            parts[part_id] = previous[part_id]
+    return OrderedDict([("format", PROPERTIES_FORMAT_VERSION),
+                        ("units", json_file_content.get("metadata", dict())
+                         .get("units")),
+                        ("parts", parts)])
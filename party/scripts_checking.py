@@ -3,14 +3,14 @@
 
 r"""Checks for scripts generated from a library.json"""
 
-import imp
 import os
-import json
 
-from ccad.model import Solid
+from party.geometry import get_backend
+from party.library_loading import load_library
+from party.profiling import stage
 
 
-def check_script(script_path):
+def check_script(script_path, backend="ccad"):
     r"""Check that a script generated from a library.json file respect some
     criteria like:
     - having a 'part' variable that is a NotNull Solid
@@ -20,6 +20,9 @@ def check_script(script_path):
     ----------
     script_path : str
         Path to the Python geometry script
+    backend : str or party.geometry.Backend, optional (default is 'ccad')
+        Geometry backend running the script ('stub' for a fast check that
+        does not build the geometry)
 
     Returns
     -------
@@ -33,9 +36,11 @@ def check_script(script_path):
 
     """
 
+    backend = get_backend(backend)
     script_ok = True
     errors = list()
-    mod = imp.load_source(script_path, script_path)
+    with stage("geometry", script=script_path):
+        mod = backend.load_script(script_path)
 
     # part variable checks
     if hasattr(mod, "part"):
@@ -43,11 +48,11 @@ def check_script(script_path):
             script_ok = False
             errors.append("part variable is None")
         else:
-            if mod.part.shape.IsNull():
+            if backend.is_null(mod.part):
                 script_ok = False
                 errors.append("part variable is Null")
             else:
-                if not isinstance(mod.part, Solid):
+                if not backend.is_solid(mod.part):
                     script_ok = False
                     errors.append("part variable is not a Solid")
     else:
@@ -70,12 +75,34 @@ def check_script(script_path):
     return script_ok, errors
 
 
-def check_all_scripts_from_library_jsons(folder_path):
+def script_bounds(script_path, backend="stub"):
+    r"""Extents of the part built by a geometry script
+
+    Parameters
+    ----------
+    script_path : str
+        Path to the Python geometry script
+    backend : str or party.geometry.Backend, optional (default is 'stub')
+        Geometry backend running the script. The 'stub' backend gives rough
+        bounds, that contain the exact ones.
+
+    Returns
+    -------
+    tuple : (xmin, ymin, zmin, xmax, ymax, zmax), None if unknown
+
+    """
+    backend = get_backend(backend)
+    return backend.bounds(backend.load_script(script_path).part)
+
+
+def check_all_scripts_from_library_jsons(folder_path, backend="ccad"):
     r"""Check every geometry script found in a folder
 
     Parameters
     ----------
     folder_path : str
+    backend : str or party.geometry.Backend, optional (default is 'ccad')
+        Geometry backend running the scripts
 
     Returns
     -------
@@ -88,13 +115,15 @@ def check_all_scripts_from_library_jsons(folder_path):
     # TODO : raise an error if no library in subfolders structure
     for item in os.walk(folder_path):
         if "library.json" in item[2]:
-            with open("%s/%s" % (item[0], "library.json")) as data_file:
-                json_file_content = json.load(data_file)
+            json_file_content = load_library(
+                os.path.join(item[0], "library.json"))
 
             for part_id, context_ in json_file_content["data"].items():
                 try:
                     script_path = os.path.join(item[0], "scripts/%s.py" % part_id)
-                    script_ok, errors = check_script(script_path)
+                    with stage("check_script", part_id=part_id):
+                        script_ok, errors = check_script(script_path,
+                                                         backend=backend)
                     if script_ok is False:
                         scripts_ok = False
                         all_errors["%s/%s" % (item[0], "library.json")] = {part_id: errors}
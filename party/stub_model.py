@@ -0,0 +1,214 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Bounding box stand-in for ccad.model, used by the 'stub' geometry backend
+
+The shapes only carry an axis aligned bounding box, so running a geometry
+script with this module is orders of magnitude faster than with the real
+kernel. The bounding boxes are rough : boolean operations and rotations give
+a box that contains the real shape, not the exact bounding box.
+
+"""
+
+import math
+
+
+class Shape(object):
+    r"""A shape reduced to its axis aligned bounding box
+
+    Parameters
+    ----------
+    bounds : tuple of 6 floats or None
+        (xmin, ymin, zmin, xmax, ymax, zmax), None if unknown
+
+    """
+    def __init__(self, bounds=None):
+        self._bounds = None if bounds is None else tuple(float(b)
+                                                         for b in bounds)
+
+    def bounds(self):
+        return self._bounds
+
+    def _union_bounds(self, other):
+        if self._bounds is None or other.bounds() is None:
+            return None
+        return tuple([min(a, b) for a, b in zip(self._bounds[:3],
+                                                other.bounds()[:3])] +
+                     [max(a, b) for a, b in zip(self._bounds[3:],
+                                                other.bounds()[3:])])
+
+    def _intersection_bounds(self, other):
+        if self._bounds is None:
+            return other.bounds()
+        if other.bounds() is None:
+            return self._bounds
+        return tuple([max(a, b) for a, b in zip(self._bounds[:3],
+                                                other.bounds()[:3])] +
+                     [min(a, b) for a, b in zip(self._bounds[3:],
+                                                other.bounds()[3:])])
+
+    def __add__(self, other):
+        return self.__class__(self._union_bounds(other))
+
+    def __sub__(self, other):
+        return self.__class__(self._bounds)
+
+    def __mul__(self, other):
+        return self.__class__(self._intersection_bounds(other))
+
+    def IsNull(self):
+        return False
+
+    @property
+    def shape(self):
+        # ccad shapes expose the OCC shape as .shape
+        return self
+
+    def copy(self):
+        return self.__class__(self._bounds)
+
+    def translate(self, pdir):
+        self._bounds = _translated_bounds(self._bounds, pdir)
+
+    def rotate(self, pabout, pdir, angle):
+        self._bounds = _rotated_bounds(self._bounds, pabout, pdir, angle)
+
+    def scale(self, scale):
+        if self._bounds is not None:
+            self._bounds = tuple(b * scale for b in self._bounds)
+
+
+class Solid(Shape):
+    r"""Stand-in for ccad.model.Solid"""
+
+
+class Face(Shape):
+    r"""Stand-in for ccad.model.Face"""
+
+
+class Wire(Shape):
+    r"""Stand-in for ccad.model.Wire"""
+
+
+class Edge(Shape):
+    r"""Stand-in for ccad.model.Edge"""
+
+
+def _translated_bounds(bounds, pdir):
+    if bounds is None:
+        return None
+    return tuple(b + pdir[i % 3] for i, b in enumerate(bounds))
+
+
+def _rotated_bounds(bounds, pabout, pdir, angle):
+    r"""Bounding box of the rotated corners of a bounding box"""
+    if bounds is None:
+        return None
+    norm = math.sqrt(sum(d * d for d in pdir))
+    ux, uy, uz = [d / norm for d in pdir]
+    c, s = math.cos(angle), math.sin(angle)
+    matrix = [[c + ux * ux * (1 - c), ux * uy * (1 - c) - uz * s,
+               ux * uz * (1 - c) + uy * s],
+              [uy * ux * (1 - c) + uz * s, c + uy * uy * (1 - c),
+               uy * uz * (1 - c) - ux * s],
+              [uz * ux * (1 - c) - uy * s, uz * uy * (1 - c) + ux * s,
+               c + uz * uz * (1 - c)]]
+    corners = list()
+    for x in (bounds[0], bounds[3]):
+        for y in (bounds[1], bounds[4]):
+            for z in (bounds[2], bounds[5]):
+                p = (x - pabout[0], y - pabout[1], z - pabout[2])
+                corners.append([sum(matrix[i][j] * p[j] for j in range(3)) +
+                                pabout[i] for i in range(3)])
+    return tuple([min(corner[i] for corner in corners) for i in range(3)] +
+                 [max(corner[i] for corner in corners) for i in range(3)])
+
+
+# Solids
+
+def box(dx, dy, dz):
+    return Solid((0., 0., 0., dx, dy, dz))
+
+
+def cylinder(rad, height):
+    return Solid((-rad, -rad, 0., rad, rad, height))
+
+
+def cone(rad1, rad2, height):
+    rad = max(rad1, rad2)
+    return Solid((-rad, -rad, 0., rad, rad, height))
+
+
+def sphere(rad):
+    return Solid((-rad, -rad, -rad, rad, rad, rad))
+
+
+def torus(rad1, rad2):
+    return Solid((-rad1 - rad2, -rad1 - rad2, -rad2,
+                  rad1 + rad2, rad1 + rad2, rad2))
+
+
+def prism(shape, pdir):
+    return Solid(Shape._union_bounds(shape,
+                                     Shape(_translated_bounds(shape.bounds(),
+                                                              pdir))))
+
+
+def revol(shape, pabout, pdir, angle=2 * math.pi):
+    r"""Rough bounds : every orientation of the shape around the axis"""
+    result = Solid(shape.bounds())
+    for i in range(1, 8):
+        result = result + Solid(_rotated_bounds(shape.bounds(), pabout, pdir,
+                                                angle * i / 8.))
+    return result
+
+
+# Faces and wires
+
+def ngon(rad, nsides):
+    return Wire((-rad, -rad, 0., rad, rad, 0.))
+
+
+def circle(rad):
+    return Edge((-rad, -rad, 0., rad, rad, 0.))
+
+
+def polygon(pts):
+    return Wire([min(p[i] for p in pts) for i in range(3)] +
+                [max(p[i] for p in pts) for i in range(3)])
+
+
+def filling(shape, *args, **kwargs):
+    return Face(shape.bounds())
+
+
+def plane(shape):
+    return Face(shape.bounds())
+
+
+# Transformations
+
+def translated(shape, pdir):
+    return shape.__class__(_translated_bounds(shape.bounds(), pdir))
+
+
+def rotated(shape, pabout, pdir, angle):
+    return shape.__class__(_rotated_bounds(shape.bounds(), pabout, pdir,
+                                           angle))
+
+
+def scaled(shape, scale):
+    result = shape.copy()
+    result.scale(scale)
+    return result
+
+
+def __getattr__(name):
+    r"""Any other ccad.model function returns a solid of unknown bounds
+    (Python 3.7+)"""
+    if name.startswith("__"):
+        raise AttributeError(name)
+
+    def _unknown(*args, **kwargs):
+        return Solid()
+    return _unknown
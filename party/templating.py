@@ -4,7 +4,11 @@
 r"""Functions for templates handling"""
 
 import os.path
-from jinja2 import Environment, FileSystemLoader
+import re
+
+# Compiled templates of render_string(), by template source
+_compiled_templates = dict()
+_MAX_COMPILED_TEMPLATES = 256
 
 
 def render(template_path, context):
@@ -22,11 +26,43 @@ def render(template_path, context):
     The template rendered with the context
 
     """
+    from jinja2 import Environment, FileSystemLoader
+
     path, filename = os.path.split(template_path)
     return Environment(loader=FileSystemLoader(path or './')).\
         get_template(filename).render(context)
 
 
+def render_string(template_string, context):
+    r"""Render a template given as a string using a context
+
+    The compiled templates are kept in memory, so that the generator code
+    shared by many parts is only compiled once per process
+
+    Parameters
+    ----------
+    template_string : str
+        The template
+    context : dict
+        Dict used for template rendering
+
+    Returns
+    -------
+    The template rendered with the context
+
+    """
+    try:
+        template = _compiled_templates[template_string]
+    except KeyError:
+        from jinja2 import Environment
+
+        if len(_compiled_templates) >= _MAX_COMPILED_TEMPLATES:
+            _compiled_templates.clear()
+        template = Environment().from_string(template_string)
+        _compiled_templates[template_string] = template
+    return template.render(context)
+
+
 def to_json_string(generators_dict):
     r"""Transform a dictionnary of generators (key = file name no extension;
     value = file content) to a json string
@@ -86,7 +122,7 @@ def reconstruct_script_code_template(generator_code):
     code.append("#!/usr/bin/python\n")
     code.append("# coding: utf-8\n\n")
     # code.append("from ccad.model import cylinder\n\n")
-    code.append("\n".join(generator_code).replace("'''", "\"\"\"").replace("'", "\""))
+    code.append(_generator_code(generator_code))
     code.append("\n\nif __name__ == '__main__':\n")
     code.append("    import ccad.display as cd\n")
     code.append("    v = cd.view()\n")
@@ -95,3 +131,164 @@ def reconstruct_script_code_template(generator_code):
     code.append("        v.display_vector(origin=anchor['position'], direction=anchor['direction'])\n")
     code.append("    cd.start()\n\n")
     return "".join(code)
+
+
+# A {{ name }} placeholder
+_PLACEHOLDER = re.compile(r"{{\s*([A-Za-z_]\w*)\s*}}")
+
+# A Jinja expression or statement
+_JINJA_BLOCK = re.compile(r"{{(.*?)}}|{%(.*?)%}", re.DOTALL)
+
+_NAME = re.compile(r"[A-Za-z_]\w*")
+
+
+def template_names(generator_code):
+    r"""Names used in the Jinja expressions and statements of a generator
+    code, e.g. d in {{ 0.5 * d }} or in {% if d > 2 %}
+
+    Every identifier of the blocks is returned (including the Jinja keywords
+    and filters) : the names are meant to be looked up in the part values.
+
+    Parameters
+    ----------
+    generator_code : list
+        List of ccad python instructions (containing Jinja placeholders)
+
+    Returns
+    -------
+    list of str, sorted
+
+    """
+    names = set()
+    for blocks in _JINJA_BLOCK.findall("\n".join(generator_code)):
+        for block in blocks:
+            names.update(_NAME.findall(block))
+    return sorted(names)
+
+
+def _generator_code(generator_code):
+    r"""The generator code lines as a single str, with the quotes used in the
+    geometry scripts"""
+    return "\n".join(generator_code).replace("'''", "\"\"\"").replace("'", "\"")
+
+
+def _function_code(function_name, parameters, body):
+    r"""Wrap a geometry script code in a function returning (part, anchors)"""
+    code = ["def %s(%s):" % (function_name, ", ".join(parameters))]
+    code.extend(["    %s" % line if line.strip() else ""
+                 for line in body.split("\n")])
+    code.append("    return part, anchors")
+    return "\n".join(code)
+
+
+def generator_parameters(generator_code):
+    r"""Names of the placeholders of a generator code, if the generator can
+    be turned into a Python function of these names
+
+    That is the case when every placeholder is a plain {{ name }} used as a
+    Python expression (not in a string literal) and there are no other
+    Jinja tags.
+
+    Parameters
+    ----------
+    generator_code : list
+        List of ccad python instructions (containing Jinja placeholders)
+
+    Returns
+    -------
+    list of str (sorted), None if the generator cannot be a function
+
+    """
+    import tokenize
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+
+    code = _generator_code(generator_code)
+    marker = "__party_placeholder_"
+    marked = _PLACEHOLDER.sub(lambda match: "%s%s" % (marker, match.group(1)),
+                              code)
+    if "{{" in marked or "{%" in marked or "{#" in marked:
+        return None
+    try:
+        for token in tokenize.generate_tokens(StringIO(marked).readline):
+            if token[0] == tokenize.STRING and marker in token[1]:
+                return None
+    except (tokenize.TokenError, SyntaxError):
+        return None
+    return template_names(generator_code)
+
+
+def library_module_code(json_generators, parts):
+    r"""Python code of a module building every part of a library
+
+    Each generator that can be (see generator_parameters()) is a function of
+    its placeholders, and the parts are rows of a parameter table.
+    Otherwise (e.g. for a generator using Jinja tags, or a part having text
+    values for the placeholders), the part has its own function, with the
+    generator code rendered for the part.
+
+    The module has a get_part(part_id) function returning (part, anchors)
+    and a part_ids() function.
+
+    Parameters
+    ----------
+    json_generators : dict
+        Geometry generation code (key: generator id; value: lines of code)
+    parts : list of tuple(part_id, part_values)
+
+    Returns
+    -------
+    str
+
+    """
+    generator_functions = dict()
+    functions = list()
+    table = list()
+    for part_id, context_ in parts:
+        generator_id = context_["generator"]
+        if generator_id not in generator_functions:
+            parameters = generator_parameters(json_generators[generator_id])
+            if parameters is not None:
+                function_name = "_generator_%i" % len(generator_functions)
+                functions.append("# %s generator\n%s" % (
+                    generator_id, _function_code(function_name, parameters,
+                                                 _PLACEHOLDER.sub(
+                        r"\1", _generator_code(
+                            json_generators[generator_id])))))
+            generator_functions[generator_id] = (
+                None if parameters is None else function_name, parameters)
+        function_name, parameters = generator_functions[generator_id]
+
+        if function_name is not None and \
+                all(parameter in context_ and
+                    not isinstance(context_[parameter], (str, type(u"")))
+                    for parameter in parameters):
+            values = tuple(context_[parameter] for parameter in parameters)
+            table.append("    %r: (%s, %r)," % (part_id, function_name,
+                                                  values))
+        else:
+            part_function_name = "_part_%i" % len(table)
+            functions.append("# %s part\n%s" % (part_id, _function_code(
+                part_function_name, [], render_string(
+                    _generator_code(json_generators[generator_id]),
+                    context_))))
+            table.append("    %r: (%s, ())," % (part_id, part_function_name))
+
+    code = list()
+    code.append("#!/usr/bin/python\n")
+    code.append("# coding: utf-8\n\n")
+    code.append("r\"\"\"Geometry of %i parts, generated by party\n\n"
+                "get_part(part_id) builds a part and returns "
+                "(part, anchors)\n\n\"\"\"\n\n\n" % len(table))
+    code.append("\n\n\n".join(functions))
+    code.append("\n\n\n# part id: (function, arguments)\nPARTS = {\n")
+    code.append("\n".join(table))
+    code.append("\n}\n\n\n")
+    code.append("def part_ids():\n")
+    code.append("    return list(PARTS.keys())\n\n\n")
+    code.append("def get_part(part_id):\n")
+    code.append("    function, arguments = PARTS[part_id]\n")
+    code.append("    return function(*arguments)\n")
+    return "".join(code)
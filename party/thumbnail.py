@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""PNG thumbnails of the parts, rendered in software
+
+The triangles of the part are rasterized with a z-buffer, in an isometric
+view, without OpenGL nor display : the thumbnails can be rendered on a
+headless machine, in the processes generating the other exports.
+
+"""
+
+import logging
+import math
+import struct
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Color of the parts (RGB)
+PART_COLOR = (115, 140, 178)
+
+# Direction of the light, in view coordinates (x right, y up, z towards the
+# viewer) : from the upper left, for the faces of the isometric view to be
+# lit differently
+LIGHT = (-0.3, 0.5, 0.81)
+
+# Part of the lighting that does not depend on the orientation of the faces
+AMBIENT = 0.3
+
+# Fraction of the image around the part
+MARGIN = 0.05
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _isometric(vertex):
+    r"""View coordinates (x right, y up, z towards the viewer) of a vertex
+    seen from the (1, -1, 1) direction"""
+    x, y, z = vertex
+    return ((x + y) / math.sqrt(2.),
+            (-x + y + 2. * z) / math.sqrt(6.),
+            (x - y + z) / math.sqrt(3.))
+
+
+def render(triangles, size=256):
+    r"""Rasterize triangles
+
+    Parameters
+    ----------
+    triangles : iterable of tuple of 3 vertices (tuples of 3 floats)
+    size : int, optional (default is 256)
+        Width and height of the image (pixels)
+
+    Returns
+    -------
+    list of bytearray : the RGBA rows of the image, from the top (the
+                        background is transparent)
+
+    """
+    projected = [tuple(_isometric(vertex) for vertex in triangle)
+                 for triangle in triangles]
+    rows = [bytearray(4 * size) for _ in range(size)]
+    if len(projected) == 0:
+        return rows
+
+    xs = [vertex[0] for triangle in projected for vertex in triangle]
+    ys = [vertex[1] for triangle in projected for vertex in triangle]
+    extent = max(max(xs) - min(xs), max(ys) - min(ys)) or 1.
+    scale = size * (1. - 2. * MARGIN) / extent
+    x_offset = size / 2. - scale * (max(xs) + min(xs)) / 2.
+    y_offset = size / 2. + scale * (max(ys) + min(ys)) / 2.
+
+    depths = [[float("-inf")] * size for _ in range(size)]
+    for triangle in projected:
+        # Pixel coordinates (y down)
+        (x1, y1, z1), (x2, y2, z2), (x3, y3, z3) = [
+            (x_offset + scale * x, y_offset - scale * y, z)
+            for x, y, z in triangle]
+        area = (x2 - x1) * (y3 - y1) - (x3 - x1) * (y2 - y1)
+        if area == 0.:
+            continue
+        # Lambert lighting (either side of the faces)
+        ux, uy, uz = [b - a for a, b in zip(triangle[0], triangle[1])]
+        vx, vy, vz = [c - a for a, c in zip(triangle[0], triangle[2])]
+        nx, ny, nz = (uy * vz - uz * vy, uz * vx - ux * vz,
+                      ux * vy - uy * vx)
+        norm = math.sqrt(nx * nx + ny * ny + nz * nz) or 1.
+        light = AMBIENT + (1. - AMBIENT) * min(abs(
+            nx * LIGHT[0] + ny * LIGHT[1] + nz * LIGHT[2]) / norm, 1.)
+        pixel = bytearray([int(c * light) for c in PART_COLOR] + [255])
+
+        x_min = max(int(math.floor(min(x1, x2, x3))), 0)
+        x_max = min(int(math.ceil(max(x1, x2, x3))), size - 1)
+        y_min = max(int(math.floor(min(y1, y2, y3))), 0)
+        y_max = min(int(math.ceil(max(y1, y2, y3))), size - 1)
+        # Increments of the barycentric coordinates along a row
+        dw1, dw2 = (y2 - y3) / area, (y3 - y1) / area
+        for py in range(y_min, y_max + 1):
+            cx, cy = x_min + 0.5, py + 0.5
+            row, row_depths = rows[py], depths[py]
+            # Barycentric coordinates of the first pixel center of the row
+            w1 = ((x2 - cx) * (y3 - cy) - (x3 - cx) * (y2 - cy)) / area
+            w2 = ((x3 - cx) * (y1 - cy) - (x1 - cx) * (y3 - cy)) / area
+            for px in range(x_min, x_max + 1):
+                w3 = 1. - w1 - w2
+                if w1 >= 0. and w2 >= 0. and w3 >= 0.:
+                    depth = w1 * z1 + w2 * z2 + w3 * z3
+                    if depth > row_depths[px]:
+                        row_depths[px] = depth
+                        row[4 * px:4 * px + 4] = pixel
+                w1 += dw1
+                w2 += dw2
+    return rows
+
+
+def _chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + \
+        struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff)
+
+
+def png_bytes(rows):
+    r"""PNG file content of RGBA rows (see render())"""
+    height, width = len(rows), len(rows[0]) // 4 if len(rows) > 0 else 0
+    # 8 bits per channel, RGBA, no interlacing
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    # Filter type 0 (None) before each row
+    raw = b"".join(b"\0" + bytes(row) for row in rows)
+    return _PNG_SIGNATURE + _chunk(b"IHDR", header) + \
+        _chunk(b"IDAT", zlib.compress(raw, 9)) + _chunk(b"IEND", b"")
+
+
+def write_thumbnail(file_path, triangles, size=256):
+    r"""Render triangles to a PNG file
+
+    Parameters
+    ----------
+    file_path : str
+    triangles : iterable of tuple of 3 vertices (tuples of 3 floats)
+    size : int, optional (default is 256)
+        Width and height of the image (pixels)
+
+    """
+    with open(file_path, 'wb') as f:
+        f.write(png_bytes(render(triangles, size=size)))
@@ -0,0 +1,383 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Lightweight HTML previews of the parts of a library
+
+Instead of a standalone HTML page per part (embedding its own viewer), the
+parts of a library share a single viewer script (viewer.js) and a single
+page (index.html) ; the mesh of each part is a compact binary file
+(<part_id>.mesh) loaded when the part is shown :
+
+    htmls/index.html
+    htmls/viewer.js
+    htmls/M2x16_A.mesh
+    ...
+
+index.html#M2x16_A shows a given part. The pages need to be served over
+HTTP (e.g. python -m http.server) for the browser to load the meshes.
+
+Mesh file format (little endian) :
+
+- header : b"PMSH", version (uint32), number of vertices (uint32), number of
+  triangles (uint32), size of an index in bytes (uint32, 2 or 4), bounds
+  (6 float32 : xmin, ymin, zmin, xmax, ymax, zmax)
+- vertices : 3 uint16 per vertex, the coordinates quantized on the bounds
+- padding to a multiple of 4 bytes
+- triangles : 3 vertex indices per triangle (uint16 or uint32)
+
+"""
+
+import json
+import logging
+import struct
+import sys
+
+from array import array
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+MESH_MAGIC = b"PMSH"
+MESH_FORMAT_VERSION = 1
+
+VIEWER_JS_NAME = "viewer.js"
+INDEX_HTML_NAME = "index.html"
+
+_MESH_HEADER = struct.Struct("<4s4I6f")
+
+_QUANTIZATION_STEPS = 65535
+
+
+def _typecode(size):
+    r"""array typecode of the unsigned integers of this size (bytes)"""
+    for typecode in "HIL":
+        if array(typecode).itemsize == size:
+            return typecode
+    raise ValueError("No array type of %i bytes" % size)
+
+
+def write_mesh(file_path, triangles):
+    r"""Write triangles to a quantized binary mesh file
+
+    The coordinates are quantized on 16 bits over the bounding box of the
+    mesh (a 100 mm part has a 1.5 micron resolution) and the vertices shared
+    by several triangles are only written once.
+
+    Parameters
+    ----------
+    file_path : str
+    triangles : iterable of tuple of 3 vertices (tuples of 3 floats)
+        Counterclockwise seen from the outside
+
+    Returns
+    -------
+    OrderedDict : mesh information (keys: vertices, triangles, bounds)
+
+    """
+    coordinates = array("f")
+    for triangle in triangles:
+        for vertex in triangle:
+            coordinates.extend(vertex)
+
+    if len(coordinates) > 0:
+        bounds = [min(coordinates[i::3]) for i in range(3)] + \
+            [max(coordinates[i::3]) for i in range(3)]
+    else:
+        bounds = [0.] * 6
+    scales = [_QUANTIZATION_STEPS / (bounds[i + 3] - bounds[i])
+              if bounds[i + 3] > bounds[i] else 0. for i in range(3)]
+
+    vertices = array(_typecode(2))
+    vertex_indices = dict()
+    indices = list()
+    for i in range(0, len(coordinates), 3):
+        vertex = tuple(int(round((coordinates[i + j] - bounds[j]) *
+                                 scales[j])) for j in range(3))
+        index = vertex_indices.get(vertex)
+        if index is None:
+            index = vertex_indices[vertex] = len(vertex_indices)
+            vertices.extend(vertex)
+        indices.append(index)
+
+    vertices_count = len(vertex_indices)
+    index_size = 2 if vertices_count <= 65536 else 4
+    indices = array(_typecode(index_size), indices)
+    if sys.byteorder == "big":
+        vertices.byteswap()
+        indices.byteswap()
+
+    with open(file_path, 'wb') as f:
+        f.write(_MESH_HEADER.pack(MESH_MAGIC, MESH_FORMAT_VERSION,
+                                  vertices_count, len(indices) // 3,
+                                  index_size, *bounds))
+        f.write(vertices.tobytes() if hasattr(vertices, "tobytes")
+                else vertices.tostring())
+        # The indices are aligned on 4 bytes (for the JavaScript arrays)
+        f.write(b"\0" * (-(_MESH_HEADER.size + 6 * vertices_count) % 4))
+        f.write(indices.tobytes() if hasattr(indices, "tobytes")
+                else indices.tostring())
+    return OrderedDict([("vertices", vertices_count),
+                        ("triangles", len(indices) // 3),
+                        ("bounds", bounds)])
+
+
+def read_mesh(file_path):
+    r"""Read a mesh file written by write_mesh()
+
+    Returns
+    -------
+    tuple(list, list, list) : the bounds, the (dequantized) vertices as
+                              tuples of 3 floats and the triangles as tuples
+                              of 3 vertex indices
+
+    Raises
+    ------
+    ValueError if the file is not a mesh file
+
+    """
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    magic, version, vertices_count, triangles_count, index_size = \
+        struct.unpack("<4s4I", content[:20])
+    if magic != MESH_MAGIC or version != MESH_FORMAT_VERSION:
+        raise ValueError("Not a version %i mesh file : %s" %
+                         (MESH_FORMAT_VERSION, file_path))
+    bounds = list(_MESH_HEADER.unpack(content[:_MESH_HEADER.size])[5:])
+    offset = _MESH_HEADER.size
+    quantized = struct.unpack("<%iH" % (3 * vertices_count),
+                              content[offset:offset + 6 * vertices_count])
+    offset += 6 * vertices_count
+    offset += -offset % 4  # padding to the next multiple of 4
+    indices = struct.unpack("<%i%s" % (3 * triangles_count,
+                                       "H" if index_size == 2 else "I"),
+                            content[offset:offset +
+                                    3 * index_size * triangles_count])
+    steps = [(bounds[j + 3] - bounds[j]) / _QUANTIZATION_STEPS
+             for j in range(3)]
+    vertices = [tuple(bounds[j] + quantized[i + j] * steps[j]
+                      for j in range(3))
+                for i in range(0, len(quantized), 3)]
+    triangles = [indices[i:i + 3] for i in range(0, len(indices), 3)]
+    return bounds, vertices, triangles
+
+
+def index_html(library_name, meshes):
+    r"""The index page of the previews of a library
+
+    Parameters
+    ----------
+    library_name : str
+    meshes : list of tuple(str, str)
+        Part id and mesh file name (relative to the page) of each part
+
+    Returns
+    -------
+    str
+
+    """
+    parts = [OrderedDict([("id", part_id), ("mesh", mesh)])
+             for part_id, mesh in meshes]
+    return INDEX_HTML % {"title": escape(library_name),
+                         "viewer": VIEWER_JS_NAME,
+                         # </ is escaped for the JSON to stay in the script
+                         "parts": json.dumps(parts).replace("</", "<\\/")}
+
+
+INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>%(title)s</title>
+<style>
+body { font-family: sans-serif; margin: 0; display: flex; height: 100vh; }
+#parts { width: 16em; overflow-y: auto; border-right: 1px solid #ccc; }
+#parts a { display: block; padding: 2px 8px; color: #333;
+           text-decoration: none; }
+#parts a.current { background: #ddd; }
+#view { flex: 1; position: relative; }
+#canvas { width: 100%%; height: 100%%; display: block; }
+#status { position: absolute; left: 8px; top: 8px; }
+</style>
+</head>
+<body>
+<div id="parts"></div>
+<div id="view"><canvas id="canvas"></canvas><span id="status"></span></div>
+<script>var PARTY_PARTS = %(parts)s;</script>
+<script src="%(viewer)s"></script>
+</body>
+</html>
+"""
+
+VIEWER_JS = """// Shared viewer of the party HTML previews (see party.viewer)
+(function () {
+  var canvas = document.getElementById("canvas");
+  var status = document.getElementById("status");
+  var gl = canvas.getContext("webgl") ||
+           canvas.getContext("experimental-webgl");
+  var yaw = 0.6, pitch = 0.5, zoom = 1, mesh = null, cache = {};
+
+  var VERTEX_SHADER = [
+    "attribute vec3 position;", "attribute vec3 normal;",
+    "uniform mat4 transform;", "varying vec3 n;",
+    "void main() {",
+    "  n = (transform * vec4(normal, 0.0)).xyz;",
+    "  gl_Position = transform * vec4(position, 1.0);",
+    "  gl_Position.z *= -0.5;",
+    "}"].join("\\n");
+  var FRAGMENT_SHADER = [
+    "precision mediump float;", "varying vec3 n;",
+    "void main() {",
+    "  float light = 0.3 + 0.7 * abs(normalize(n).z);",
+    "  gl_FragColor = vec4(vec3(0.45, 0.55, 0.7) * light, 1.0);",
+    "}"].join("\\n");
+
+  function shader(type, source) {
+    var s = gl.createShader(type);
+    gl.shaderSource(s, source);
+    gl.compileShader(s);
+    return s;
+  }
+
+  var program = gl.createProgram();
+  gl.attachShader(program, shader(gl.VERTEX_SHADER, VERTEX_SHADER));
+  gl.attachShader(program, shader(gl.FRAGMENT_SHADER, FRAGMENT_SHADER));
+  gl.linkProgram(program);
+  gl.useProgram(program);
+  var positionLocation = gl.getAttribLocation(program, "position");
+  var normalLocation = gl.getAttribLocation(program, "normal");
+  var transformLocation = gl.getUniformLocation(program, "transform");
+  gl.enable(gl.DEPTH_TEST);
+
+  // Unindexed, centered and scaled to [-1, 1] positions and face normals
+  function parse(buffer) {
+    var header = new DataView(buffer), i, j, k;
+    var nv = header.getUint32(8, true), nt = header.getUint32(12, true);
+    var indexSize = header.getUint32(16, true), bounds = [];
+    for (i = 0; i < 6; i++) {
+      bounds.push(header.getFloat32(20 + 4 * i, true));
+    }
+    var quantized = new Uint16Array(buffer, 44, 3 * nv);
+    var offset = 44 + 6 * nv;
+    offset += (4 - offset % 4) % 4;
+    var indices = indexSize === 2 ? new Uint16Array(buffer, offset, 3 * nt)
+                                  : new Uint32Array(buffer, offset, 3 * nt);
+    var size = Math.max(bounds[3] - bounds[0], bounds[4] - bounds[1],
+                        bounds[5] - bounds[2]) || 1;
+    var scale = [], center = [];
+    for (j = 0; j < 3; j++) {
+      scale.push((bounds[j + 3] - bounds[j]) / 65535 * 2 / size);
+      center.push((bounds[j + 3] - bounds[j]) / size);
+    }
+    var positions = new Float32Array(9 * nt);
+    var normals = new Float32Array(9 * nt);
+    for (i = 0; i < 3 * nt; i++) {
+      for (j = 0; j < 3; j++) {
+        positions[3 * i + j] = quantized[3 * indices[i] + j] * scale[j] -
+                               center[j];
+      }
+    }
+    for (i = 0; i < 9 * nt; i += 9) {
+      var p = positions;
+      var ux = p[i + 3] - p[i], uy = p[i + 4] - p[i + 1];
+      var uz = p[i + 5] - p[i + 2], vx = p[i + 6] - p[i];
+      var vy = p[i + 7] - p[i + 1], vz = p[i + 8] - p[i + 2];
+      var n = [uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx];
+      for (k = 0; k < 9; k++) { normals[i + k] = n[k % 3]; }
+    }
+    return {positions: positions, normals: normals, count: 3 * nt};
+  }
+
+  function upload(data, location) {
+    var b = gl.createBuffer();
+    gl.bindBuffer(gl.ARRAY_BUFFER, b);
+    gl.bufferData(gl.ARRAY_BUFFER, data, gl.STATIC_DRAW);
+    gl.enableVertexAttribArray(location);
+    gl.vertexAttribPointer(location, 3, gl.FLOAT, false, 0, 0);
+    return b;
+  }
+
+  function draw() {
+    var w = canvas.clientWidth, h = canvas.clientHeight;
+    canvas.width = w;
+    canvas.height = h;
+    gl.viewport(0, 0, w, h);
+    gl.clearColor(1, 1, 1, 1);
+    gl.clear(gl.COLOR_BUFFER_BIT | gl.DEPTH_BUFFER_BIT);
+    if (!mesh) { return; }
+    var cy = Math.cos(yaw), sy = Math.sin(yaw);
+    var cp = Math.cos(pitch), sp = Math.sin(pitch);
+    var s = 0.55 * zoom;
+    var ax = s * Math.min(1, h / w), ay = s * Math.min(1, w / h);
+    // Rotation around Z (yaw) then around X (pitch), column major
+    gl.uniformMatrix4fv(transformLocation, false, [
+      ax * cy, ay * sy * cp, sy * sp * s, 0,
+      -ax * sy, ay * cy * cp, cy * sp * s, 0,
+      0, -ay * sp, cp * s, 0,
+      0, 0, 0, 1]);
+    gl.drawArrays(gl.TRIANGLES, 0, mesh.count);
+  }
+
+  function show(part) {
+    status.textContent = "Loading " + part.id + " ...";
+    var links = document.querySelectorAll("#parts a");
+    for (var i = 0; i < links.length; i++) {
+      links[i].className = links[i].textContent === part.id ? "current" : "";
+    }
+    var loaded = cache[part.mesh] ? Promise.resolve(cache[part.mesh]) :
+      fetch(part.mesh).then(function (response) {
+        return response.arrayBuffer();
+      }).then(function (buffer) {
+        return (cache[part.mesh] = parse(buffer));
+      });
+    loaded.then(function (data) {
+      upload(data.positions, positionLocation);
+      upload(data.normals, normalLocation);
+      mesh = data;
+      status.textContent = part.id;
+      draw();
+    }, function () {
+      status.textContent = "Cannot load " + part.mesh;
+    });
+  }
+
+  function route() {
+    var id = decodeURIComponent(location.hash.slice(1));
+    for (var i = 0; i < PARTY_PARTS.length; i++) {
+      if (PARTY_PARTS[i].id === id || (!id && i === 0)) {
+        show(PARTY_PARTS[i]);
+        return;
+      }
+    }
+  }
+
+  var list = document.getElementById("parts");
+  PARTY_PARTS.forEach(function (part) {
+    var a = document.createElement("a");
+    a.href = "#" + encodeURIComponent(part.id);
+    a.textContent = part.id;
+    list.appendChild(a);
+  });
+
+  var dragging = null;
+  canvas.addEventListener("mousedown", function (e) {
+    dragging = [e.clientX, e.clientY];
+  });
+  window.addEventListener("mouseup", function () { dragging = null; });
+  window.addEventListener("mousemove", function (e) {
+    if (!dragging) { return; }
+    yaw += (e.clientX - dragging[0]) * 0.01;
+    pitch += (e.clientY - dragging[1]) * 0.01;
+    dragging = [e.clientX, e.clientY];
+    draw();
+  });
+  canvas.addEventListener("wheel", function (e) {
+    e.preventDefault();
+    zoom *= e.deltaY < 0 ? 1.1 : 1 / 1.1;
+    draw();
+  });
+  window.addEventListener("resize", draw);
+  window.addEventListener("hashchange", route);
+  route();
+})();
+"""
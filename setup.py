@@ -117,6 +117,7 @@ setup(
     extras_require={
         'dev': [],
         'test': ['pytest', 'coverage'],
+        'benchmark': ['pytest', 'pytest-benchmark'],
     },
 
     # If there are data files included in your packages that need to be
@@ -135,6 +136,6 @@ setup(
     # "scripts" keyword. Entry points provide cross-platform support and allow
     # pip to create the appropriate form of executable for the target platform.
     # entry_points={'console_scripts': ['sample=sample:main',],},
-    entry_points={}
+    entry_points={'console_scripts': ['party=party.cli:main', ], }
 
     )
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests configuration : a fake geometry backend and meshes shared by the
+tests"""
+
+import json
+
+import pytest
+
+from party.geometry import StubBackend
+
+
+def box_triangles(x_min, y_min, z_min, x_max, y_max, z_max):
+    r"""Triangles (outward oriented) of the surface of a box"""
+    corners = [(x, y, z) for x in (x_min, x_max) for y in (y_min, y_max)
+               for z in (z_min, z_max)]
+    for a, b, c, d in [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1),
+                       (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]:
+        yield corners[a], corners[b], corners[c]
+        yield corners[a], corners[c], corners[d]
+
+
+class FakeBackend(StubBackend):
+    r"""Stub backend 'exporting' the bounds of the parts, meshing their
+    bounding boxes and counting the parts it builds
+
+    Parameters
+    ----------
+    sizes : bool, optional (default is True)
+        If False, the backend cannot estimate the size of its parts
+
+    """
+    name = "fake"
+
+    def __init__(self, sizes=True):
+        self.sizes = sizes
+        self.builds = 0
+
+    def load_script(self, script_path):
+        self.builds += 1
+        return StubBackend.load_script(self, script_path)
+
+    def geometry_size(self, part):
+        if not self.sizes:
+            raise ImportError("No module named OCC")
+        return StubBackend.geometry_size(self, part)
+
+    def export(self, part, file_path, output_format):
+        with open(file_path, 'w') as f:
+            json.dump(self.bounds(part), f)
+
+    def triangles(self, part, linear_deflection, angular_deflection):
+        return box_triangles(*self.bounds(part))
+
+    def export_assembly(self, parts, file_path, output_format):
+        with open(file_path, 'w') as f:
+            json.dump([[name, self.bounds(part)] for name, part in parts], f)
+
+
+@pytest.fixture
+def cube():
+    r"""Triangles of the unit cube"""
+    return list(box_triangles(0., 0., 0., 1., 1., 1.))
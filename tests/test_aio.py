@@ -0,0 +1,90 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the aio module"""
+
+import asyncio
+import os
+import shutil
+from os.path import join, dirname, isfile
+
+from party.aio import agenerate, acheck_all_scripts
+from party.library_use import iter_generate
+from party.properties import load_properties
+
+SAMPLE_LIBRARY = join(dirname(__file__), "scripts", "sample_lib_ok",
+                      "library.json")
+
+
+def _library(tmpdir):
+    shutil.copy(SAMPLE_LIBRARY, str(tmpdir))
+    return str(tmpdir.join("library.json"))
+
+
+async def _records(*args, **kwargs):
+    return [record async for record in agenerate(*args, **kwargs)]
+
+
+def test_agenerate_scripts(tmpdir):
+    records = asyncio.run(_records(_library(tmpdir), backend="stub",
+                                   max_workers=2))
+    assert sorted(record["part_id"] for record in records) == \
+        ["M1.6x12_A", "M1.6x16_A", "M2x16_A", "M2x20_A", "M2x20_B"]
+    for record in records:
+        assert record["error"] is None
+        assert isfile(record["script"])
+        assert "script" in record["timings"]
+
+    ok, errors = asyncio.run(acheck_all_scripts(str(tmpdir), backend="stub"))
+    assert ok is True
+    assert len(errors) == 0
+
+
+def test_agenerate_error_records(tmpdir):
+    r"""The stub backend cannot export : each part has an error record"""
+    records = asyncio.run(_records(_library(tmpdir), generate_steps=True,
+                                   patterns=["M2x*"], backend="stub"))
+    assert len(records) == 3
+    for record in records:
+        assert "cannot export" in record["error"]
+        assert isfile(record["script"])
+        assert len(record["exports"]) == 0
+
+
+def test_agenerate_same_outputs(tmpdir):
+    r"""agenerate() writes the outputs of iter_generate()"""
+    library = _library(tmpdir)
+    records = asyncio.run(_records(library, backend="stub", max_workers=1,
+                                   generate_properties=True))
+    properties = load_properties(library)
+    sync_records = list(iter_generate(library, backend="stub",
+                                      generate_properties=True))
+    assert [record["part_id"] for record in records] == \
+        [record["part_id"] for record in sync_records]
+    assert [record["properties"] for record in records] == \
+        [record["properties"] for record in sync_records]
+    assert properties == load_properties(library)
+    assert not any(name.startswith(".party-staging")
+                   for name in os.listdir(str(tmpdir)))
+
+
+def test_agenerate_early_exit(tmpdir):
+    async def first_record():
+        async for record in agenerate(_library(tmpdir), backend="stub",
+                                      max_workers=1):
+            return record
+
+    assert asyncio.run(first_record())["error"] is None
+    assert not any(name.startswith(".party-staging")
+                   for name in os.listdir(str(tmpdir)))
+
+
+def test_acheck_all_scripts_missing():
+    ok, errors = asyncio.run(acheck_all_scripts(
+        join(dirname(__file__), "scripts", "sample_lib_missing"),
+        backend="stub"))
+    assert ok is False
+    assert len(errors) == 1
+    for part_errors in errors.values():
+        for part_error in part_errors.values():
+            assert isinstance(part_error, list)
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the anchors module"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from party.anchors import normalized_anchors, anchors_table, load_anchors, \
+    anchors_path, AnchorIndex
+from party.cli import run
+from party.library_use import iter_generate
+
+SAMPLE_LIBRARY = os.path.join(os.path.dirname(__file__), "scripts",
+                              "sample_lib_ok", "library.json")
+
+
+def _write_table(tmpdir, name, anchors):
+    library = {"data": dict((part_id, {}) for part_id in anchors)}
+    library_path = str(tmpdir.join("%s.json" % name))
+    with open(anchors_path(library_path), 'w') as f:
+        json.dump(anchors_table(library, dict(
+            (part_id, normalized_anchors(part_anchors))
+            for part_id, part_anchors in anchors.items())), f)
+    return library_path
+
+
+def _anchor(dimension, direction, position=(0, 0, 0)):
+    return {"position": position, "direction": direction,
+            "dimension": dimension, "description": "d"}
+
+
+def test_normalized_anchors():
+    anchors = normalized_anchors({2: _anchor(1, (0, 0, -1)),
+                                  1: {"position": (1, 2, 3)}})
+    assert list(anchors.keys()) == ["1", "2"]
+    assert anchors["1"]["direction"] is None
+    assert anchors["2"]["dimension"] == 1.
+    assert anchors["2"]["direction"] == [0., 0., -1.]
+
+
+def test_load_anchors_round_trip(tmpdir):
+    library = _write_table(tmpdir, "library", {
+        "a": {1: _anchor(2, (0, 0, -1), (1, 2, 3)), 2: {}},
+        "b": {}})
+    anchors = load_anchors(library)
+    assert list(anchors.keys()) == ["a", "b"]
+    assert anchors["a"]["1"]["position"] == [1., 2., 3.]
+    assert anchors["a"]["2"]["position"] is None
+    assert anchors["a"]["2"]["dimension"] is None
+    assert len(anchors["b"]) == 0
+
+
+def test_anchor_index_query(tmpdir):
+    screws = _write_table(tmpdir, "screws", {
+        "s2": {1: _anchor(2., (0, 0, -1)), 2: _anchor(2., (0, 0, 1))},
+        "s3": {1: _anchor(3., (0, 0, -1))}})
+    nuts = _write_table(tmpdir, "nuts", {
+        "n2": {1: _anchor(2., (0, 0, -2))},
+        "n1": {1: _anchor(1., (1, 0, 0)), 2: {}}})
+    index = AnchorIndex([screws, nuts])
+    assert len(index) == 6
+
+    anchors = index.query(dimension=2., direction=(0, 0, -1))
+    assert [(anchor["part_id"], anchor["name"]) for anchor in anchors] == \
+        [("s2", "1"), ("n2", "1")]
+    assert anchors[1]["library"] == nuts
+    assert index.part_ids_with(dimension=2.) == [(screws, "s2"),
+                                                 (nuts, "n2")]
+    assert index.part_ids_with(direction=(2, 0, 0)) == [(nuts, "n1")]
+    assert len(index.query(dimension=2.5, tolerance=0.6)) == 4
+    assert len(index.query()) == 6
+    assert index.part_ids_with(direction=(1, 0, -1)) == []
+    assert index.part_ids_with(direction=(1, 0, -1),
+                               angle_tolerance=0.8) == [
+        (screws, "s2"), (screws, "s3"), (nuts, "n2"), (nuts, "n1")]
+    with pytest.raises(ValueError):
+        index.query(direction=(0, 0, 0))
+
+
+def test_generate_anchors(tmpdir, capsys):
+    shutil.copy(SAMPLE_LIBRARY, str(tmpdir))
+    library = str(tmpdir.join("library.json"))
+    records = list(iter_generate(library, patterns=["M2x*"], backend="stub",
+                                 raise_errors=True, generate_anchors=True))
+    assert records[0]["anchors"]["1"]["direction"] == [0., 0., -1.]
+    list(iter_generate(library, part_ids=["M1.6x12_A"], backend="stub",
+                       raise_errors=True, output_mode="module",
+                       generate_anchors=True))
+    assert list(load_anchors(library).keys()) == [
+        "M1.6x12_A", "M2x16_A", "M2x20_A", "M2x20_B"]
+
+    assert run(["anchors", library, "--dimension", "1.6"]) == 0
+    anchors = [json.loads(line)
+               for line in capsys.readouterr().out.splitlines()]
+    assert [anchor["part_id"] for anchor in anchors] == ["M1.6x12_A"]
+
+    assert run(["anchors", library, "--direction", "1", "0", "-1",
+                "--angle-tolerance", "0.8"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 4
+
+
+def test_anchor_index_missing_table(tmpdir):
+    with pytest.raises(IOError):
+        AnchorIndex(str(tmpdir.join("library.json")))
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the bundle module"""
+
+import json
+import zipfile
+
+import pytest
+
+from party.bundle import create_bundle, BundleReader
+
+
+@pytest.fixture
+def library(tmpdir):
+    tmpdir.join("library.json").write(json.dumps(
+        {"data": {"a": {"generator": "g"}, "b": {"generator": "g"}}}))
+    tmpdir.mkdir("scripts")
+    tmpdir.mkdir("steps")
+    for part_id in ["a", "b"]:
+        tmpdir.join("scripts", "%s.py" % part_id).write("part = '%s'" %
+                                                         part_id)
+    # a large, compressible file and a missing one
+    tmpdir.join("steps", "a.stp").write("ISO-10303-21;\n" * 100000)
+    return str(tmpdir.join("library.json"))
+
+
+def test_bundle(library, tmpdir):
+    bundle_path = create_bundle(library)
+    assert bundle_path == str(tmpdir.join("library.bundle.zip"))
+    with BundleReader(bundle_path) as bundle:
+        assert bundle.part_ids() == ["a", "b"]
+        assert bundle.formats("a") == ["script", "step"]
+        assert bundle.formats("b") == ["script"]
+        assert bundle.read("b", "script") == b"part = 'b'"
+        assert bundle.read("a", "step") == \
+            tmpdir.join("steps", "a.stp").read_binary()
+        assert len(list(bundle.iter_content("a", "step",
+                                            chunk_size=1000))) > 1
+        assert list(bundle.library()["data"].keys()) == ["a", "b"]
+        path = bundle.extract("a", "step", str(tmpdir.join("downloads")))
+        assert path == str(tmpdir.join("downloads", "a.stp"))
+        assert tmpdir.join("downloads", "a.stp").size() == \
+            tmpdir.join("steps", "a.stp").size()
+        with pytest.raises(KeyError):
+            bundle.read("b", "step")
+
+    # Still a regular zip file
+    with zipfile.ZipFile(bundle_path) as f:
+        assert sorted(f.namelist()) == ["index.json", "library.json",
+                                        "scripts/a.py", "scripts/b.py",
+                                        "steps/a.stp"]
+
+
+def test_bundle_corrupted(library, tmpdir):
+    bundle_path = create_bundle(library, str(tmpdir.join("out.zip")),
+                                formats=["script"])
+    with BundleReader(bundle_path) as bundle:
+        offset = bundle.index["parts"]["a"]["script"]["offset"]
+    with open(bundle_path, 'r+b') as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes(bytearray([ord(byte) ^ 0xff])))
+    with BundleReader(bundle_path) as bundle:
+        assert bundle.read("b", "script") == b"part = 'b'"
+        with pytest.raises(ValueError):
+            bundle.read("a", "script")
+
+
+def test_bundle_cli(library, tmpdir, capsys):
+    from party.cli import run
+    assert run(["bundle", library]) == 0
+    bundle_path = capsys.readouterr().out.strip()
+    assert run(["extract", bundle_path, "a", "b", "-f", "script",
+                "-o", str(tmpdir.join("out"))]) == 0
+    assert sorted(path.basename for path in tmpdir.join("out").listdir()) == \
+        ["a.py", "b.py"]
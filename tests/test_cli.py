@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the cli and daemon modules"""
+
+import json
+import os
+import pickle
+import socket
+import stat
+import tempfile
+import threading
+
+import pytest
+
+from party import daemon
+from party.cli import run
+from party.library_loading import load_library, enable_cache
+
+GOOD_LIBRARY = os.path.join(os.path.dirname(__file__),
+                            "json_files", "good_library.json")
+
+
+def test_query_where(capsys):
+    assert run(["query", GOOD_LIBRARY, "--where", "weight > 10"]) == 0
+    assert capsys.readouterr().out.split() == ["608ZZ"]
+
+
+def test_query_fields(capsys):
+    assert run(["query", GOOD_LIBRARY, "--part", "624ZZ",
+                "--fields", "inner_diameter,missing"]) == 0
+    assert json.loads(capsys.readouterr().out) == ["624ZZ", 4.0, None]
+
+
+def test_load_library_cache(tmpdir):
+    library = tmpdir.join("library.json")
+    library.write(json.dumps({"data": {"a": {}}}))
+    # No cache by default
+    first = load_library(str(library))
+    assert load_library(str(library)) is not first
+    first["data"]["b"] = {}
+
+    enable_cache(size=1)
+    try:
+        first = load_library(str(library))
+        assert load_library(str(library)) is first
+        assert list(first["data"].keys()) == ["a"]
+        with pytest.raises(TypeError):
+            first["data"]["b"] = {}
+        with pytest.raises(TypeError):
+            first["data"].pop("a")
+        # The copies can be modified
+        copy = pickle.loads(pickle.dumps(first))
+        copy["data"]["b"] = {}
+
+        library.write(json.dumps({"data": {"a": {}, "bb": {}}}))
+        assert list(load_library(str(library))["data"].keys()) == ["a", "bb"]
+
+        # Least recently used library dropped
+        other = tmpdir.join("other.json")
+        other.write(json.dumps({"data": {}}))
+        first = load_library(str(library))
+        load_library(str(other))
+        assert load_library(str(library)) is not first
+    finally:
+        enable_cache(size=0)
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                    reason="Unix sockets required")
+def test_daemon(tmpdir):
+    socket_path = str(tmpdir.join("party.sock"))
+    assert not daemon.ping(socket_path)
+    server = threading.Thread(target=daemon.serve, args=(socket_path,))
+    server.start()
+    try:
+        for _ in range(100):
+            if daemon.ping(socket_path):
+                break
+            threading.Event().wait(0.05)
+        response = daemon.request(socket_path, {
+            "command": "run", "cwd": os.path.dirname(GOOD_LIBRARY),
+            "argv": ["query", "good_library.json", "--pattern", "6*"]})
+        assert response["exit_code"] == 0
+        assert response["stdout"].split() == ["608ZZ", "624ZZ"]
+        response = daemon.request(socket_path, {"command": "run", "cwd": ".",
+                                                "argv": ["unknown"]})
+        assert response["exit_code"] == 2
+    finally:
+        assert daemon.stop(socket_path)
+        server.join()
+    assert not os.path.exists(socket_path)
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="Unix required")
+def test_default_socket_path(tmpdir, monkeypatch):
+    monkeypatch.delenv("PARTY_DAEMON_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmpdir))
+    assert daemon.default_socket_path() == \
+        str(tmpdir.join("party-daemon.sock"))
+
+    # Private folder in the temporary folder without runtime folder
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setattr(tempfile, "gettempdir", lambda: str(tmpdir))
+    socket_path = daemon.default_socket_path()
+    folder = os.path.dirname(socket_path)
+    assert os.path.dirname(folder) == str(tmpdir)
+    assert stat.S_IMODE(os.stat(folder).st_mode) == 0o700
+
+    os.chmod(folder, 0o777)
+    with pytest.raises(RuntimeError):
+        daemon.default_socket_path()
@@ -0,0 +1,34 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the geometry module"""
+
+from party.geometry import GeometryCache
+
+
+def test_geometry_cache_lru():
+    cache = GeometryCache(10)
+    cache.put("a", "A", 4)
+    cache.put("b", "B", 4)
+    assert cache.get("a") == "A"
+    # b is the least recently used
+    cache.put("c", "C", 4)
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.size == 8
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_geometry_cache_too_large():
+    cache = GeometryCache(10)
+    cache.put("a", "A", 4)
+    cache.put("b", "B", 11)
+    assert len(cache) == 1
+    # Replacing an entry updates the size
+    cache.put("a", "A2", 6)
+    assert cache.get("a") == "A2"
+    assert cache.size == 6
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size == 0
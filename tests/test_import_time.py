@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Import time regression tests
+
+party is imported by short lived build scripts : importing a party module
+must not import the heavy dependencies (they are imported by the functions
+that need them) and must stay fast.
+
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+MODULES = ["party.anchors", "party.bundle", "party.cli", "party.daemon",
+           "party.library_checking", "party.library_creation",
+           "party.library_documentation", "party.library_loading",
+           "party.library_use",
+           "party.output", "party.properties", "party.scripts_checking",
+           "party.templating", "party.thumbnail", "party.viewer",
+           "party.geometry", "party.profiling"]
+
+HEAVY_MODULES = ["ccad", "jinja2", "numpy", "OCC", "multiprocessing"]
+
+# Total of the import times of the party modules themselves (without their
+# dependencies), in microseconds
+PARTY_IMPORT_TIME_BUDGET = 100000
+
+
+def _run_python(*args):
+    root_folder = os.path.join(os.path.dirname(__file__), "..")
+    return subprocess.check_output([sys.executable] + list(args),
+                                   cwd=root_folder,
+                                   stderr=subprocess.STDOUT,
+                                   universal_newlines=True)
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_no_heavy_import(module):
+    output = _run_python(
+        "-c", "import sys, %s; print(' '.join(sorted(sys.modules)))" % module)
+    imported = set(output.split())
+    for heavy_module in HEAVY_MODULES:
+        assert heavy_module not in imported
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason="python -X importtime requires Python 3.7+")
+def test_import_time_budget():
+    output = _run_python("-X", "importtime", "-c",
+                         "import %s" % ", ".join(MODULES))
+    party_self_time = 0
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, _, name = line[len("import time:"):].split("|")
+        if name.strip().split(".")[0] == "party":
+            party_self_time += int(self_time)
+    assert 0 < party_self_time < PARTY_IMPORT_TIME_BUDGET
@@ -3,11 +3,15 @@
 
 r"""Tests for rules_checking.py"""
 
+import json
 import os
 import pytest
 
 from party.library_checking import check_library_json_rules,\
-    check_library_units_definition, check_library_fields
+    check_library_units_definition, check_library_fields,\
+    check_duplicate_part_ids, check_duplicate_geometries,\
+    check_library_field_shapes, find_libraries, _chunks,\
+    check_library_json_rules_parallel, check_all_libraries, check_all
 
 
 # Rules checking related tests
@@ -143,3 +147,147 @@ def test_missing_field():
     assert "624ZZ" in errors
     assert errors["624ZZ"] == set(["flange_diameter", "flange_thickness"])
     assert errors["608ZZ"] == set(["flange_diameter", "flange_thickness"])
+
+
+def test_missing_field_majority_reference():
+    r"""The plain bearings are the majority"""
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/library_missing_field.json")
+    ok, errors, ref = check_library_fields(json_file, reference="majority")
+    assert ok is False
+    assert len(ref) == 8
+    assert errors == {"F63800ZZ": set(["flange_diameter", "flange_thickness"])}
+
+
+def test_unknown_fields_reference():
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    with pytest.raises(ValueError):
+        check_library_fields(json_file, reference="unknown")
+
+
+def test_field_shapes_ok():
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    ok, shapes, ref = check_library_field_shapes(json_file)
+    assert ok is True
+    assert len(shapes) == 0
+    assert len(ref) == 10
+
+
+def test_field_shapes_missing_field():
+    r"""The flanged bearing is the only member of a minority shape"""
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/library_missing_field.json")
+    ok, shapes, ref = check_library_field_shapes(json_file)
+    assert ok is False
+    assert len(ref) == 8
+    assert list(shapes.values()) == [["F63800ZZ"]]
+    assert list(shapes.keys())[0].difference(ref) == \
+        set(["flange_diameter", "flange_thickness"])
+
+
+# duplicates related tests
+
+
+def test_no_duplicate_part_ids():
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    ok, errors = check_duplicate_part_ids(json_file)
+    assert ok is True
+    assert len(errors) == 0
+
+
+def test_duplicate_part_ids():
+    r"""624ZZ is defined twice in the data section"""
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/library_duplicate_part_ids.json")
+    ok, errors = check_duplicate_part_ids(json_file)
+    assert ok is False
+    assert errors == {"624ZZ": 2}
+
+
+def test_no_duplicate_geometries():
+    r"""The flanged and plain bearings have different generators"""
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    ok, errors = check_duplicate_geometries(json_file)
+    assert ok is True
+    assert len(errors) == 0
+
+
+def test_duplicate_geometries():
+    r"""624ZZ-2RS only differs from 624ZZ by its name"""
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/library_duplicate_geometries.json")
+    ok, errors = check_duplicate_geometries(json_file)
+    assert ok is False
+    assert errors == {"624ZZ": ["624ZZ", "624ZZ-2RS"]}
+
+
+def test_duplicate_geometries_expressions(tmpdir):
+    r"""The fields used in Jinja expressions and statements are compared"""
+    json_file = str(tmpdir.join("library.json"))
+    with open(json_file, 'w') as f:
+        json.dump({"generators": {"g": ["{% if d %}",
+                                        "part = {{ 0.5 * d }}",
+                                        "{% endif %}"]},
+                   "data": {"a": {"generator": "g", "d": 1.0},
+                            "b": {"generator": "g", "d": 2.0}}}, f)
+    ok, errors = check_duplicate_geometries(json_file)
+    assert ok is True
+    assert len(errors) == 0
+
+
+# parallel checks related tests
+
+
+def test_find_libraries(tmpdir):
+    r"""Files named library.json are libraries, in sorted order"""
+    libraries = find_libraries(os.path.join(os.path.dirname(__file__),
+                                            "scripts"))
+    assert [os.path.basename(os.path.dirname(library))
+            for library in libraries] == ["sample_lib_missing",
+                                          "sample_lib_ok"]
+    tmpdir.join("other_library.json").write("{}")
+    assert find_libraries(str(tmpdir)) == []
+
+
+def _many_parts_library(tmpdir):
+    r"""A library of 25 parts, every third part breaking a rule"""
+    json_file = str(tmpdir.join("library.json"))
+    data = dict(("part_%02i" % i, {"weight": -1. if i % 3 == 0 else 1.,
+                                   "name": "part %i" % i})
+                for i in range(25))
+    with open(json_file, 'w') as f:
+        json.dump({"rules": ["weight > 0", "len(name) > 0"], "data": data},
+                  f)
+    return json_file
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_check_library_json_rules_parallel(tmpdir, processes):
+    r"""Same results as the serial check, in the order of the library"""
+    json_file = _many_parts_library(tmpdir)
+    ok, errors = check_library_json_rules(json_file)
+    parallel_ok, parallel_errors = check_library_json_rules_parallel(
+        json_file, processes=processes, chunk_size=4)
+    assert ok is False
+    assert parallel_ok == ok
+    assert parallel_errors == errors
+    assert list(parallel_errors.keys()) == sorted(errors.keys())
+
+
+def test_check_all_libraries():
+    folder = os.path.join(os.path.dirname(__file__), "json_files")
+    libraries = [os.path.join(folder, "good_library.json"),
+                 os.path.join(folder, "library_negative_weight.json")]
+    results = check_all_libraries(libraries, processes=2)
+    assert list(results.keys()) == libraries
+    for library in libraries:
+        assert results[library] == check_all(library)
+
+
+def test_chunks():
+    assert _chunks(list(range(5)), 2) == [[0, 1], [2, 3], [4]]
+    assert _chunks([], 2) == []
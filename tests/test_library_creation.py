@@ -0,0 +1,33 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the library_creation module"""
+
+import json
+
+import pytest
+
+from party.library_creation import template_handle_nomenclature
+
+
+def _library(tmpdir, data):
+    file_in = str(tmpdir.join("in.json"))
+    with open(file_in, 'w') as f:
+        json.dump({"metadata": {"nomenclature": "name"}, "data": data}, f)
+    return file_in, str(tmpdir.join("out.json"))
+
+
+def test_template_handle_nomenclature(tmpdir):
+    file_in, file_out = _library(tmpdir, {"a": {"name": "A"},
+                                          "b": {"name": "A"}})
+    template_handle_nomenclature(file_in, file_out)
+    with open(file_out) as f:
+        assert list(json.load(f)["data"].keys()) == ["A", "b"]
+
+
+def test_template_handle_nomenclature_fallback_collision(tmpdir):
+    r"""foo is renamed bar, and bar cannot keep its id"""
+    file_in, file_out = _library(tmpdir, {"foo": {"name": "bar", "v": 1},
+                                          "bar": {"name": "bar", "v": 2}})
+    with pytest.raises(ValueError):
+        template_handle_nomenclature(file_in, file_out)
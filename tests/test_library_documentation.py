@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the library_documentation module"""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from party.library_documentation import _library_rst, _library_rst_pages,\
+    _load_library, _catalog_index, create_library_catalog,\
+    _write_if_changed, create_libraries_sphinx_sources, _rst_table
+
+
+def test_write_if_changed(tmpdir):
+    file_path = str(tmpdir.join("library.rst"))
+    assert _write_if_changed(file_path, "content") is True
+    assert _write_if_changed(file_path, "content") is False
+    assert _write_if_changed(file_path, "new content") is True
+    with open(file_path) as f:
+        assert f.read() == "new content"
+
+
+def test_library_rst_columns_order():
+    r"""The columns are in the order of the fields of the first part"""
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    lines = _library_rst(json_file).split("\n")
+    assert lines[0] == "rolling-bearings-library"
+    assert lines[4].split() == ["part_id", "bearing_name", "generator",
+                                "outer_diameter", "inner_diameter",
+                                "thickness", "flange_diameter",
+                                "flange_thickness", "load_static",
+                                "load_dynamic", "weight"]
+    assert lines[6].split()[0] == "608ZZ"
+    assert len(lines) == 10
+
+
+def test_rst_table_short_part_ids():
+    r"""The part_id column is as wide as its header if the part ids are
+    shorter"""
+    lines = _rst_table(["d"], [("608ZZ", {"d": 8.}), ("6", {"d": 6.})])
+    assert lines[:3] == ["======= ===", "part_id d  ", "======= ==="]
+    assert lines[3] == "608ZZ   8.0 "
+    assert lines[-1] == lines[0]
+
+
+def test_library_rst_pages_single_page():
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    pages = _library_rst_pages(json_file)
+    assert list(pages.keys()) == ["rolling-bearings-library"]
+    assert pages["rolling-bearings-library"] == _library_rst(json_file)
+
+
+def test_library_rst_pages_group_by():
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    pages = _library_rst_pages(json_file, group_by="generator")
+    assert list(pages.keys()) == ["rolling-bearings-library",
+                                  "rolling-bearings-library_plain_bearing",
+                                  "rolling-bearings-library_flanged_bearing"]
+    index = pages["rolling-bearings-library"]
+    assert ".. toctree::" in index
+    assert "   rolling-bearings-library_plain_bearing" in index
+    flanged = pages["rolling-bearings-library_flanged_bearing"].split("\n")
+    assert len(flanged) == 8  # title (3 lines) + table with 1 part
+    assert flanged[6].split()[0] == "F63800ZZ"
+
+
+def test_library_rst_pages_rows_per_page():
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    pages = _library_rst_pages(json_file, rows_per_page=2)
+    assert list(pages.keys()) == ["rolling-bearings-library",
+                                  "rolling-bearings-library_parts_1",
+                                  "rolling-bearings-library_parts_2"]
+    assert len(pages["rolling-bearings-library_parts_1"].split("\n")) == 9
+    assert len(pages["rolling-bearings-library_parts_2"].split("\n")) == 8
+
+
+def test_catalog_index():
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    json_file_content, fields = _load_library(json_file)
+    index = _catalog_index(json_file_content, fields)
+    assert index["part_ids"] == ["608ZZ", "624ZZ", "F63800ZZ"]
+    assert index["columns"]["weight"] == [12.0, 2.7, 8.1]
+    assert index["sorted"]["weight"] == [1, 2, 0]
+    assert index["columns"]["generator"] == {
+        "values": ["flanged_bearing", "plain_bearing"], "codes": [1, 1, 0]}
+    assert "generator" not in index["sorted"]
+    assert index["tokens"]["f63800zz"] == [2]
+    assert index["previews"] == [None, None, None]
+
+
+def test_create_library_catalog(tmpdir):
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    catalog_path = create_library_catalog(json_file, str(tmpdir))
+    assert os.path.isfile(catalog_path)
+    with open(str(tmpdir.join("catalog_index.js"))) as f:
+        assert f.read().startswith("var PARTY_CATALOG = {")
+
+
+def _sphinx_sources(tmpdir, **kwargs):
+    libraries = tmpdir.ensure("libraries", dir=True)
+    shutil.copy(os.path.join(os.path.dirname(__file__), "json_files",
+                             "good_library.json"),
+                str(libraries.join("library.json")))
+    doc_folder = tmpdir.join("doc")
+    doc_folder.ensure(dir=True)
+    create_libraries_sphinx_sources(str(libraries), str(doc_folder),
+                                    processes=1, **kwargs)
+    return sorted(name for name in os.listdir(str(doc_folder.join("source")))
+                  if name.endswith(".rst"))
+
+
+def test_create_libraries_sphinx_sources_stale_pages(tmpdir, monkeypatch):
+    r"""The pages of a previous split are removed"""
+    monkeypatch.setattr(subprocess, "call", lambda args: 0)
+    assert _sphinx_sources(tmpdir, group_by="generator") == [
+        "index.rst", "rolling-bearings-library.rst",
+        "rolling-bearings-library_flanged_bearing.rst",
+        "rolling-bearings-library_plain_bearing.rst"]
+    assert _sphinx_sources(tmpdir) == ["index.rst",
+                                       "rolling-bearings-library.rst"]
+
+
+def test_create_libraries_sphinx_sources_sphinx_error(tmpdir, monkeypatch):
+    monkeypatch.setattr(subprocess, "call", lambda args: 2)
+    with pytest.raises(RuntimeError):
+        _sphinx_sources(tmpdir)
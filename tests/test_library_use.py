@@ -0,0 +1,368 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the library_use module"""
+
+import os
+import json
+import shutil
+import struct
+import zipfile
+import pytest
+
+from party.library_use import select_parts, iter_generate, \
+    generate_assembly, write_binary_stl
+from party.geometry import Backend
+from party.stub_model import box
+from party.properties import load_properties
+
+from tests.conftest import FakeBackend
+
+
+def _good_library_data():
+    json_file = os.path.join(os.path.dirname(__file__),
+                             "./json_files/good_library.json")
+    with open(json_file) as data_file:
+        return json.load(data_file)["data"]
+
+
+def test_select_all_parts():
+    r"""No filter selects every part"""
+    data = _good_library_data()
+    selection = select_parts(data)
+    assert [part_id for part_id, _ in selection] == list(data.keys())
+
+
+def test_select_explicit_part_ids():
+    selection = select_parts(_good_library_data(),
+                             part_ids=["624ZZ", "608ZZ", "624ZZ"])
+    assert [part_id for part_id, _ in selection] == ["624ZZ", "608ZZ"]
+
+
+def test_select_unknown_part_id():
+    with pytest.raises(KeyError):
+        select_parts(_good_library_data(), part_ids=["unknown"])
+
+
+def test_select_patterns():
+    selection = select_parts(_good_library_data(), patterns=["6*ZZ"])
+    assert sorted(part_id for part_id, _ in selection) == ["608ZZ", "624ZZ"]
+
+
+def test_select_patterns_and_part_ids():
+    selection = select_parts(_good_library_data(), part_ids=["F63800ZZ"],
+                             patterns=["60*"])
+    assert sorted(part_id for part_id, _ in selection) == ["608ZZ",
+                                                             "F63800ZZ"]
+
+
+def test_select_where_expression():
+    selection = select_parts(_good_library_data(),
+                             where="generator == 'plain_bearing' and "
+                                   "weight > 10")
+    assert [part_id for part_id, _ in selection] == ["608ZZ"]
+
+
+def test_select_where_unknown_field():
+    r"""Parts without the fields used in the predicate are not selected"""
+    selection = select_parts(_good_library_data(), where="threading == 'M2'")
+    assert selection == []
+
+
+def test_select_where_evaluation_error():
+    r"""A part for which the predicate fails is not selected, the other
+    parts are"""
+    data = {"a": {"d": 0.}, "b": {"d": 2.}, "c": {"d": "text"}}
+    selection = select_parts(data, where="1. / d > 0.1")
+    assert [part_id for part_id, _ in selection] == ["b"]
+
+
+def test_select_where_dict():
+    selection = select_parts(_good_library_data(), patterns=["*"],
+                             where={"generator": "flanged_bearing"})
+    assert [part_id for part_id, _ in selection] == ["F63800ZZ"]
+
+
+def _sample_library(tmpdir):
+    shutil.copy(os.path.join(os.path.dirname(__file__), "scripts",
+                             "sample_lib_ok", "library.json"), str(tmpdir))
+    return str(tmpdir.join("library.json"))
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_iter_generate_scripts(tmpdir, processes):
+    records = list(iter_generate(_sample_library(tmpdir), backend="stub",
+                                 processes=processes))
+    part_ids = [record["part_id"] for record in records]
+    assert sorted(part_ids) == ["M1.6x12_A", "M1.6x16_A", "M2x16_A",
+                                "M2x20_A", "M2x20_B"]
+    if processes == 1:
+        assert part_ids == sorted(part_ids)  # library order
+    for record in records:
+        assert record["error"] is None
+        assert os.path.isfile(record["script"])
+        assert list(record["timings"].keys()) == ["script"]
+
+
+def test_iter_generate_error_records(tmpdir):
+    r"""The stub backend cannot export : the error is in the part record"""
+    records = list(iter_generate(_sample_library(tmpdir), generate_steps=True,
+                                 part_ids=["M2x16_A"], backend="stub"))
+    assert len(records) == 1
+    assert "cannot export" in records[0]["error"]
+    assert os.path.isfile(records[0]["script"])
+    assert len(records[0]["exports"]) == 0
+
+
+def test_iter_generate_raise_errors(tmpdir):
+    with pytest.raises(ValueError):
+        list(iter_generate(_sample_library(tmpdir), generate_steps=True,
+                           backend="stub", raise_errors=True))
+
+
+def test_iter_generate_lazy(tmpdir):
+    r"""Parts are generated as the records are consumed"""
+    backend = FakeBackend()
+    records = iter_generate(_sample_library(tmpdir), generate_steps=True,
+                            backend=backend)
+    next(records)
+    assert backend.builds == 1
+    records.close()
+
+
+def test_iter_generate_module(tmpdir):
+    records = list(iter_generate(_sample_library(tmpdir), generate_stls=True,
+                                 backend=FakeBackend(),
+                                 output_mode="module"))
+    assert not tmpdir.join("scripts").check()
+    assert tmpdir.join("library_parts.py").check()
+    for record in records:
+        assert record["error"] is None
+        assert record["script"] is None
+        assert list(record["timings"].keys()) == ["geometry", "stl"]
+
+    # Same geometry as the scripts
+    script_records = iter_generate(str(tmpdir.join("library.json")),
+                                   generate_stls=True,
+                                   backend=FakeBackend())
+    for record, script_record in zip(records, script_records):
+        assert record["part_id"] == script_record["part_id"]
+        with open(script_record["exports"]["stl"]) as f:
+            script_bounds = f.read()
+        assert script_bounds == open(record["exports"]["stl"]).read()
+
+
+def test_iter_generate_both_processes(tmpdir):
+    records = list(iter_generate(_sample_library(tmpdir), generate_steps=True,
+                                 backend=FakeBackend(), processes=2,
+                                 output_mode="both"))
+    assert len(records) == 5
+    for record in records:
+        assert record["error"] is None
+        assert os.path.isfile(record["script"])
+        assert os.path.isfile(record["exports"]["step"])
+
+
+def test_iter_generate_unknown_output_mode(tmpdir):
+    with pytest.raises(ValueError):
+        next(iter_generate(_sample_library(tmpdir), output_mode="zip"))
+
+
+def test_iter_generate_archive(tmpdir):
+    records = list(iter_generate(_sample_library(tmpdir), generate_stls=True,
+                                 backend=FakeBackend(), archive="zip"))
+    assert sorted(path.basename for path in tmpdir.listdir()) == \
+        ["library.json", "library.zip"]
+    with zipfile.ZipFile(str(tmpdir.join("library.zip"))) as archive:
+        members = archive.namelist()
+    for record in records:
+        assert record["script"] in members
+        assert record["exports"]["stl"] in members
+    assert len(members) == 10
+
+
+def test_iter_generate_interrupted(tmpdir):
+    r"""No file is published (nor left behind) by an interrupted
+    generation"""
+    records = iter_generate(_sample_library(tmpdir), generate_stls=True,
+                            backend=FakeBackend())
+    next(records)
+    records.close()
+    assert [path.basename for path in tmpdir.listdir()] == ["library.json"]
+
+
+def test_iter_generate_stl_quality(tmpdir):
+    records = list(iter_generate(_sample_library(tmpdir), generate_stls=True,
+                                 backend=FakeBackend(),
+                                 stl_quality="preview"))
+    assert len(records) == 5
+    for record in records:
+        assert record["error"] is None
+        with open(record["exports"]["stl"], 'rb') as f:
+            content = f.read()
+        assert len(content) == 84 + 50 * 12
+        assert struct.unpack("<I", content[80:84]) == (12,)
+        # Outward normal of the first (x = x_min) face
+        assert struct.unpack("<3f", content[84:96]) == (-1., 0., 0.)
+
+
+def test_iter_generate_unknown_stl_quality(tmpdir):
+    with pytest.raises(ValueError):
+        next(iter_generate(_sample_library(tmpdir), generate_stls=True,
+                           stl_quality="draft"))
+
+
+def test_iter_generate_shared_html(tmpdir):
+    library = _sample_library(tmpdir)
+    records = list(iter_generate(library, generate_htmls=True,
+                                 patterns=["M2x*"], backend=FakeBackend(),
+                                 html_mode="shared"))
+    for record in records:
+        assert record["error"] is None
+        assert record["exports"]["html"].endswith(".mesh")
+    assert sorted(path.basename for path in tmpdir.join("htmls").listdir()) \
+        == ["M2x16_A.mesh", "M2x20_A.mesh", "M2x20_B.mesh", "index.html",
+            "viewer.js"]
+
+    # The index lists the meshes already generated
+    list(iter_generate(library, generate_htmls=True, part_ids=["M1.6x12_A"],
+                       backend=FakeBackend(), html_mode="shared"))
+    index = tmpdir.join("htmls", "index.html").read()
+    parts = json.loads(index.split("var PARTY_PARTS = ")[1].split(";")[0])
+    assert [part["id"] for part in parts] == ["M1.6x12_A", "M2x16_A",
+                                              "M2x20_A", "M2x20_B"]
+
+
+def test_iter_generate_properties(tmpdir):
+    library = _sample_library(tmpdir)
+    records = list(iter_generate(library, patterns=["M2x*"], backend="stub",
+                                 generate_properties=True, density_field="p"))
+    for record in records:
+        assert record["error"] is None
+        assert "properties" in record["timings"]
+    properties = load_properties(library)
+    assert list(properties.keys()) == ["M2x16_A", "M2x20_A", "M2x20_B"]
+    assert properties["M2x16_A"] == records[0]["properties"]
+    assert properties["M2x16_A"]["volume"] > 0.
+    assert properties["M2x16_A"]["mass"] == \
+        pytest.approx(properties["M2x16_A"]["volume"] * 0.4)
+
+    # Merged with the existing table, module output, no density
+    list(iter_generate(library, part_ids=["M1.6x12_A"], backend="stub",
+                       output_mode="module", generate_properties=True))
+    properties = load_properties(library)
+    assert list(properties.keys()) == ["M1.6x12_A", "M2x16_A", "M2x20_A",
+                                       "M2x20_B"]
+    assert properties["M1.6x12_A"]["mass"] is None
+    assert properties["M1.6x12_A"]["bounds"] is not None
+
+
+def test_mesh_backend_properties():
+    r"""The default properties integrate the triangles of the part"""
+    properties = Backend.properties(FakeBackend(), box(1., 2., 3.))
+    assert properties["volume"] == pytest.approx(6.)
+    assert properties["centroid"] == pytest.approx([0.5, 1., 1.5])
+
+
+def test_iter_generate_thumbnails(tmpdir):
+    records = list(iter_generate(_sample_library(tmpdir), generate_stls=True,
+                                 backend=FakeBackend(), processes=2,
+                                 stl_quality="preview",
+                                 generate_thumbnails=True, thumbnail_size=16))
+    assert len(records) == 5
+    for record in records:
+        assert record["error"] is None
+        assert list(record["exports"].keys()) == ["stl", "png"]
+        with open(record["exports"]["png"], 'rb') as f:
+            content = f.read()
+        assert content[:8] == b"\x89PNG\r\n\x1a\n"
+        assert struct.unpack(">II", content[16:24]) == (16, 16)
+    assert len(tmpdir.join("thumbnails").listdir()) == 5
+
+
+def test_iter_generate_invalid_thumbnail_size(tmpdir):
+    with pytest.raises(ValueError):
+        next(iter_generate(_sample_library(tmpdir), generate_thumbnails=True,
+                           thumbnail_size=0))
+
+
+def test_iter_generate_builds_once(tmpdir):
+    r"""A single build per part for all the exports, and a single build for
+    the parts with the same parameters"""
+    library = _sample_library(tmpdir)
+    with open(library) as f:
+        json_file_content = json.load(f)
+    copy = dict(json_file_content["data"]["M2x16_A"])
+    copy["description"] = "Same geometry as M2x16_A"
+    json_file_content["data"]["M2x16_A_copy"] = copy
+    with open(library, 'w') as f:
+        json.dump(json_file_content, f)
+
+    backend = FakeBackend()
+    records = list(iter_generate(library, generate_steps=True,
+                                 generate_stls=True, generate_htmls=True,
+                                 generate_properties=True, backend=backend))
+    assert backend.builds == 5
+    assert open(records[-1]["exports"]["stl"]).read() == \
+        open(records[2]["exports"]["stl"]).read()
+
+    backend = FakeBackend()
+    list(iter_generate(library, generate_steps=True, generate_stls=True,
+                       backend=backend, geometry_cache_size=0))
+    assert backend.builds == 6
+
+
+def test_iter_generate_geometry_size_fallback(tmpdir):
+    r"""The parts are still generated and cached when their size cannot be
+    estimated"""
+    library = _sample_library(tmpdir)
+    backend = FakeBackend(sizes=False)
+    records = list(iter_generate(library, generate_steps=True,
+                                 backend=backend))
+    assert all(record["error"] is None for record in records)
+    assert backend.builds == 5
+
+
+def test_write_binary_stl_batches(tmpdir):
+    triangle = ((0., 0., 0.), (1., 0., 0.), (0., 1., 0.))
+    path = str(tmpdir.join("t.stl"))
+    assert write_binary_stl(path, (triangle for _ in range(5000))) == 5000
+    with open(path, 'rb') as f:
+        content = f.read()
+    assert len(content) == 84 + 50 * 5000
+    assert struct.unpack("<12fH", content[-50:]) == \
+        (0., 0., 1.) + sum(triangle, ()) + (0,)
+
+
+def test_generate_assembly_grid(tmpdir):
+    paths = generate_assembly(_sample_library(tmpdir), formats=["step", "stl"],
+                              spacing=1., backend=FakeBackend())
+    assert list(paths.keys()) == ["step", "stl"]
+    assert paths["step"] == str(tmpdir.join("library_assembly.stp"))
+    with open(paths["stl"]) as f:
+        parts = json.load(f)
+    assert [name for name, _ in parts] == ["M1.6x12_A", "M1.6x16_A",
+                                           "M2x16_A", "M2x20_A", "M2x20_B"]
+    # 3 x 3 grid, no overlap
+    assert parts[0][1][:2] == [0., 0.]
+    assert len(set((bounds[0], bounds[1]) for _, bounds in parts)) == 5
+    for i, (_, bounds) in enumerate(parts):
+        for _, other_bounds in parts[i + 1:]:
+            assert bounds[3] < other_bounds[0] or bounds[4] < other_bounds[1]
+
+
+def test_generate_assembly_origin(tmpdir):
+    paths = generate_assembly(_sample_library(tmpdir), layout="origin",
+                              patterns=["M2x*"], assembly_name="m2",
+                              backend=FakeBackend())
+    assert sorted(path.basename for path in tmpdir.listdir()) == \
+        ["library.json", "m2.stp"]
+    with open(paths["step"]) as f:
+        parts = json.load(f)
+    assert len(parts) == 3
+    assert parts[0][1][:2] == parts[1][1][:2]
+
+
+def test_generate_assembly_unknown_format(tmpdir):
+    with pytest.raises(ValueError):
+        generate_assembly(_sample_library(tmpdir), formats=["html"])
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the output module"""
+
+import os
+import socket
+import tarfile
+import zipfile
+
+import pytest
+
+from party.output import OutputWriter, remove_stale_staging_folders
+
+
+def test_commit(tmpdir):
+    with OutputWriter(str(tmpdir)) as writer:
+        writer.write("library.json", "{}")
+        with open(writer.staged_path("steps/a.stp"), 'w') as f:
+            f.write("a")
+        # Nothing in place before the commit
+        assert not tmpdir.join("library.json").check()
+        assert not tmpdir.join("steps").check()
+    assert tmpdir.join("library.json").read() == "{}"
+    assert tmpdir.join("steps", "a.stp").read() == "a"
+    assert [path.basename for path in tmpdir.listdir()] == \
+        sorted(["library.json", "steps"])
+
+
+def test_abort(tmpdir):
+    with pytest.raises(RuntimeError):
+        with OutputWriter(str(tmpdir)) as writer:
+            writer.write("library.json", "{}")
+            writer.flush()
+            raise RuntimeError
+    assert tmpdir.listdir() == []
+
+
+def test_publish(tmpdir):
+    writer = OutputWriter(str(tmpdir), buffer_size=1)
+    writer.write("scripts/a.py", "part = 1")
+    assert writer.publish(["scripts/a.py"]) == \
+        [os.path.join(str(tmpdir), "scripts", "a.py")]
+    writer.write("scripts/b.py", "part = 2")
+    writer.abort()
+    assert os.listdir(str(tmpdir.join("scripts"))) == ["a.py"]
+
+
+def test_publish_new_folder(tmpdir):
+    r"""A folder new in the destination is moved at once, the files of an
+    existing folder one by one"""
+    tmpdir.mkdir("stls").join("old.stl").write("old")
+    writer = OutputWriter(str(tmpdir))
+    for name in ["a", "b"]:
+        writer.write("scripts/%s.py" % name, name)
+        writer.write("stls/%s.stl" % name, name)
+    assert sorted(writer.commit()) == sorted(
+        os.path.join(str(tmpdir), path) for path in [
+            "scripts/a.py", "scripts/b.py", "stls/a.stl", "stls/b.stl"])
+    assert sorted(os.listdir(str(tmpdir.join("scripts")))) == \
+        ["a.py", "b.py"]
+    assert sorted(os.listdir(str(tmpdir.join("stls")))) == \
+        ["a.stl", "b.stl", "old.stl"]
+
+
+def test_remove_stale_staging_folders(tmpdir):
+    r"""The staging folder of a process that does not exist anymore is
+    removed, not the staging folder of a running process"""
+    writer = OutputWriter(str(tmpdir))
+    stale = tmpdir.mkdir(".party-staging-%s-999999999-abc" %
+                         socket.gethostname())
+    assert remove_stale_staging_folders(str(tmpdir)) == [str(stale)]
+    assert os.path.isdir(writer.staging_folder)
+    OutputWriter(str(tmpdir)).abort()
+    assert os.path.isdir(writer.staging_folder)
+    writer.abort()
+
+
+@pytest.mark.parametrize("archive", ["zip", "tar", "tar.gz"])
+def test_archive(tmpdir, archive):
+    with OutputWriter(str(tmpdir), archive=archive,
+                      archive_name="library") as writer:
+        writer.write("scripts/a.py", "part = 1")
+        with open(writer.staged_path("steps/a.stp"), 'w') as f:
+            f.write("a")
+    assert [path.basename for path in tmpdir.listdir()] == \
+        ["library.%s" % archive]
+    if archive == "zip":
+        with zipfile.ZipFile(writer.archive_path) as f:
+            assert sorted(f.namelist()) == ["scripts/a.py", "steps/a.stp"]
+            assert f.read("scripts/a.py") == b"part = 1"
+    else:
+        with tarfile.open(writer.archive_path) as f:
+            assert sorted(f.getnames()) == ["scripts/a.py", "steps/a.stp"]
+
+
+def test_unknown_archive_format(tmpdir):
+    with pytest.raises(ValueError):
+        OutputWriter(str(tmpdir), archive="rar")
@@ -0,0 +1,81 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the profiling module"""
+
+import json
+import os
+import sys
+
+from party.profiling import profile_run, stage, active_profiler, main
+from party.library_checking import check_library_units_definition
+
+
+def test_no_active_profiler():
+    r"""Stages are not recorded when no profiler is active"""
+    assert active_profiler() is None
+    with stage("nothing", part_id="part"):
+        pass
+    assert active_profiler() is None
+
+
+def test_stages_are_recorded():
+    with profile_run() as profiler:
+        with stage("outer"):
+            with stage("inner", part_id="608ZZ"):
+                pass
+            with stage("inner", part_id="624ZZ"):
+                pass
+    assert active_profiler() is None
+    assert [record["name"] for record in profiler.records] == ["inner",
+                                                               "inner",
+                                                               "outer"]
+    assert profiler.records[0]["args"] == {"part_id": "608ZZ"}
+    summary = profiler.summary()
+    assert summary["inner"]["count"] == 2
+    assert list(summary.keys())[0] == "outer"
+
+
+def test_failing_stage_is_recorded():
+    with profile_run() as profiler:
+        try:
+            with stage("failing"):
+                raise ValueError("failure")
+        except ValueError:
+            pass
+    assert "error" in profiler.records[0]["args"]
+
+
+def test_exports(tmpdir):
+    json_path = str(tmpdir.join("timings.json"))
+    trace_path = str(tmpdir.join("trace.json"))
+    with profile_run(json_path=json_path, trace_path=trace_path):
+        check_library_units_definition(
+            os.path.join(os.path.dirname(__file__),
+                         "./json_files/good_library.json"))
+        with stage("stage"):
+            pass
+    with open(json_path) as f:
+        timings = json.load(f)
+    assert list(timings["summary"].keys()) == ["stage"]
+    with open(trace_path) as f:
+        trace = json.load(f)
+    assert trace["traceEvents"][0]["ph"] == "X"
+    assert trace["traceEvents"][0]["name"] == "stage"
+
+
+def test_main(tmpdir):
+    script_path = str(tmpdir.join("script.py"))
+    with open(script_path, 'w') as f:
+        f.write("import sys\n"
+                "from party.profiling import stage\n"
+                "with stage('script_stage', arg=sys.argv[1]):\n"
+                "    pass\n")
+    json_path = str(tmpdir.join("timings.json"))
+    argv, path = list(sys.argv), list(sys.path)
+    main(["--json", json_path, script_path, "value"])
+    assert sys.argv == argv
+    assert sys.path == path
+    with open(json_path) as f:
+        timings = json.load(f)
+    assert timings["records"][0]["args"] == {"arg": "value"}
@@ -0,0 +1,50 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the properties module"""
+
+import json
+
+import pytest
+
+from party.properties import mesh_properties, properties_table, \
+    load_properties, properties_path
+
+from tests.conftest import box_triangles
+
+
+def test_mesh_properties_box():
+    properties = mesh_properties(box_triangles(1., 2., 3., 3., 5., 7.))
+    assert properties["bounds"] == [1., 2., 3., 3., 5., 7.]
+    assert properties["volume"] == pytest.approx(2. * 3. * 4.)
+    assert properties["area"] == pytest.approx(2. * (6. + 12. + 8.))
+    assert properties["centroid"] == pytest.approx([2., 3.5, 5.])
+
+
+def test_mesh_properties_empty():
+    properties = mesh_properties([])
+    assert properties["bounds"] is None
+    assert properties["volume"] == 0.
+    assert properties["centroid"] is None
+
+
+def test_properties_table_merge():
+    library = {"metadata": {"units": {"length": "mm"}},
+               "data": {"a": {}, "b": {}, "c": {}}}
+    table = properties_table(library, {"b": {"volume": 2.}},
+                             previous={"a": {"volume": 1.},
+                                       "b": {"volume": 0.},
+                                       "removed": {"volume": 3.}})
+    assert table["units"] == {"length": "mm"}
+    assert dict(table["parts"]) == {"a": {"volume": 1.}, "b": {"volume": 2.}}
+
+
+def test_load_properties_format(tmpdir):
+    library = str(tmpdir.join("library.json"))
+    assert properties_path(library) == \
+        str(tmpdir.join("library_properties.json"))
+    with pytest.raises(IOError):
+        load_properties(library)
+    tmpdir.join("library_properties.json").write(json.dumps({"format": 0}))
+    with pytest.raises(ValueError):
+        load_properties(library)
@@ -5,7 +5,8 @@ r"""Tests for the scripts_checking module"""
 
 import pytest
 from os.path import join, dirname, isdir
-from party.scripts_checking import check_script, check_all_scripts_from_library_jsons
+from party.scripts_checking import check_script, check_all_scripts_from_library_jsons,\
+    script_bounds
 
 
 def test_check_all_scripts_lib_ok():
@@ -67,3 +68,51 @@ def test_invalid_script_part_and_anchors_not_defined():
     ok, errors = check_script(join(dirname(__file__), "scripts/invalid_part_and_anchors_not_defined.py"))
     assert ok is False
     assert len(errors) == 2
+
+
+# stub geometry backend
+
+
+def test_check_all_scripts_lib_ok_stub():
+    ok, all_errors = check_all_scripts_from_library_jsons(join(dirname(__file__), "scripts/sample_lib_ok"),
+                                                          backend="stub")
+    assert ok is True
+
+
+def test_check_all_scripts_lib_missing_stub():
+    ok, all_errors = check_all_scripts_from_library_jsons(join(dirname(__file__), "scripts/sample_lib_missing"),
+                                                          backend="stub")
+    assert ok is False
+    assert len(all_errors.keys()) == 1
+
+
+def test_valid_script_stub():
+    ok, errors = check_script(join(dirname(__file__), "scripts/valid.py"), backend="stub")
+    assert ok is True
+    assert len(errors) == 0
+
+
+def test_invalid_scripts_stub():
+    for script, nb_errors in [("invalid_part_not_defined.py", 1),
+                              ("invalid_part_is_none.py", 1),
+                              ("invalid_anchors_not_a_dict.py", 1),
+                              ("invalid_part_and_anchors_not_defined.py", 2)]:
+        ok, errors = check_script(join(dirname(__file__), "scripts", script), backend="stub")
+        assert ok is False
+        assert len(errors) == nb_errors
+
+
+def test_invalid_file_stub():
+    with pytest.raises(IOError):
+        _, _ = check_script(join(dirname(__file__), "scripts/unknown.py"), backend="stub")
+
+
+def test_script_bounds_stub():
+    bounds = script_bounds(join(dirname(__file__), "scripts/valid.py"))
+    assert bounds == (-10., -10., 0., 10., 10., 100.)
+
+
+def test_screw_script_bounds_stub():
+    xmin, ymin, zmin, xmax, ymax, zmax = script_bounds(
+        join(dirname(__file__), "scripts/sample_lib_ok/scripts/M2x20_A.py"))
+    assert zmin < 0. < zmax
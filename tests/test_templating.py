@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the templating module"""
+
+from party.templating import generator_parameters, library_module_code, \
+    template_names
+
+GENERATOR = ["from ccad.model import box",
+             "",
+             "part = box({{ x }}, {{y}}, {{ x }})",
+             "anchors = {}"]
+
+
+def _module(json_generators, parts):
+    module = dict()
+    exec(compile(library_module_code(json_generators, parts), "<module>",
+                 "exec"), module)
+    return module
+
+
+def test_generator_parameters():
+    assert generator_parameters(GENERATOR) == ["x", "y"]
+    assert generator_parameters(["part = '{{ name }}'"]) is None
+    assert generator_parameters(["{% if x %}part = 1{% endif %}"]) is None
+    assert generator_parameters(["part = {{ x * 2 }}"]) is None
+
+
+def test_template_names():
+    assert template_names(GENERATOR) == ["x", "y"]
+    assert template_names(["part = {{ 0.5 * d }}"]) == ["d"]
+    assert "d" in template_names(["{% if d > 2 %}part = 1{% endif %}"])
+
+
+def test_library_module_code():
+    generators = {"gen": ["part = ({{ x }}, {{ y }})", "anchors = {}"],
+                  "text": ["part = '{{ name }}'", "anchors = {{ x }}"]}
+    parts = [("a", {"generator": "gen", "x": 1, "y": 2.5}),
+             ("b", {"generator": "text", "name": "b part", "x": {}}),
+             ("c", {"generator": "gen", "x": "1 + 1", "y": 3})]
+    module = _module(generators, parts)
+    assert module["part_ids"]() == ["a", "b", "c"]
+    assert module["get_part"]("a") == ((1, 2.5), {})
+    assert module["get_part"]("b") == ("b part", {})
+    # text value : rendered as Python code, as in the geometry script
+    assert module["get_part"]("c") == ((2, 3), {})
+    # 'c' has its own function, 'a' uses the 'gen' generator function
+    assert module["PARTS"]["a"][0] is not module["PARTS"]["c"][0]
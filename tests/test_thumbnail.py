@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the thumbnail module"""
+
+import struct
+import zlib
+
+from party.thumbnail import render, png_bytes, write_thumbnail
+
+
+def _png_pixels(content):
+    r"""Size and RGBA rows of a PNG written by png_bytes()"""
+    assert content[:8] == b"\x89PNG\r\n\x1a\n"
+    width, height = struct.unpack(">II", content[16:24])
+    idat_length = struct.unpack(">I", content[33:37])[0]
+    assert content[37:41] == b"IDAT"
+    raw = zlib.decompress(content[41:41 + idat_length])
+    stride = 1 + 4 * width
+    return width, height, [raw[i * stride + 1:(i + 1) * stride]
+                           for i in range(height)]
+
+
+def test_render_cube(cube):
+    rows = render(cube, size=32)
+    assert len(rows) == 32
+    # Transparent corners, opaque center
+    assert rows[0][3] == 0
+    assert rows[16][4 * 16 + 3] == 255
+    # 3 faces with different lightings
+    colors = set(bytes(row[i:i + 4]) for row in rows
+                 for i in range(0, len(row), 4) if row[i + 3] == 255)
+    assert len(colors) == 3
+
+
+def test_write_thumbnail(tmpdir, cube):
+    path = str(tmpdir.join("cube.png"))
+    write_thumbnail(path, cube, size=20)
+    with open(path, 'rb') as f:
+        width, height, rows = _png_pixels(f.read())
+    assert (width, height) == (20, 20)
+    assert rows == [bytes(row) for row in render(cube, size=20)]
+
+
+def test_empty_thumbnail():
+    width, height, rows = _png_pixels(png_bytes(render([], size=8)))
+    assert (width, height) == (8, 8)
+    assert all(row == b"\0" * 32 for row in rows)
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# coding: utf-8
+
+r"""Tests for the viewer module"""
+
+import json
+
+import pytest
+
+from party.viewer import write_mesh, read_mesh, index_html
+
+
+def _quad(z):
+    return [((0., 0., z), (2., 0., z), (2., 1., z)),
+            ((0., 0., z), (2., 1., z), (0., 1., z))]
+
+
+def test_mesh_round_trip(tmpdir):
+    path = str(tmpdir.join("a.mesh"))
+    info = write_mesh(path, iter(_quad(0.) + _quad(3.)))
+    # The shared vertices are written once
+    assert info["vertices"] == 8
+    assert info["triangles"] == 4
+    assert info["bounds"] == [0., 0., 0., 2., 1., 3.]
+
+    bounds, vertices, triangles = read_mesh(path)
+    assert bounds == info["bounds"]
+    assert len(triangles) == 4
+    for triangle, expected in zip(triangles, _quad(0.) + _quad(3.)):
+        for index, vertex in zip(triangle, expected):
+            assert vertices[index] == pytest.approx(vertex, abs=1e-4)
+
+
+def test_mesh_alignment(tmpdir):
+    r"""The indices start on a multiple of 4 bytes"""
+    path = str(tmpdir.join("a.mesh"))
+    write_mesh(path, [((0., 0., 0.), (1., 0., 0.), (0., 1., 0.))])
+    # 44 bytes header, 3 vertices of 6 bytes, 2 bytes padding, 3 indices
+    assert tmpdir.join("a.mesh").size() == 44 + 18 + 2 + 6
+    assert read_mesh(path)[2] == [(0, 1, 2)]
+
+
+def test_empty_mesh(tmpdir):
+    path = str(tmpdir.join("a.mesh"))
+    assert write_mesh(path, [])["triangles"] == 0
+    assert read_mesh(path) == ([0.] * 6, [], [])
+
+
+def test_not_a_mesh(tmpdir):
+    tmpdir.join("a.mesh").write_binary(b"solid a" + b"\0" * 80)
+    with pytest.raises(ValueError):
+        read_mesh(str(tmpdir.join("a.mesh")))
+
+
+def test_index_html():
+    html = index_html("<screws>", [("M2x16_A", "M2x16_A.mesh"),
+                                   ("</script>", "x.mesh")])
+    assert "<title>&lt;screws&gt;</title>" in html
+    parts = html.split("var PARTY_PARTS = ")[1].split(";</script>")[0]
+    assert "</script>" not in parts
+    assert json.loads(parts)[0] == {"id": "M2x16_A", "mesh": "M2x16_A.mesh"}